@@ -0,0 +1,11 @@
+from core.models import QueuedTask
+from django.contrib import admin
+
+
+class QueuedTaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'attempts', 'run_at', 'created',)
+    list_filter = ('status', 'name',)
+    search_fields = ('name', 'args',)
+
+
+admin.site.register(QueuedTask, QueuedTaskAdmin)
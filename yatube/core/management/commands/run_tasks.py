@@ -0,0 +1,84 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from core import tasks
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи из очереди в пуле потоков или процессов. '
+        'По Ctrl+C или с --once по опустошении очереди печатает метрики.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.TASKS_WORKERS,
+            help='Число потоков или процессов.'
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Выполнять задачи в процессах, а не в потоках.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выйти, когда в очереди не останется готовых задач.'
+        )
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Только показать число задач в очереди.'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for name, statuses in sorted(tasks.queue_stats().items()):
+                counts = ', '.join(
+                    f'{status}: {count}'
+                    for status, count in sorted(statuses.items())
+                )
+                self.stdout.write(f'{name}: {counts}')
+            return
+        try:
+            with self.make_pool(options) as pool:
+                self.work(pool, options['workers'], options['once'])
+        except KeyboardInterrupt:
+            pass
+        self.write_metrics(tasks.metrics.snapshot())
+
+    def make_pool(self, options):
+        if not options['processes']:
+            return ThreadPoolExecutor(
+                max_workers=options['workers'], thread_name_prefix='tasks'
+            )
+        # Дочерние процессы не должны делить соединения родителя.
+        connections.close_all()
+        return ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('fork')
+        )
+
+    def work(self, pool, workers, once):
+        while True:
+            tasks.requeue_stale()
+            claimed = tasks.claim(workers)
+            if not claimed:
+                if once:
+                    return
+                time.sleep(settings.TASKS_POLL_INTERVAL)
+                continue
+            for result in pool.map(tasks.run_job, claimed):
+                tasks.metrics.record(*result)
+
+    def write_metrics(self, metrics):
+        for name, stats in sorted(metrics.items()):
+            runs = stats[tasks.SUCCEEDED] + stats[tasks.RETRIED] + stats[
+                tasks.FAILED]
+            self.stdout.write(
+                f'{name}: выполнено {stats[tasks.SUCCEEDED]}, '
+                f'повторов {stats[tasks.RETRIED]}, '
+                f'упало {stats[tasks.FAILED]}, '
+                f'в среднем {stats["seconds"] / runs * 1000:.1f} мс'
+            )
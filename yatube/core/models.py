@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils import timezone
+
+
+class QueuedTask(models.Model):
+    """Задача в очереди фоновых задач (core.tasks)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    args = models.TextField('Аргументы в JSON', default='[]')
+    status = models.CharField(
+        'Состояние',
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED
+    )
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    run_at = models.DateTimeField('Выполнить не раньше', default=timezone.now)
+    started = models.DateTimeField('Начата', null=True, blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    error = models.TextField('Последняя ошибка', blank=True)
+
+    def __str__(self):
+        return f'{self.name}{self.args}'
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at', 'id'],
+                name='task_status_run_at_idx'
+            ),
+        ]
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
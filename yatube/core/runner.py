@@ -0,0 +1,21 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class EagerTasksRunner(DiscoverRunner):
+    """
+    Запускает тесты с задачами core.tasks, выполняемыми сразу.
+
+    Так тесты видят результат задачи в той же транзакции, а файлы не
+    пишутся рабочим после удаления временного MEDIA_ROOT. Тесты очереди
+    выключают TASKS_EAGER сами.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._eager_tasks = override_settings(TASKS_EAGER=True)
+        self._eager_tasks.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._eager_tasks.disable()
+        super().teardown_test_environment(**kwargs)
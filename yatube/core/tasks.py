@@ -0,0 +1,240 @@
+"""
+Фоновые задачи с очередью в основной базе.
+
+Функция, обёрнутая в @task, регистрируется по имени модуля и функции
+и по-прежнему вызывается напрямую, а task.delay(...) ставит её вызов в
+очередь — таблицу QueuedTask. Строка очереди вставляется в текущей
+транзакции, поэтому задача появляется только вместе с записью, которая
+её породила, и не теряется при перезапуске процесса. Задачи выполняет
+команда run_tasks; упавшая задача повторяется с экспоненциальной
+задержкой, а после max_retries повторов остаётся в очереди со статусом
+failed и текстом ошибки.
+
+При TASKS_EAGER задачи выполняются сразу в вызывающем процессе, без
+очереди и рабочих: так работают тесты и разработка без run_tasks.
+Аргументы задач сериализуются в JSON.
+"""
+import json
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from core.models import QueuedTask
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+logger = logging.getLogger(__name__)
+
+SUCCEEDED = 'succeeded'
+RETRIED = 'retried'
+FAILED = 'failed'
+
+registry = {}
+# Кеши, которые видит только процесс, создавший их.
+PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+class Task:
+    """Зарегистрированная фоновая задача."""
+
+    def __init__(self, func, name, max_retries, unique):
+        self.func = func
+        self.name = name
+        self.max_retries = max_retries
+        self.unique = unique
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+    def __repr__(self):
+        return f'<Task {self.name}>'
+
+    def delay(self, *args):
+        """
+        Ставит вызов задачи в очередь.
+
+        У задачи с unique=True вызов с теми же аргументами не ставится,
+        пока предыдущий ждёт в очереди или выполняется.
+        """
+        if settings.TASKS_EAGER:
+            error, seconds = _execute(self, args)
+            metrics.record(self.name, FAILED if error else SUCCEEDED, seconds)
+            return
+        raw_args = json.dumps(args)
+        if self.unique and QueuedTask.objects.filter(
+                name=self.name, args=raw_args,
+                status__in=(QueuedTask.QUEUED, QueuedTask.RUNNING)
+        ).exists():
+            return
+        QueuedTask.objects.create(name=self.name, args=raw_args)
+
+
+def task(name=None, max_retries=None, unique=False):
+    """Регистрирует функцию как фоновую задачу."""
+    def decorator(func):
+        registered = Task(
+            func,
+            name or f'{func.__module__}.{func.__qualname__}',
+            settings.TASKS_MAX_RETRIES if max_retries is None
+            else max_retries,
+            unique
+        )
+        registry[registered.name] = registered
+        return registered
+    return decorator
+
+
+def autodiscover():
+    """Импортирует модули tasks установленных приложений."""
+    autodiscover_modules('tasks')
+
+
+def check_cache():
+    """
+    Не даёт запустить очередь с кешем в памяти процесса.
+
+    Задачи сбрасывают версии лент и страниц в кеше, и рабочий run_tasks
+    должен писать в тот же кеш, что и веб-процессы.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if not settings.TASKS_EAGER and backend in PROCESS_CACHES:
+        raise ImproperlyConfigured(
+            f'Очередь задач (TASKS_EAGER выключен) требует общего кеша, '
+            f'а CACHES["default"] — {backend}.'
+        )
+
+
+class Metrics:
+    """Счётчики исходов и время выполнения задач в этом процессе."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, outcome, seconds):
+        with self._lock:
+            stats = self._stats.setdefault(name, {
+                SUCCEEDED: 0, RETRIED: 0, FAILED: 0, 'seconds': 0.0,
+            })
+            stats[outcome] += 1
+            stats['seconds'] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+
+metrics = Metrics()
+
+
+def _execute(registered, args):
+    """Выполняет задачу один раз и возвращает (ошибку или None, секунды)."""
+    started = time.monotonic()
+    try:
+        with transaction.atomic():
+            registered.func(*args)
+    except Exception:
+        logger.exception('Задача %s%s упала', registered.name, args)
+        return traceback.format_exc(), time.monotonic() - started
+    return None, time.monotonic() - started
+
+
+def retry_delay(attempts):
+    """Возвращает задержку перед следующей попыткой."""
+    return timedelta(
+        seconds=settings.TASKS_RETRY_BACKOFF * 2 ** (attempts - 1)
+    )
+
+
+def claim(limit):
+    """
+    Забирает до limit готовых задач и возвращает их id.
+
+    Задачу забирает тот рабочий, чей UPDATE сменил её статус, поэтому
+    несколько рабочих не выполнят одну задачу дважды.
+    """
+    now = timezone.now()
+    candidates = QueuedTask.objects.filter(
+        status=QueuedTask.QUEUED, run_at__lte=now
+    ).order_by('run_at', 'id').values_list('id', flat=True)[:limit]
+    return [
+        pk for pk in list(candidates)
+        if QueuedTask.objects.filter(
+            pk=pk, status=QueuedTask.QUEUED
+        ).update(
+            status=QueuedTask.RUNNING, started=now,
+            attempts=F('attempts') + 1
+        )
+    ]
+
+
+def run_job(pk):
+    """
+    Выполняет забранную задачу и возвращает (имя, исход, секунды).
+
+    Успешная задача удаляется из очереди, упавшая ставится на повтор
+    или остаётся со статусом failed.
+    """
+    close_old_connections()
+    try:
+        job = QueuedTask.objects.get(pk=pk)
+        registered = registry.get(job.name)
+        if registered is None:
+            _finish_failed(job, None, f'Неизвестная задача {job.name}')
+            return job.name, FAILED, 0.0
+        error, seconds = _execute(registered, json.loads(job.args))
+        if error:
+            return job.name, _finish_failed(job, registered, error), seconds
+        job.delete()
+        return job.name, SUCCEEDED, seconds
+    finally:
+        close_old_connections()
+
+
+def _finish_failed(job, registered, error):
+    job.error = error
+    if registered is not None and job.attempts <= registered.max_retries:
+        job.status = job.QUEUED
+        job.run_at = timezone.now() + retry_delay(job.attempts)
+        outcome = RETRIED
+    else:
+        job.status = job.FAILED
+        outcome = FAILED
+    job.save(update_fields=('status', 'run_at', 'error'))
+    return outcome
+
+
+def requeue_stale():
+    """
+    Возвращает в очередь задачи, зависшие в статусе running.
+
+    Так бывает, если рабочий процесс умер посреди задачи.
+    """
+    return QueuedTask.objects.filter(
+        status=QueuedTask.RUNNING,
+        started__lt=timezone.now() - timedelta(
+            seconds=settings.TASKS_VISIBILITY_TIMEOUT
+        )
+    ).update(status=QueuedTask.QUEUED)
+
+
+def queue_stats():
+    """Возвращает число задач в очереди по имени и состоянию."""
+    stats = {}
+    for row in QueuedTask.objects.values('name', 'status').annotate(
+            tasks=Count('id')).order_by():
+        stats.setdefault(row['name'], {})[row['status']] = row['tasks']
+    return stats
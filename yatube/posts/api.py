@@ -0,0 +1,319 @@
+"""
+JSON API: ленты, группы, профили, посты и комментарии.
+
+Ресурсы читаются через .values() без создания объектов моделей и
+отдаются словарями, поэтому ответ API стоит один-два запроса и
+сериализацию JSON. Параметр fields[тип]=поле,поле оставляет в ответе
+только нужные поля (и только их читает из базы), ленты и комментарии
+листаются курсорами after/before, как HTML-страницы. ETag и
+Last-Modified считаются по тем же областям кеша лент, что у страниц,
+поэтому неизменившийся ответ стоит 304 без запросов к лентам.
+
+Писать через API можно только пачками NDJSON (posts.bulk).
+"""
+import base64
+from functools import partial, wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.http import Http404, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from posts import bulk, conditional, feed_cache, groups, timeline
+from posts.models import Comment, Post, User
+from posts.paginator import CursorPaginator
+from posts.storage import post_image_storage
+
+CURSOR_PARAMS = ('after', 'before', 'page')
+
+
+class FieldsError(ValueError):
+    """Запрошено поле, которого у ресурса нет."""
+
+
+def _image_url(name):
+    return post_image_storage.url(name) if name else None
+
+
+class Resource:
+    """
+    Описание ресурса API: публичные имена полей и пути к ним в ORM.
+
+    converters задают обработку значений, например путь к файлу в URL.
+    """
+
+    def __init__(self, type_, fields, converters=None):
+        self.type = type_
+        self.fields = fields
+        self.converters = converters or {}
+
+    def select(self, request):
+        """Возвращает поля из fields[тип] или все поля ресурса."""
+        raw = request.GET.get(f'fields[{self.type}]')
+        if not raw:
+            return list(self.fields)
+        names = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = sorted(set(names) - set(self.fields))
+        if unknown:
+            raise FieldsError(
+                f'Нет полей {", ".join(unknown)} у ресурса {self.type}.'
+            )
+        return names
+
+    def values(self, queryset, names, extra=()):
+        """Читает только нужные поля и служебные поля extra."""
+        paths = {self.fields[name] for name in names}
+        return queryset.values(*paths.union(extra))
+
+    def serialize(self, row, names):
+        """Превращает строку .values() в словарь ответа."""
+        data = {}
+        for name in names:
+            value = row[self.fields[name]]
+            if name in self.converters:
+                value = self.converters[name](value)
+            data[name] = value
+        return data
+
+    def serialize_object(self, obj, names):
+        """Превращает уже загруженный объект модели в словарь ответа."""
+        row = {}
+        for name in names:
+            value = obj
+            for attr in self.fields[name].split('__'):
+                value = getattr(value, attr)
+            row[self.fields[name]] = value
+        return self.serialize(row, names)
+
+
+POSTS = Resource('posts', {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+    'comments_count': 'comments_count',
+}, {'image': _image_url})
+COMMENTS = Resource('comments', {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+})
+PROFILES = Resource('profiles', {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'counters__posts_count',
+    'followers_count': 'counters__followers_count',
+    'following_count': 'counters__following_count',
+})
+GROUPS = Resource('groups', {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+    'posts_count': 'posts_count',
+    'last_post_at': 'last_post_at',
+})
+
+
+def _respond(data, status=HTTPStatus.OK):
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def _error(status, detail):
+    return _respond({'detail': detail}, status)
+
+
+def api_view(view=None, methods=('GET', 'HEAD')):
+    """Декоратор представлений API: по умолчанию только GET и HEAD,
+    ошибки в JSON."""
+    if view is None:
+        return partial(api_view, methods=methods)
+
+    @require_http_methods(methods)
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return _error(HTTPStatus.NOT_FOUND, 'Не найдено.')
+        except FieldsError as error:
+            return _error(HTTPStatus.BAD_REQUEST, str(error))
+    return wrapped
+
+
+def _page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        size = settings.API_PAGE_SIZE
+    return min(max(size, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def _link(request, param, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    for name in CURSOR_PARAMS:
+        params.pop(name, None)
+    params[param] = cursor
+    return f'{request.path}?{params.urlencode(safe="[],")}'
+
+
+def paginate(request, resource, queryset, date_field='pub_date',
+             descending=True, paginator_class=None):
+    """
+    Возвращает страницу ресурса со ссылками на соседние страницы.
+
+    paginator_class(rows, size) заменяет курсорный пагинатор по queryset.
+    """
+    names = resource.select(request)
+    rows = resource.values(queryset, names, ('id', date_field))
+    if paginator_class is None:
+        paginator = CursorPaginator(
+            rows, _page_size(request),
+            date_field=date_field, descending=descending
+        )
+    else:
+        paginator = paginator_class(rows, _page_size(request))
+    page = paginator.get_cursor_page(request.GET)
+    return {
+        'results': [resource.serialize(row, names) for row in page],
+        'next': _link(request, 'after', paginator.next_cursor),
+        'previous': _link(request, 'before', paginator.previous_cursor),
+    }
+
+
+@api_view
+@conditional.conditional
+def index(request):
+    conditional.check(
+        request, feed_cache.feed_scopes(feed_cache.FEED_INDEX)
+    )
+    return _respond(paginate(request, POSTS, Post.objects.all()))
+
+
+@api_view
+@conditional.conditional
+def group_list(request):
+    """Каталог групп целиком: групп немного, и он не листается."""
+    conditional.check(request, [feed_cache.SCOPE_ALL, feed_cache.FEED_INDEX])
+    names = GROUPS.select(request)
+    rows = GROUPS.values(groups.directory(), names)
+    return _respond({
+        'results': [GROUPS.serialize(row, names) for row in rows],
+    })
+
+
+@api_view
+@conditional.conditional
+def group_posts(request, slug):
+    group = groups.get_group(slug)
+    conditional.check(
+        request, feed_cache.feed_scopes(feed_cache.FEED_GROUP, group.id)
+    )
+    data = paginate(request, POSTS, Post.objects.filter(group_id=group.id))
+    data['group'] = GROUPS.serialize_object(group, GROUPS.select(request))
+    return _respond(data)
+
+
+@api_view
+@conditional.conditional
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    conditional.check(request, conditional.profile_scopes(request, author.id))
+    data = paginate(request, POSTS, Post.objects.filter(author_id=author.id))
+    data['profile'] = PROFILES.serialize_object(
+        author, PROFILES.select(request)
+    )
+    return _respond(data)
+
+
+@api_view
+@conditional.conditional
+def post_detail(request, post_id):
+    """Пост и страница его комментариев от старых к новым."""
+    names = POSTS.select(request)
+    row = POSTS.values(
+        Post.objects.filter(pk=post_id), names, ('author_id',)
+    ).first()
+    if row is None:
+        raise Http404
+    conditional.check(request, conditional.post_scopes(
+        Post(pk=post_id, author_id=row['author_id'])
+    ))
+    data = paginate(
+        request, COMMENTS, Comment.objects.filter(post_id=post_id),
+        date_field='created', descending=False
+    )
+    data['post'] = POSTS.serialize(row, names)
+    return _respond(data)
+
+
+@api_view
+@conditional.conditional
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return _error(HTTPStatus.UNAUTHORIZED, 'Нужно войти.')
+    conditional.check(request, timeline.follow_scopes(request.user))
+    return _respond(paginate(
+        request, POSTS, Post.objects.all(),
+        paginator_class=partial(timeline.follow_paginator, request.user)
+    ))
+
+
+def _authenticate(request):
+    """
+    Возвращает пользователя запроса на запись или ответ с ошибкой.
+
+    Скрипты входят заголовком Authorization: Basic и обходятся без
+    CSRF-токена; браузер с сессией по-прежнему его присылает.
+    """
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if header.startswith('Basic '):
+        try:
+            username, password = base64.b64decode(
+                header[len('Basic '):]).decode().split(':', 1)
+        except (ValueError, UnicodeError):
+            username = password = None
+        user = username and authenticate(
+            request, username=username, password=password
+        )
+        if not user:
+            return None, _error(
+                HTTPStatus.UNAUTHORIZED, 'Неверные имя или пароль.'
+            )
+        return user, None
+    if not request.user.is_authenticated:
+        return None, _error(HTTPStatus.UNAUTHORIZED, 'Нужно войти.')
+    if CsrfViewMiddleware(None).process_view(request, None, (), {}):
+        return None, _error(
+            HTTPStatus.FORBIDDEN, 'Проверка CSRF не пройдена.'
+        )
+    return request.user, None
+
+
+@csrf_exempt
+@api_view(methods=('POST',))
+def bulk_import(request, kind):
+    """
+    Импортирует тело запроса в NDJSON от имени пользователя.
+
+    Отвечает числом созданных записей и ошибками по номерам строк.
+    """
+    user, error = _authenticate(request)
+    if error is not None:
+        return error
+    # Тело читается построчно, без загрузки в память целиком.
+    return _respond(bulk.IMPORTERS[kind](user).run(request))
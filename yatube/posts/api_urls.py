@@ -0,0 +1,25 @@
+from django.urls import path
+from posts import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', api.index, name='index'),
+    path('posts/<int:post_id>/', api.post_detail, name='post_detail'),
+    path('groups/', api.group_list, name='group_list'),
+    path('groups/<slug:slug>/posts/', api.group_posts, name='group_posts'),
+    path('profiles/<str:username>/', api.profile, name='profile'),
+    path('follow/', api.follow_index, name='follow_index'),
+    path(
+        'bulk/posts/', api.bulk_import, {'kind': 'posts'},
+        name='bulk_posts'
+    ),
+    path(
+        'bulk/comments/', api.bulk_import, {'kind': 'comments'},
+        name='bulk_comments'
+    ),
+    path(
+        'bulk/follows/', api.bulk_import, {'kind': 'follows'},
+        name='bulk_follows'
+    ),
+]
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        import posts.signals  # noqa: F401
+        import posts.sqlite  # noqa: F401
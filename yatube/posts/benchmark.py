@@ -0,0 +1,518 @@
+"""
+Нагрузочный стенд: генерация данных и прогон страниц yatube.
+
+generate_dataset заполняет базу пользователями, группами, постами,
+подписками и комментариями через bulk_create. Активность авторов и их
+популярность распределены по Парето, чтобы, как в жизни, немногие
+авторы писали большую часть постов и собирали большую часть подписок.
+
+run_benchmark проходит по маршрутам posts.urls (и страницам about)
+через тестовый клиент или через локальный WSGI-сервер и считает
+перцентили задержки, пропускную способность и число SQL-запросов.
+Фоновые писатели Writers на время прогона комментируют посты, чтобы
+мерить чтение под конкурентной записью.
+"""
+import itertools
+import random
+import threading
+import time
+import uuid
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.wsgi import get_wsgi_application
+from django.db import DatabaseError, connection
+from django.test import Client
+from django.urls import reverse
+from faker import Faker
+from posts import counters, search, timeline, urls
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+BENCH_PREFIX = 'bench_'
+BENCH_PASSWORD = 'bench-password'
+# Показатель распределения Парето: чем меньше, тем сильнее перекос.
+ACTIVITY_ALPHA = 1.2
+# Доля постов, опубликованных в группе.
+GROUP_SHARE = 0.6
+TEXT_POOL_SIZE = 500
+SAMPLE_SIZE = 1000
+PERCENTILES = (50, 95, 99)
+QUERY_COUNT_HEADER = 'X-Bench-Queries'
+
+
+def _batches(rng, total, batch_size, make):
+    """Отдаёт объекты пачками, не держа весь набор в памяти."""
+    while total > 0:
+        size = min(batch_size, total)
+        yield [make(rng) for _ in range(size)]
+        total -= size
+
+
+def _create_users(tag, users, batch_size):
+    password = make_password(BENCH_PASSWORD)
+    User.objects.bulk_create(
+        (
+            User(username=f'{tag}_{number}', password=password)
+            for number in range(users)
+        ),
+        batch_size=batch_size
+    )
+    user_ids = list(User.objects.filter(
+        username__startswith=f'{tag}_').values_list('id', flat=True))
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=user_id) for user_id in user_ids),
+        batch_size=batch_size
+    )
+    return user_ids
+
+
+def _create_groups(rng, tag, groups, texts):
+    Group.objects.bulk_create(
+        Group(
+            title=f'Группа {tag} {number}',
+            slug=f'{tag}-{number}'.replace('_', '-'),
+            description=rng.choice(texts)
+        )
+        for number in range(groups)
+    )
+    return list(Group.objects.filter(
+        title__startswith=f'Группа {tag}').values_list('id', flat=True))
+
+
+def _create_posts(rng, posts, batch_size, texts, pick_author, group_ids):
+    def make_post(rng):
+        group_id = None
+        if group_ids and rng.random() < GROUP_SHARE:
+            group_id = rng.choice(group_ids)
+        return Post(
+            text=rng.choice(texts), author_id=pick_author(rng),
+            group_id=group_id
+        )
+
+    for batch in _batches(rng, posts, batch_size, make_post):
+        Post.objects.bulk_create(batch)
+
+
+def _create_follows(rng, follows, batch_size, user_ids, pick_author):
+    def make_follow(rng):
+        user_id = author_id = rng.choice(user_ids)
+        while author_id == user_id:
+            author_id = pick_author(rng)
+        return Follow(user_id=user_id, author_id=author_id)
+
+    if len(user_ids) < 2:
+        return
+    for batch in _batches(rng, follows, batch_size, make_follow):
+        Follow.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _create_comments(rng, comments, batch_size, texts, user_ids, post_ids):
+    def make_comment(rng):
+        return Comment(
+            post_id=rng.choice(post_ids), author_id=rng.choice(user_ids),
+            text=rng.choice(texts)
+        )
+
+    if not post_ids:
+        return
+    for batch in _batches(rng, comments, batch_size, make_comment):
+        Comment.objects.bulk_create(batch)
+
+
+def generate_dataset(users, groups, posts, follows, comments, seed=None,
+                     batch_size=1000, log=None):
+    """
+    Генерирует набор данных и возвращает его описание.
+
+    follows и comments — общее число подписок и комментариев.
+    Все имена помечаются общим префиксом прогона, поэтому стенд можно
+    запускать повторно на той же базе.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    tag = f'{BENCH_PREFIX}{uuid.uuid4().hex[:6]}'
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    texts = [fake.paragraph() for _ in range(TEXT_POOL_SIZE)]
+    started = time.perf_counter()
+
+    user_ids = _create_users(tag, users, batch_size)
+    log(f'Пользователей: {len(user_ids)}')
+    group_ids = _create_groups(rng, tag, groups, texts)
+    log(f'Групп: {len(group_ids)}')
+
+    activity = list(itertools.accumulate(
+        rng.paretovariate(ACTIVITY_ALPHA) for _ in user_ids
+    ))
+
+    def pick_author(rng):
+        return rng.choices(user_ids, cum_weights=activity)[0]
+
+    _create_posts(rng, posts, batch_size, texts, pick_author, group_ids)
+    post_ids = list(Post.objects.filter(
+        author_id__in=user_ids).values_list('id', flat=True))
+    log(f'Постов: {len(post_ids)}')
+    _create_follows(rng, follows, batch_size, user_ids, pick_author)
+    follower_ids = Follow.objects.filter(
+        user_id__in=user_ids).values_list('user_id', flat=True)
+    log(f'Подписок: {follower_ids.count()}')
+    _create_comments(rng, comments, batch_size, texts, user_ids, post_ids)
+    log(f'Комментариев: {comments}')
+
+    counters.recount_all(Post, Comment, Group, Follow, UserCounters, User)
+    counters.recount_activity(Post, Group)
+    search.index_queryset(Post.objects.filter(author_id__in=user_ids))
+    if timeline.is_enabled():
+        for user_id in follower_ids.distinct().iterator():
+            timeline.rebuild(user_id)
+    cache.clear()
+    return {
+        'tag': tag,
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'posts': len(post_ids),
+        'follows': follows,
+        'comments': comments,
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+class Samples:
+    """Случайные объекты, по которым строятся адреса страниц."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        posts = list(Post.objects.order_by('?').values(
+            'id', 'author_id')[:SAMPLE_SIZE])
+        if not posts:
+            raise ValueError('В базе нет постов: сначала сгенерируйте данные.')
+        self.post_ids = [post['id'] for post in posts]
+        self.usernames = list(User.objects.filter(
+            posts__isnull=False).distinct().order_by('?').values_list(
+            'username', flat=True)[:SAMPLE_SIZE])
+        self.group_slugs = list(Group.objects.order_by('?').values_list(
+            'slug', flat=True)[:SAMPLE_SIZE])
+        reader_id = Follow.objects.values_list('user_id', flat=True).first()
+        self.reader = User.objects.get(
+            pk=reader_id or posts[0]['author_id'])
+        self.author = User.objects.get(pk=posts[0]['author_id'])
+        self.author_post_ids = list(Post.objects.filter(
+            author=self.author).values_list('id', flat=True)[:SAMPLE_SIZE])
+        self.words = [
+            word for text in Post.objects.filter(
+                pk__in=self.post_ids[:10]).values_list('text', flat=True)
+            for word in text.split()[:3] if word.isalpha()
+        ] or ['пост']
+
+    def pick(self, values):
+        return self.rng.choice(values)
+
+
+# Для каждого маршрута posts.urls — функция, строящая адрес, и чьим
+# клиентом его открывать. Маршруты без записи здесь (формы на запись)
+# стенд пропускает и отмечает в отчёте.
+ENDPOINTS = {
+    'posts:index': (
+        lambda samples: reverse('posts:index'), None),
+    'posts:group_index': (
+        lambda samples: reverse('posts:group_index'), None),
+    'posts:group_list': (
+        lambda samples: reverse('posts:group_list', kwargs={
+            'slug': samples.pick(samples.group_slugs)}), None),
+    'posts:profile': (
+        lambda samples: reverse('posts:profile', kwargs={
+            'username': samples.pick(samples.usernames)}), None),
+    'posts:post_detail': (
+        lambda samples: reverse('posts:post_detail', kwargs={
+            'post_id': samples.pick(samples.post_ids)}), None),
+    'posts:follow_index': (
+        lambda samples: reverse('posts:follow_index'), 'reader'),
+    'posts:post_create': (
+        lambda samples: reverse('posts:post_create'), 'author'),
+    'posts:post_edit': (
+        lambda samples: reverse('posts:post_edit', kwargs={
+            'post_id': samples.pick(samples.author_post_ids)}), 'author'),
+    'posts:search': (
+        lambda samples: '{}?q={}'.format(
+            reverse('posts:search'), samples.pick(samples.words)), None),
+    'api:index': (lambda samples: reverse('api:index'), None),
+    'api:profile': (
+        lambda samples: reverse('api:profile', kwargs={
+            'username': samples.pick(samples.usernames)}), None),
+    'api:post_detail': (
+        lambda samples: reverse('api:post_detail', kwargs={
+            'post_id': samples.pick(samples.post_ids)}), None),
+    'about:author': (lambda samples: reverse('about:author'), None),
+    'about:tech': (lambda samples: reverse('about:tech'), None),
+}
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(int(round(percent / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class QueryCounter:
+    """Считает SQL-запросы соединения через execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class ClientDriver:
+    """Открывает страницы тестовым клиентом Django в этом процессе."""
+    name = 'client'
+
+    def __init__(self, samples):
+        self.samples = samples
+        self.local = threading.local()
+
+    def _client(self, login):
+        clients = getattr(self.local, 'clients', None)
+        if clients is None:
+            clients = self.local.clients = {}
+        if login not in clients:
+            client = Client()
+            if login is not None:
+                client.force_login(getattr(self.samples, login))
+            clients[login] = client
+        return clients[login]
+
+    def get(self, url, login):
+        client = self._client(login)
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = client.get(url)
+        return response.status_code, counter.count
+
+    def close(self):
+        pass
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def counting_application(application):
+    """WSGI-обёртка, сообщающая число SQL-запросов в заголовке ответа."""
+    def wrapped(environ, start_response):
+        counter = QueryCounter()
+
+        def counted_start_response(status, headers, exc_info=None):
+            headers = list(headers)
+            headers.append((QUERY_COUNT_HEADER, str(counter.count)))
+            return start_response(status, headers, exc_info)
+
+        with connection.execute_wrapper(counter):
+            return application(environ, counted_start_response)
+    return wrapped
+
+
+class WsgiDriver:
+    """Открывает страницы по HTTP через локальный WSGI-сервер."""
+    name = 'wsgi'
+
+    def __init__(self, samples):
+        self.server = make_server(
+            '127.0.0.1', 0, counting_application(get_wsgi_application()),
+            server_class=ThreadingWSGIServer, handler_class=QuietHandler
+        )
+        self.base_url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.cookies = {None: None}
+        for login in ('reader', 'author'):
+            client = Client()
+            client.force_login(getattr(samples, login))
+            self.cookies[login] = 'sessionid={}'.format(
+                client.cookies['sessionid'].value)
+
+    def get(self, url, login):
+        request = Request(self.base_url + url)
+        if self.cookies[login]:
+            request.add_header('Cookie', self.cookies[login])
+        try:
+            with urlopen(request) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except HTTPError as error:
+            status, headers = error.code, error.headers
+        return status, int(headers.get(QUERY_COUNT_HEADER, 0))
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+DRIVERS = {driver.name: driver for driver in (ClientDriver, WsgiDriver)}
+
+
+def _latency_metrics(latencies):
+    return {
+        f'p{percent}_ms': round(percentile(latencies, percent), 2)
+        for percent in PERCENTILES
+    }
+
+
+class Writers:
+    """
+    Потоки, которые комментируют посты, пока идёт прогон чтения.
+
+    Каждый поток пишет через своё соединение с базой, как обработчик
+    запроса; ошибки записи, например «database is locked», считаются.
+    """
+
+    def __init__(self, samples, count):
+        self.samples = samples
+        self.count = count
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+        self.threads = [
+            threading.Thread(target=self._write, daemon=True)
+            for _ in range(count)
+        ]
+
+    def start(self):
+        self.started = time.perf_counter()
+        for thread in self.threads:
+            thread.start()
+
+    def _write(self):
+        rng = random.Random()
+        try:
+            while not self.stop_event.is_set():
+                started = time.perf_counter()
+                try:
+                    Comment.objects.create(
+                        post_id=rng.choice(self.samples.post_ids),
+                        author=self.samples.reader,
+                        text='Комментарий нагрузочного стенда'
+                    )
+                except DatabaseError:
+                    with self.lock:
+                        self.errors += 1
+                    continue
+                latency = (time.perf_counter() - started) * 1000
+                with self.lock:
+                    self.latencies.append(latency)
+        finally:
+            connection.close()
+
+    def stop(self):
+        """Останавливает потоки и возвращает метрики записи."""
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join()
+        elapsed = time.perf_counter() - self.started
+        metrics = _latency_metrics(self.latencies or [0])
+        metrics.update({
+            'writers': self.count,
+            'writes': len(self.latencies),
+            'errors': self.errors,
+            'throughput_wps': round(len(self.latencies) / elapsed, 1),
+        })
+        return metrics
+
+
+def run_endpoint(driver, samples, make_url, login, requests, concurrency,
+                 cold):
+    """Прогоняет одну страницу и возвращает её метрики."""
+    urls_to_open = [make_url(samples) for _ in range(requests)]
+
+    def fetch(url):
+        if cold:
+            cache.clear()
+        started = time.perf_counter()
+        try:
+            status, queries = driver.get(url, login)
+        except Exception:
+            status, queries = None, 0
+        return (time.perf_counter() - started) * 1000, status, queries
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        # Без пула запросы идут в текущем потоке и его соединении с БД.
+        results = [fetch(url) for url in urls_to_open]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(fetch, urls_to_open))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _, _ in results]
+    queries = [count for _, _, count in results]
+    metrics = _latency_metrics(latencies)
+    metrics.update({
+        'requests': requests,
+        'errors': sum(
+            1 for _, status, _ in results if status is None or status >= 400
+        ),
+        'throughput_rps': round(requests / elapsed, 1),
+        'queries_avg': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+    })
+    return metrics
+
+
+def run_benchmark(mode='client', requests=100, concurrency=1, warmup=5,
+                  cold=False, seed=None, only=None, writers=0):
+    """
+    Прогоняет все известные страницы и возвращает отчёт.
+
+    writers — число фоновых писателей на время прогона.
+    """
+    rng = random.Random(seed)
+    samples = Samples(rng)
+    driver = DRIVERS[mode](samples)
+    report = {
+        'mode': mode,
+        'requests': requests,
+        'concurrency': concurrency,
+        'cold_cache': cold,
+        'endpoints': {},
+        'skipped': [],
+        'writes': None,
+    }
+    background = Writers(samples, writers)
+    background.start()
+    names = [f'posts:{pattern.name}' for pattern in urls.urlpatterns]
+    names += [name for name in ENDPOINTS if name not in names]
+    try:
+        for name in names:
+            if only and name not in only:
+                continue
+            if name not in ENDPOINTS:
+                report['skipped'].append(name)
+                continue
+            make_url, login = ENDPOINTS[name]
+            for _ in range(warmup):
+                # Ошибки прогрева не в счёт: их поймает сам замер.
+                with suppress(Exception):
+                    driver.get(make_url(samples), login)
+            report['endpoints'][name] = run_endpoint(
+                driver, samples, make_url, login, requests, concurrency, cold
+            )
+    finally:
+        driver.close()
+        if writers:
+            report['writes'] = background.stop()
+    return report
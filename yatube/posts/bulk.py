@@ -0,0 +1,279 @@
+"""
+Пакетный импорт постов, комментариев и подписок из NDJSON.
+
+Каждая строка — JSON-объект одной записи: {"text": ..., "group": slug}
+для поста, {"post": id, "text": ...} для комментария и
+{"author": username} для подписки. Строки проверяются правилами PostForm
+и CommentForm, а связанные группы, посты и авторы читаются одним
+запросом на пачку. Пачка из BULK_CHUNK_SIZE строк пишется bulk_create
+в своей транзакции, без сигналов модели: счётчики, индекс поиска, ленты
+подписок и версии кеша лент обновляются один раз на пачку. Ошибочные
+строки пропускаются и попадают в отчёт с номером строки.
+"""
+import json
+from collections import Counter
+from itertools import islice
+
+from django import forms
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from posts import counters, feed_cache, search, sitemaps, timeline
+from posts.forms import CommentForm, PostForm
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+NON_FIELD = '__all__'
+
+
+class KnownChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField по заранее прочитанным объектам, без запросов."""
+
+    def __init__(self, objects, field, **kwargs):
+        super().__init__(
+            queryset=field.queryset, to_field_name='slug',
+            required=field.required, **kwargs
+        )
+        self.objects = objects
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.objects[value]
+        except (KeyError, TypeError):
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice'
+            )
+
+
+def parse(lines):
+    """Выдаёт пары (номер строки, объект или None для ошибки JSON)."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        # Битая кодировка — тоже ValueError.
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+class Importer:
+    """
+    Импорт одного вида записей от имени пользователя user.
+
+    Наследники задают prepare — чтение связанных объектов пачки,
+    build — проверку строки и write — запись пачки.
+    """
+
+    def __init__(self, user, chunk_size=None):
+        self.user = user
+        self.chunk_size = chunk_size or settings.BULK_CHUNK_SIZE
+
+    def run(self, lines):
+        """Импортирует строки и возвращает отчёт."""
+        report = {'created': 0, 'errors': []}
+        rows = parse(lines)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return report
+            with transaction.atomic():
+                report['created'] += self.write(
+                    self._build_chunk(chunk, report['errors'])
+                )
+
+    def _build_chunk(self, chunk, errors):
+        context = self.prepare([row for _, row in chunk if row is not None])
+        objects = []
+        for number, row in chunk:
+            if row is None:
+                errors.append({
+                    'line': number,
+                    'errors': {NON_FIELD: [{
+                        'message': 'Строка не JSON-объект.', 'code': 'invalid'
+                    }]},
+                })
+                continue
+            obj, row_errors = self.build(row, context)
+            if row_errors:
+                errors.append({'line': number, 'errors': row_errors})
+            elif obj is not None:
+                objects.append(obj)
+        return objects
+
+    def prepare(self, rows):
+        return None
+
+    def build(self, row, context):
+        raise NotImplementedError
+
+    def write(self, objects):
+        raise NotImplementedError
+
+
+class PostImporter(Importer):
+    def prepare(self, rows):
+        slugs = {row.get('group') for row in rows} - {None, ''}
+        return Group.objects.in_bulk(
+            [slug for slug in slugs if isinstance(slug, str)],
+            field_name='slug'
+        )
+
+    def build(self, row, groups):
+        form = PostForm({'text': row.get('text'), 'group': row.get('group')})
+        form.fields['group'] = KnownChoiceField(
+            groups, form.fields['group']
+        )
+        if not form.is_valid():
+            return None, form.errors.get_json_data()
+        post = form.save(commit=False)
+        post.author = self.user
+        return post, None
+
+    def write(self, posts):
+        if not posts:
+            return 0
+        Post.objects.bulk_create(posts)
+        self._fill_ids(posts)
+        counters.shift(
+            UserCounters.objects.filter(user_id=self.user.id),
+            posts_count=len(posts)
+        )
+        scopes = set(feed_cache.post_scopes(self.user.id, None))
+        scopes.add(sitemaps.shard_scope(sitemaps.PROFILES, self.user.id))
+        for group_id, count in Counter(
+                post.group_id for post in posts).items():
+            if group_id is not None:
+                Group.objects.filter(pk=group_id).update(
+                    posts_count=F('posts_count') + count,
+                    last_post_at=counters.latest(Post, 'group', 'pub_date'),
+                )
+                scopes.add(f'{feed_cache.FEED_GROUP}:{group_id}')
+                scopes.add(sitemaps.shard_scope(sitemaps.GROUPS, group_id))
+        for post in posts:
+            search.index_post(post, created=True)
+            scopes.add(sitemaps.shard_scope(sitemaps.POSTS, post.pk))
+        if timeline.is_enabled():
+            timeline.fan_out_posts.delay(self.user.id, [
+                (post.pk, post.pub_date.isoformat()) for post in posts
+            ])
+        else:
+            scopes.update(timeline.follower_scopes(self.user.id))
+        feed_cache.bump(*scopes)
+        return len(posts)
+
+    def _fill_ids(self, posts):
+        if posts[0].pk is not None:
+            return
+        # SQLite не возвращает id из bulk_create. Транзакция держит
+        # блокировку записи, поэтому последние посты автора — наши.
+        ids = Post.objects.filter(author_id=self.user.id).order_by(
+            '-id').values_list('id', flat=True)[:len(posts)]
+        for post, pk in zip(posts, reversed(list(ids))):
+            post.pk = pk
+
+
+class CommentImporter(Importer):
+    def prepare(self, rows):
+        ids = [row.get('post') for row in rows]
+        return Post.objects.only('id', 'author_id', 'group_id').in_bulk(
+            [pk for pk in ids if isinstance(pk, int)]
+        )
+
+    def build(self, row, posts):
+        form = CommentForm({'text': row.get('text')})
+        post_id = row.get('post')
+        post = posts.get(post_id) if isinstance(post_id, int) else None
+        if not form.is_valid() or post is None:
+            errors = form.errors.get_json_data()
+            if post is None:
+                errors['post'] = [{
+                    'message': 'Пост не найден.', 'code': 'invalid_choice'
+                }]
+            return None, errors
+        comment = form.save(commit=False)
+        comment.author = self.user
+        comment.post = post
+        return comment, None
+
+    def write(self, comments):
+        if not comments:
+            return 0
+        Comment.objects.bulk_create(comments)
+        posts = {comment.post_id: comment.post for comment in comments}
+        for post_id, count in Counter(
+                comment.post_id for comment in comments).items():
+            counters.shift(
+                Post.objects.filter(pk=post_id), comments_count=count
+            )
+        scopes = set()
+        for post in posts.values():
+            scopes.update(
+                feed_cache.post_scopes(post.author_id, post.group_id)
+            )
+        for author_id in {post.author_id for post in posts.values()}:
+            scopes.update(timeline.follower_scopes(author_id))
+        feed_cache.bump(*scopes)
+        return len(comments)
+
+
+class FollowImporter(Importer):
+    def prepare(self, rows):
+        usernames = [row.get('author') for row in rows]
+        authors = User.objects.only('id', 'username').in_bulk(
+            [name for name in usernames if isinstance(name, str)],
+            field_name='username'
+        )
+        following = set(Follow.objects.filter(
+            user_id=self.user.id, author__in=authors.values()
+        ).values_list('author_id', flat=True))
+        return authors, following
+
+    def build(self, row, context):
+        authors, following = context
+        username = row.get('author')
+        author = authors.get(username) if isinstance(username, str) else None
+        if author is None:
+            return None, {'author': [{
+                'message': 'Автор не найден.', 'code': 'invalid_choice'
+            }]}
+        if author.id == self.user.id:
+            return None, {'author': [{
+                'message': 'Нельзя подписаться на себя.', 'code': 'invalid'
+            }]}
+        # Повторная подписка, как и в profile_follow, ничего не делает.
+        if author.id in following:
+            return None, None
+        following.add(author.id)
+        return Follow(user=self.user, author=author), None
+
+    def write(self, follows):
+        if not follows:
+            return 0
+        # Подписка, сделанная параллельно с импортом, не вставится
+        # второй раз, поэтому счётчики пересчитываются по строкам,
+        # а не сдвигаются на размер пачки.
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        author_ids = [follow.author_id for follow in follows]
+        counters.recount_follows(
+            UserCounters.objects.filter(
+                user_id__in=[self.user.id, *author_ids]
+            ),
+            Follow
+        )
+        if timeline.is_enabled():
+            timeline.backfill_many.delay(self.user.id, author_ids)
+        feed_cache.bump(
+            feed_cache.follow_scope(self.user.id),
+            *(f'{feed_cache.FEED_PROFILE}:{pk}' for pk in author_ids)
+        )
+        return len(follows)
+
+
+IMPORTERS = {
+    'posts': PostImporter,
+    'comments': CommentImporter,
+    'follows': FollowImporter,
+}
@@ -0,0 +1,64 @@
+"""
+Кеш отрисованных карточек постов.
+
+Карточка не зависит от читателя, поэтому её HTML кешируется по id поста
+и версиям поста и автора. Версию поста поднимают его правка и готовые
+миниатюры картинки, версию автора — смена его имени. Лента разрешает
+карточки всей страницы двумя обращениями к кешу, а отрисовывает
+и разрешает картинки только для промахов, так что страница из кеша
+собирается склейкой готовых строк. Карточки с заглушкой вместо картинки
+не кешируются: иначе страница не поставила бы картинку в очередь снова.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from posts import feed_cache, thumbnails
+
+CARD_TEMPLATE = 'includes/post_card.html'
+
+
+def _card_keys(posts, template_name):
+    scopes = []
+    for post in posts:
+        scopes += feed_cache.card_scopes(post.pk, post.author_id)
+    versions = iter(feed_cache.get_versions(*scopes))
+    return {
+        post.pk: f'card:{template_name}:{post.pk}:'
+                 f'{next(versions)}:{next(versions)}'
+        for post in posts
+    }
+
+
+def prefetch(posts, template_name=CARD_TEMPLATE):
+    """
+    Разрешает карточки постов одной пачкой.
+
+    HTML карточки сохраняется в посте, и тег post_card больше не
+    обращается к кешу.
+    """
+    posts = list(posts)
+    if not posts:
+        return
+    keys = _card_keys(posts, template_name)
+    found = cache.get_many(keys.values())
+    missing = [post for post in posts if keys[post.pk] not in found]
+    thumbnails.prefetch(missing)
+    rendered = {}
+    for post in missing:
+        card = render_to_string(template_name, {'post': post})
+        found[keys[post.pk]] = card
+        if not post.image or thumbnails.get_picture(post, 'card'):
+            rendered[keys[post.pk]] = card
+    cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    for post in posts:
+        cards = post.__dict__.setdefault('_cards', {})
+        cards[template_name] = mark_safe(found[keys[post.pk]])
+
+
+def get_card(post, template_name=CARD_TEMPLATE):
+    """Возвращает HTML карточки поста."""
+    cards = getattr(post, '_cards', {})
+    if template_name not in cards:
+        prefetch([post], template_name)
+    return post._cards[template_name]
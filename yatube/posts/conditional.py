@@ -0,0 +1,125 @@
+"""
+Условные GET-запросы к лентам, профилям и постам.
+
+ETag и Last-Modified считаются без рендеринга страницы: по версиям и
+времени изменения областей кеша лент, от которых страница зависит.
+Сигналы поднимают их при любой записи, которая меняет страницу, поэтому
+совпавший ETag означает, что у клиента та же страница, и он получает 304.
+Авторизованный пользователь видит свою шапку, кнопки и CSRF-токен в
+формах, поэтому его ETag включает пользователя и сессию, а ответ
+помечается как приватный и зависящий от Cookie.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+from posts import feed_cache, replicas
+
+
+class NotModified(Exception):
+    """Прерывает представление готовым ответом 304 или 412."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def _viewer(request):
+    if not request.user.is_authenticated:
+        return 'anonymous'
+    session = ':'.join((
+        request.session.session_key or '',
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ))
+    return f'{request.user.pk}:{hashlib.md5(session.encode()).hexdigest()}'
+
+
+def get_validators(request, scopes, versions):
+    """Возвращает ETag и Last-Modified страницы по версиям её областей."""
+    etag = quote_etag(hashlib.md5(':'.join(map(str, (
+        *versions, request.GET.urlencode(), _viewer(request)
+    ))).encode()).hexdigest())
+    return etag, int(feed_cache.get_changed(*scopes))
+
+
+def not_modified(request, etag, last_modified):
+    """Возвращает ответ 304 или 412 либо None, если нужна страница."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+
+
+def check(request, scopes):
+    """
+    Считает валидаторы страницы и прерывает представление, если
+    страница у клиента не устарела.
+
+    Вызывается после поиска объектов страницы, но до запросов ленты:
+    несуществующий объект по-прежнему даёт 404, а 304 обходится
+    без остальных запросов и рендеринга.
+    """
+    versions = feed_cache.get_versions(*scopes)
+    # Области и версии нужны кешу страниц, чтобы проверять записи.
+    request._page_state = scopes, versions
+    request._validators = get_validators(request, scopes, versions)
+    # Last-Modified округлён до секунды вниз.
+    replicas.avoid_lag(request._validators[1] + 1)
+    response = not_modified(request, *request._validators)
+    if response is not None:
+        raise NotModified(response)
+
+
+def conditional(view):
+    """
+    Декоратор представлений, которые вызывают check.
+
+    Отдаёт ответ из NotModified, ставит валидаторы на обычный ответ
+    и помечает ответы как зависящие от пользователя.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        try:
+            response = view(request, *args, **kwargs)
+        except NotModified as stop:
+            return finish(request, stop.response)
+        return finish(
+            request, response, getattr(request, '_validators', None)
+        )
+    return wrapped
+
+
+def finish(request, response, validators=None):
+    """Ставит валидаторы на страницу и заголовки кеширования."""
+    if (validators is not None and response.status_code == 200
+            and request.method in ('GET', 'HEAD')):
+        etag, last_modified = validators
+        response.setdefault('ETag', etag)
+        response.setdefault('Last-Modified', http_date(last_modified))
+    patch_vary_headers(response, ('Cookie',))
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True)
+    return response
+
+
+def profile_scopes(request, author_id):
+    """Возвращает области страницы автора."""
+    scopes = [
+        *feed_cache.feed_scopes(feed_cache.FEED_PROFILE, author_id),
+        # Число подписок автора.
+        feed_cache.follow_scope(author_id),
+    ]
+    # Подписки читателя меняют кнопку подписки.
+    if request.user.is_authenticated:
+        scopes.append(feed_cache.follow_scope(request.user.pk))
+    return scopes
+
+
+def post_scopes(post):
+    """Возвращает области страницы поста."""
+    # Пост, его комментарии и счётчики автора поднимают область профиля.
+    return feed_cache.feed_scopes(feed_cache.FEED_PROFILE, post.author_id)
@@ -0,0 +1,68 @@
+"""
+Денормализованные счётчики постов, комментариев и подписок.
+
+Сигналы сдвигают счётчики через F() в той же транзакции, что и запись,
+и обновляют время последнего поста группы, а recount_all
+и recount_activity пересчитывают их с нуля, если они разошлись с данными.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def shift(queryset, **deltas):
+    """Атомарно сдвигает поля счётчиков у строк queryset."""
+    queryset.update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def _count(model, field, outer_field='pk'):
+    counted = model.objects.filter(**{field: OuterRef(outer_field)})
+    counted = counted.order_by().values(field).annotate(total=Count('pk'))
+    return Coalesce(Subquery(counted.values('total')), 0)
+
+
+def latest(model, field, date_field, outer_field='pk'):
+    """Возвращает подзапрос даты самой свежей строки model."""
+    rows = model.objects.filter(**{field: OuterRef(outer_field)})
+    return Subquery(rows.order_by(f'-{date_field}').values(date_field)[:1])
+
+
+def recount_all(post_model, comment_model, group_model, follow_model,
+                counters_model, user_model):
+    """
+    Пересчитывает все счётчики с нуля.
+
+    Модели передаются явно, чтобы функцию можно было вызвать
+    из миграции с историческими моделями.
+    """
+    counters_model.objects.bulk_create(
+        (
+            counters_model(user_id=user_id)
+            for user_id in user_model.objects.values_list('pk', flat=True)
+        ),
+        batch_size=500,
+        ignore_conflicts=True
+    )
+    counters_model.objects.update(
+        posts_count=_count(post_model, 'author', 'user_id'),
+        followers_count=_count(follow_model, 'author', 'user_id'),
+        following_count=_count(follow_model, 'user', 'user_id'),
+    )
+    post_model.objects.update(comments_count=_count(comment_model, 'post'))
+    group_model.objects.update(posts_count=_count(post_model, 'group'))
+
+
+def recount_follows(queryset, follow_model):
+    """Пересчитывает счётчики подписок у строк queryset по подпискам."""
+    queryset.update(
+        followers_count=_count(follow_model, 'author', 'user_id'),
+        following_count=_count(follow_model, 'user', 'user_id'),
+    )
+
+
+def recount_activity(post_model, group_model):
+    """Пересчитывает время последнего поста групп."""
+    group_model.objects.update(
+        last_post_at=latest(post_model, 'group', 'pub_date')
+    )
@@ -0,0 +1,148 @@
+"""
+Кеш страниц лент с инвалидацией по записи.
+
+Ключ страницы складывается из типа ленты, курсора и версий областей,
+от которых лента зависит. Сигналы в posts.signals поднимают версии при
+изменении Post, Comment, Group и Follow, и старые ключи просто перестают
+читаться, поэтому TTL нужен только для вытеснения, а не для свежести.
+Версии лежат в кеше по умолчанию, общем для всех процессов: запись в
+одном веб-процессе или в рабочем run_tasks сбрасывает страницы у всех.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+FEED_INDEX = 'index'
+FEED_GROUP = 'group'
+FEED_PROFILE = 'profile'
+FEED_FOLLOW = 'follow'
+
+# Область, общая для всех лент: её поднимает изменение группы,
+# потому что ссылка на группу есть в каждой карточке поста.
+SCOPE_ALL = 'all'
+CURSOR_PARAMS = ('after', 'before', 'page')
+# Области отрисованных карточек постов (posts.cards).
+CARD_POST = 'card:post'
+CARD_AUTHOR = 'card:author'
+
+
+def _version_key(scope):
+    return f'feed_version:{scope}'
+
+
+def _changed_key(scope):
+    return f'feed_changed:{scope}'
+
+
+def _new_version():
+    # Версия от времени не даёт вытесненной версии начаться заново
+    # и попасть на старые страницы.
+    return time.time_ns()
+
+
+def get_versions(*scopes):
+    """Возвращает текущие версии областей, заводя недостающие."""
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_changed(*scopes):
+    """
+    Возвращает время последнего изменения любой из областей.
+
+    Время неизвестной области, например после очистки кеша, отсчитывается
+    от первого чтения: так оно не раньше её последней записи.
+    """
+    keys = [_changed_key(scope) for scope in scopes]
+    changed = cache.get_many(keys)
+    for key in keys:
+        if key not in changed:
+            cache.add(key, time.time(), None)
+            changed[key] = cache.get(key)
+    return max(changed.values())
+
+
+def bump(*scopes):
+    """Поднимает версии областей, делая их страницы недействительными."""
+    # Новая версия записывается, а не увеличивается: у общих кешей incr
+    # бывает чтением и записью, и две записи подряд дали бы одну версию.
+    now = time.time()
+    version = _new_version()
+    cache.set_many(
+        {_version_key(scope): version for scope in scopes}, None
+    )
+    cache.set_many({_changed_key(scope): now for scope in scopes}, None)
+
+
+def follow_scope(user_id):
+    """Область ленты подписок читателя."""
+    return f'{FEED_FOLLOW}:{user_id}'
+
+
+def follow_author_scope(author_id):
+    """
+    Область постов популярного автора в лентах подписок.
+
+    Посты таких авторов не раскладываются по лентам, и их запись
+    поднимает одну область автора вместо областей всех подписчиков.
+    """
+    return f'{FEED_FOLLOW}:author:{author_id}'
+
+
+def feed_scopes(feed, scope_id=None):
+    """Возвращает области, от которых зависит лента."""
+    if feed == FEED_INDEX:
+        return [SCOPE_ALL, FEED_INDEX]
+    if feed == FEED_FOLLOW:
+        return [SCOPE_ALL, follow_scope(scope_id)]
+    return [SCOPE_ALL, f'{feed}:{scope_id}']
+
+
+def post_scopes(author_id, group_id):
+    """
+    Возвращает области лент, в которые попадает пост.
+
+    Области лент подписок зависят от подписчиков автора, их возвращает
+    timeline.follower_scopes.
+    """
+    scopes = [FEED_INDEX, f'{FEED_PROFILE}:{author_id}']
+    if group_id is not None:
+        scopes.append(f'{FEED_GROUP}:{group_id}')
+    return scopes
+
+
+def card_scopes(post_id, author_id):
+    """Возвращает области карточки поста: сам пост и его автора."""
+    return [f'{CARD_POST}:{post_id}', f'{CARD_AUTHOR}:{author_id}']
+
+
+def feed_key(feed, params, scope_id=None):
+    """
+    Собирает ключ страницы ленты.
+
+    scope_id — id группы, автора или, для ленты подписок, читателя.
+    """
+    versions = get_versions(*feed_scopes(feed, scope_id))
+    cursor = '&'.join(
+        f'{name}={params.get(name, "")}' for name in CURSOR_PARAMS
+    )
+    cursor = hashlib.md5(cursor.encode()).hexdigest()
+    version = '.'.join(str(value) for value in versions)
+    return f'feed:{feed}:{scope_id}:{version}:{cursor}'
+
+
+def get_page(paginator, params, key):
+    """Отдаёт страницу из кеша или строит её и кладёт в кеш."""
+    state = cache.get(key)
+    if state is not None:
+        return paginator.load_page(state)
+    page_obj = paginator.get_cursor_page(params)
+    cache.set(key, paginator.dump_page(page_obj), settings.FEED_CACHE_TIMEOUT)
+    return page_obj
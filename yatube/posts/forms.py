@@ -15,6 +15,14 @@ class PostForm(forms.ModelForm):
             'group': ('Группа, к которой будет относиться пост'),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Отклонённая при приёме загрузка приходит пустым файлом:
+        # вместо «файл пуст» поле показывает причину отказа.
+        error = getattr(self.files.get('image'), 'upload_error', None)
+        if error is not None:
+            self.fields['image'].error_messages['empty'] = error
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,47 @@
+"""
+Метаданные групп в памяти процесса.
+
+Страница группы берёт группу по slug из LRU процесса. Запись помечена
+версией общей области кеша лент, которую сигналы поднимают при любом
+сохранении и удалении группы, в том числе из админки, поэтому
+устаревшая запись отбрасывается при первом же чтении в каждом процессе.
+"""
+from django.conf import settings
+from django.db.models import F
+from django.shortcuts import get_object_or_404
+from posts import feed_cache, replicas
+from posts.lru import LRUCache
+from posts.models import Group
+
+_groups = LRUCache(settings.GROUP_LRU_SIZE)
+
+
+def get_group(slug):
+    """
+    Возвращает группу по slug или поднимает Http404.
+
+    Счётчики и время последнего поста в закешированной группе могут
+    отставать: для них есть каталог групп.
+    """
+    version, = feed_cache.get_versions(feed_cache.SCOPE_ALL)
+    cached = _groups.get(slug)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    # Группа попадёт в LRU под новой версией: читать её с отстающей
+    # реплики нельзя.
+    replicas.avoid_lag(feed_cache.get_changed(feed_cache.SCOPE_ALL))
+    group = get_object_or_404(Group, slug=slug)
+    _groups.set(slug, (version, group))
+    return group
+
+
+def directory():
+    """Возвращает группы для каталога: сначала недавно активные."""
+    return Group.objects.order_by(
+        F('last_post_at').desc(nulls_last=True), 'title'
+    )
+
+
+def clear():
+    """Очищает LRU процесса."""
+    _groups.clear()
@@ -0,0 +1,132 @@
+import copy
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+from posts import benchmark, sqlite
+
+
+def cached_templates(templates):
+    """Возвращает настройки шаблонов с кешем скомпилированных шаблонов."""
+    templates = copy.deepcopy(templates)
+    for engine in templates:
+        options = engine['OPTIONS']
+        options['loaders'] = [
+            ('django.template.loaders.cached.Loader', options['loaders'])
+        ]
+    return templates
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует набор данных и меряет задержку, пропускную способность '
+        'и число SQL-запросов страниц yatube.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=40000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--skip-generate', action='store_true',
+            help='Не генерировать данные, а мерить на тех, что есть.'
+        )
+        parser.add_argument(
+            '--mode', choices=sorted(benchmark.DRIVERS), default='client',
+            help='Тестовый клиент или локальный WSGI-сервер.'
+        )
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом.'
+        )
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Мерить только эту страницу; можно указать несколько раз.'
+        )
+        parser.add_argument(
+            '--writers', type=int, default=0,
+            help='Фоновых писателей комментариев на время прогона.'
+        )
+        parser.add_argument(
+            '--sqlite-pragmas', choices=('settings', 'baseline'),
+            default='settings',
+            help='PRAGMA из настроек или значения SQLite по умолчанию.'
+        )
+        parser.add_argument(
+            '--template-cache', action='store_true',
+            help='Мерить с кешем скомпилированных шаблонов даже при DEBUG.'
+        )
+        parser.add_argument('--seed', type=int)
+        parser.add_argument(
+            '--output', help='Файл для JSON-отчёта, чтобы сравнивать релизы.'
+        )
+
+    def handle(self, *args, **options):
+        dataset = None
+        if not options['skip_generate']:
+            dataset = benchmark.generate_dataset(
+                users=options['users'],
+                groups=options['groups'],
+                posts=options['posts'],
+                follows=options['follows'],
+                comments=options['comments'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                log=self.stdout.write,
+            )
+        overrides = {}
+        if options['sqlite_pragmas'] == 'baseline':
+            overrides['SQLITE_PRAGMAS'] = sqlite.BASELINE_PRAGMAS
+        if options['template_cache'] and not settings.TEMPLATE_CACHE:
+            overrides['TEMPLATES'] = cached_templates(settings.TEMPLATES)
+        with override_settings(**overrides):
+            # Новые соединения откроются уже с выбранными PRAGMA.
+            connections.close_all()
+            report = self.run(options)
+        connections.close_all()
+        report['dataset'] = dataset
+        report['sqlite_pragmas'] = options['sqlite_pragmas']
+        report['template_cache'] = (
+            settings.TEMPLATE_CACHE or options['template_cache']
+        )
+        for name, metrics in report['endpoints'].items():
+            self.stdout.write(
+                '{:<22} p50 {p50_ms:>8} мс  p95 {p95_ms:>8} мс  '
+                'p99 {p99_ms:>8} мс  {throughput_rps:>7} rps  '
+                'запросов {queries_avg:>6}  ошибок {errors}'.format(
+                    name, **metrics)
+            )
+        if report['writes']:
+            self.stdout.write(
+                'запись: p50 {p50_ms} мс  p95 {p95_ms} мс  '
+                '{throughput_wps} в секунду  ошибок {errors}'.format(
+                    **report['writes'])
+            )
+        if report['skipped']:
+            self.stdout.write('Пропущены: ' + ', '.join(report['skipped']))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+
+    def run(self, options):
+        try:
+            return benchmark.run_benchmark(
+                mode=options['mode'],
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                warmup=options['warmup'],
+                cold=options['cold'],
+                seed=options['seed'],
+                only=options['endpoints'],
+                writers=options['writers'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
@@ -0,0 +1,48 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from posts import bulk
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты, комментарии или подписки из NDJSON '
+        'от имени пользователя пачками bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(bulk.IMPORTERS))
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл NDJSON; по умолчанию stdin.'
+        )
+        parser.add_argument(
+            '--user', required=True,
+            help='Автор постов и комментариев или подписчик.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int,
+            help='Строк на транзакцию; по умолчанию BULK_CHUNK_SIZE.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["user"]}.')
+        importer = bulk.IMPORTERS[options['kind']](
+            user, options['chunk_size']
+        )
+        if options['path'] == '-':
+            report = importer.run(sys.stdin.buffer)
+        else:
+            with open(options['path'], 'rb') as lines:
+                report = importer.run(lines)
+        for error in report['errors']:
+            self.stderr.write(json.dumps(error, ensure_ascii=False))
+        self.stdout.write(
+            f'Создано: {report["created"]}, '
+            f'ошибок: {len(report["errors"])}'
+        )
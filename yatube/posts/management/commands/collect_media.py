@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from posts import media
+from posts.models import MediaBlob, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы картинок, на которые не ссылается ни один пост, '
+        'вместе с их вариантами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float,
+            default=media.DEFAULT_GRACE.total_seconds() / 3600,
+            help='Не трогать файлы младше этого числа часов.'
+        )
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Сначала пересчитать ссылки на файлы с нуля.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы, которые были бы удалены.'
+        )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            with transaction.atomic():
+                media.recount(Post, MediaBlob)
+        collected = media.collect(
+            timedelta(hours=options['grace_hours']), options['dry_run']
+        )
+        for name in collected:
+            self.stdout.write(name)
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(f'{verb} файлов: {len(collected)}.')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковый индекс постов.'
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild()
+        backend = type(search.get_backend()).__name__
+        self.stdout.write(f'Проиндексировано постов: {indexed} ({backend})')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from posts import timeline
+from posts.models import Follow
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Читатели, чьи ленты пересобрать; по умолчанию все.'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = Follow.objects.values_list('user_id', flat=True)
+        if options['usernames']:
+            user_ids = user_ids.filter(user__username__in=options['usernames'])
+        user_ids = user_ids.distinct()
+        for user_id in user_ids.iterator():
+            timeline.rebuild(user_id)
+        self.stdout.write(f'Пересобрано лент: {user_ids.count()}')
@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from posts.counters import recount_activity, recount_all
+from posts.models import Comment, Follow, Group, Post, UserCounters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики постов, комментариев и подписок '
+        'и время последнего поста групп с нуля.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount_all(
+                Post, Comment, Group, Follow, UserCounters, get_user_model()
+            )
+            recount_activity(Post, Group)
+        self.stdout.write('Счётчики пересчитаны.')
@@ -0,0 +1,47 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик. С --interval '
+        'повторяет копирование, изображая отстающую репликацию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять копирование каждые столько секунд.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError(
+                'Реплики не настроены: задайте YATUBE_REPLICAS.'
+            )
+        for alias in settings.REPLICA_DATABASES:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias}: копируются только базы SQLite.')
+        while True:
+            self.sync()
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def sync(self):
+        primary = connections['default']
+        primary.ensure_connection()
+        for alias in settings.REPLICA_DATABASES:
+            # Соединение реплики закрывается, чтобы оно увидело новый файл.
+            connections[alias].close()
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                # Онлайн-бэкап SQLite даёт согласованный снимок базы.
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: скопирована.')
@@ -0,0 +1,143 @@
+"""
+Учёт ссылок на файлы картинок постов и сборка мусора.
+
+Картинки лежат в хранилище по содержимому, поэтому один файл может
+принадлежать нескольким постам. Сигналы сдвигают счётчик MediaBlob при
+смене картинки и удалении поста, а collect удаляет файлы без ссылок
+вместе с их вариантами.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from posts import thumbnails
+from posts.models import MediaBlob, Post
+from posts.storage import post_image_storage
+from sorl.thumbnail import default
+
+UPLOAD_DIRECTORY = 'posts'
+DEFAULT_GRACE = timedelta(hours=1)
+
+
+def retain(name):
+    """Добавляет ссылку на файл."""
+    if not name:
+        return
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=name)], ignore_conflicts=True
+    )
+    _shift(name, 1)
+
+
+def release(name):
+    """Убирает ссылку на файл; сам файл удаляет collect."""
+    if name:
+        _shift(name, -1)
+
+
+def _shift(name, delta):
+    MediaBlob.objects.filter(name=name).update(
+        refcount=F('refcount') + delta, updated=timezone.now()
+    )
+
+
+def recount(post_model, blob_model):
+    """
+    Пересчитывает ссылки на файлы с нуля.
+
+    Модели передаются явно, чтобы функцию можно было вызвать
+    из миграции с историческими моделями.
+    """
+    references = dict(
+        post_model.objects.exclude(image='').order_by().values(
+            'image').annotate(posts=Count('pk')).values_list(
+            'image', 'posts')
+    )
+    blob_model.objects.bulk_create(
+        (blob_model(name=name) for name in references),
+        batch_size=500,
+        ignore_conflicts=True
+    )
+    for blob in blob_model.objects.iterator():
+        refcount = references.get(blob.name, 0)
+        if blob.refcount != refcount:
+            blob_model.objects.filter(pk=blob.pk).update(refcount=refcount)
+
+
+def _stored_files(directory):
+    directories, files = post_image_storage.listdir(directory)
+    for name in files:
+        yield f'{directory}/{name}'
+    for name in directories:
+        yield from _stored_files(f'{directory}/{name}')
+
+
+def _delete_variants(name):
+    """Удаляет описания вариантов картинки и файлы, которые больше ничьи."""
+    for alias in settings.POST_IMAGE_VARIANTS:
+        key = thumbnails.variants_key(name, alias)
+        variants = thumbnails.store.get(key)
+        if variants is None:
+            continue
+        thumbnails.store.delete(key)
+        # Одинаковые варианты разных картинок делят один файл.
+        for variant_name in thumbnails.unlink_variants(key, variants):
+            default.storage.delete(variant_name)
+
+
+def _claim(name, threshold):
+    """
+    Снимает файл с учёта, если ссылок на него по-прежнему нет.
+
+    Вызывается в транзакции перед удалением файла: условный DELETE берёт
+    блокировку на запись, и пост, который ссылается на файл, не может
+    закоммититься между проверкой и удалением.
+    """
+    claimed, _ = MediaBlob.objects.filter(
+        name=name, refcount__lte=0, updated__lt=threshold).delete()
+    if not claimed and MediaBlob.objects.filter(name=name).exists():
+        return False
+    # Повторная загрузка тех же байтов не пишет файл, а обновляет его
+    # время изменения.
+    return (
+        not Post.objects.filter(image=name).exists()
+        and post_image_storage.exists(name)
+        and post_image_storage.get_modified_time(name) < threshold
+    )
+
+
+def collect(grace=DEFAULT_GRACE, dry_run=False):
+    """
+    Удаляет файлы картинок, на которые не ссылается ни один пост.
+
+    Файлы младше grace не трогаются: загрузка пишет файл раньше, чем
+    коммитится пост со ссылкой на него. Возвращает имена удалённых файлов.
+    """
+    threshold = timezone.now() - grace
+    collected = set(MediaBlob.objects.filter(
+        refcount__lte=0, updated__lt=threshold).values_list('name', flat=True))
+    # Файлы, которых нет в учёте: остались от отменённых транзакций
+    # и оборванных записей.
+    known = set(MediaBlob.objects.values_list('name', flat=True))
+    if post_image_storage.exists(UPLOAD_DIRECTORY):
+        for name in _stored_files(UPLOAD_DIRECTORY):
+            if (name not in known and post_image_storage.get_modified_time(
+                    name) < threshold):
+                collected.add(name)
+    # Разошедшийся счётчик не должен стоить картинки живому посту.
+    collected -= set(Post.objects.filter(
+        image__in=collected).values_list('image', flat=True))
+    collected = sorted(collected)
+    if dry_run:
+        return collected
+    deleted = []
+    for name in collected:
+        with transaction.atomic():
+            if not _claim(name, threshold):
+                continue
+            _delete_variants(name)
+            post_image_storage.delete(name)
+        deleted.append(name)
+    return deleted
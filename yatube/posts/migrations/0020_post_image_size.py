@@ -0,0 +1,41 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:36
+
+from django.core.files.images import get_image_dimensions
+from django.db import migrations, models
+
+
+def fill_image_size(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.exclude(image='').filter(image_width__isnull=True)
+    for post in posts.only('pk', 'image').iterator():
+        try:
+            width, height = get_image_dimensions(post.image)
+        except (OSError, ValueError):
+            # Файл пропал из хранилища: заглушка возьмёт размеры рамки.
+            continue
+        finally:
+            post.image.close()
+        Post.objects.filter(pk=post.pk).update(
+            image_width=width, image_height=height
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+        migrations.RunPython(fill_image_size, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:45
+
+from django.db import migrations, models
+
+from posts.counters import recount_activity
+
+
+def fill_last_post_at(apps, schema_editor):
+    recount_activity(
+        apps.get_model('posts', 'Post'),
+        apps.get_model('posts', 'Group'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_media_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='last_post_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Последний пост'),
+        ),
+        migrations.RunPython(fill_last_post_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from posts.timeline import fill_all
+
+
+def fill_timelines(apps, schema_editor):
+    fill_all(
+        apps.get_model('posts', 'Follow'),
+        apps.get_model('posts', 'Post'),
+        apps.get_model('posts', 'TimelineEntry'),
+        apps.get_model('posts', 'UserCounters'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
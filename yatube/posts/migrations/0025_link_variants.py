@@ -0,0 +1,19 @@
+from django.db import migrations
+
+from posts.thumbnails import link_all
+
+
+def link_variants(apps, schema_editor):
+    link_all(apps.get_model('thumbnail', 'KVStore'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_fill_timelines'),
+        ('thumbnail', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_variants, migrations.RunPython.noop),
+    ]
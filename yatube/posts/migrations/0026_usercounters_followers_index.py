@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_link_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usercounters',
+            index=models.Index(fields=['followers_count'], name='counters_followers_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from posts.storage import post_image_storage
 
 User = get_user_model()
 
@@ -10,6 +11,16 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.IntegerField(
+        'Постов',
+        default=0,
+        editable=False
+    )
+    last_post_at = models.DateTimeField(
+        'Последний пост',
+        null=True,
+        editable=False
+    )
 
     def __str__(self):
         return self.title
@@ -26,25 +37,59 @@ class Post(models.Model):
         auto_now_add=True)
     author = models.ForeignKey(
         User,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
         blank=True,
         null=True,
-        on_delete=models.SET_NULL
+        on_delete=models.SET_NULL,
+        db_index=False
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        editable=False
+    )
+    comments_count = models.IntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
 
     def __str__(self):
         return self.text[:POST_LENGTH]
 
     class Meta:
         ordering = ['-pub_date']
+        # Индексы повторяют порядок лент: выборка страницы идёт по индексу
+        # без сортировки. Они же заменяют индексы внешних ключей.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+        ]
         default_related_name = 'posts'
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
@@ -54,7 +99,8 @@ class Comment(models.Model):
     post = models.ForeignKey(
         Post,
         related_name='comments',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -67,6 +113,12 @@ class Comment(models.Model):
     )
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'
+            ),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -75,12 +127,14 @@ class Follow(models.Model):
     user = models.ForeignKey(
         User,
         related_name='follower',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     author = models.ForeignKey(
         User,
         related_name='following',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
 
     class Meta:
@@ -94,5 +148,123 @@ class Follow(models.Model):
                 name='unique_following'
             )
         ]
+        # Подписки читателя ищутся по уникальному (user, author),
+        # подписчики автора — по этому индексу.
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
         verbose_name = 'Подписчик'
         verbose_name_plural = 'Подписчики'
+
+
+class UserCounters(models.Model):
+    """Счётчики пользователя, которые иначе считались бы на каждой странице."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='counters',
+        on_delete=models.CASCADE
+    )
+    posts_count = models.IntegerField('Постов', default=0)
+    followers_count = models.IntegerField('Подписчиков', default=0)
+    following_count = models.IntegerField('Подписок', default=0)
+
+    def __str__(self):
+        return str(self.user)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+        # Популярные авторы ленты подписок выбираются по этому индексу.
+        indexes = [
+            models.Index(
+                fields=['followers_count'],
+                name='counters_followers_idx'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок читателя."""
+    user = models.ForeignKey(
+        User,
+        related_name='timeline_entries',
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='timeline_entries',
+        on_delete=models.CASCADE
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+        ]
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+
+
+class SearchTerm(models.Model):
+    """
+    Запись инвертированного индекса: основа слова и пост, где она есть.
+
+    Используется, когда база не умеет SQLite FTS5.
+    """
+    term = models.CharField('Основа слова', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        related_name='search_terms',
+        on_delete=models.CASCADE
+    )
+    weight = models.PositiveIntegerField('Число вхождений', default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'],
+                name='unique_search_term'
+            )
+        ]
+        verbose_name = 'Термин поискового индекса'
+        verbose_name_plural = 'Термины поискового индекса'
+
+
+class MediaBlob(models.Model):
+    """
+    Файл картинки в хранилище по содержимому и число постов с ним.
+
+    Файлы с нулём ссылок удаляет команда collect_media.
+    """
+    name = models.CharField('Файл', max_length=255, unique=True)
+    refcount = models.IntegerField('Ссылок', default=0)
+    updated = models.DateTimeField('Изменён', auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
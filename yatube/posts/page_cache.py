@@ -0,0 +1,138 @@
+"""
+Кеш целых страниц с дырками под шапку пользователя.
+
+Страницу, отрисованную для гостя, PageCacheMiddleware кладёт в кеш по
+пути и строке запроса вместе с областями кеша лент, от которых она
+зависит (их отмечает conditional.check). Запись действует, пока версии
+областей не подняты сигналами записи постов, комментариев, групп и
+подписок, поэтому отдельного сброса страниц не нужно. Гость получает
+страницу из кеша без сессии, пользователя и ORM.
+
+Шапка и другие части, зависящие от пользователя, например вкладки
+ленты подписок, выводятся тегом fragment и обрамлены
+комментариями-метками. Если страница общая для всех
+(full_page(shared=True)), авторизованный пользователь получает ту же
+запись, в которой между метками заново отрисованы его фрагменты.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.urls import Resolver404, resolve
+from posts import conditional, feed_cache
+
+FRAGMENT = re.compile(
+    r'<!--fragment:(?P<name>[\w./-]+)-->.*?<!--/fragment-->', re.DOTALL
+)
+
+
+def full_page(shared=False):
+    """
+    Разрешает кешировать страницу представления для гостей.
+
+    shared — тело страницы не зависит от пользователя, кроме фрагментов,
+    и его можно отдавать авторизованным.
+    """
+    def decorator(view):
+        view.full_page = {'shared': shared}
+        return view
+    return decorator
+
+
+def fragment_markup(name, content):
+    return f'<!--fragment:{name}-->{content}<!--/fragment-->'
+
+
+def _page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{path}'
+
+
+def _is_guest(request):
+    # Без куки сессии пользователь — гость, и сессию можно не читать.
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+
+def _fill_fragments(request, content):
+    return FRAGMENT.sub(
+        lambda match: fragment_markup(match['name'], render_to_string(
+            match['name'], request=request
+        )),
+        content
+    )
+
+
+def _cached_response(request, entry, shared):
+    """Собирает ответ из записи или возвращает None, если она устарела."""
+    scopes = entry['scopes']
+    versions = feed_cache.get_versions(*scopes)
+    if versions != entry['versions']:
+        return None
+    guest = _is_guest(request)
+    if not guest and not (shared and request.user.is_authenticated):
+        return None
+    validators = conditional.get_validators(request, scopes, versions)
+    response = conditional.not_modified(request, *validators)
+    if response is None:
+        content = entry['content']
+        if not guest:
+            content = _fill_fragments(request, content)
+        response = HttpResponse(content, content_type=entry['content_type'])
+    return conditional.finish(request, response, validators)
+
+
+def _store(request, response):
+    state = getattr(request, '_page_state', None)
+    if (state is None or response.status_code != 200
+            or response.streaming or not _is_guest(request)
+            # Страница с CSRF-токеном принадлежит одному клиенту.
+            or request.META.get('CSRF_COOKIE_USED')):
+        return
+    scopes, versions = state
+    cache.set(_page_key(request), {
+        'scopes': scopes,
+        'versions': versions,
+        'content': response.content.decode(response.charset),
+        'content_type': response['Content-Type'],
+    }, settings.PAGE_CACHE_TIMEOUT)
+
+
+class PageCacheMiddleware:
+    """
+    Отдаёт страницы из кеша целых страниц и наполняет его.
+
+    Стоит последним, чтобы остальные промежуточные слои обрабатывали
+    и ответы из кеша.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        options = self._options(request)
+        if options is None:
+            return self.get_response(request)
+        entry = cache.get(_page_key(request))
+        if entry is not None:
+            response = _cached_response(request, entry, options['shared'])
+            if response is not None:
+                return response
+        response = self.get_response(request)
+        _store(request, response)
+        return response
+
+    def _options(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        options = getattr(match.func, 'full_page', None)
+        if options is not None:
+            # Шапке нужно имя представления, как при обычном ответе.
+            request.resolver_match = match
+        return options
@@ -0,0 +1,152 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SEPARATOR = '|'
+
+
+def encode_cursor(obj, date_field='pub_date'):
+    """
+    Упаковывает ключ (дата, id) записи в непрозрачный токен.
+
+    Запись — объект модели или словарь из .values() с полями date_field и id.
+    """
+    if isinstance(obj, dict):
+        date, pk = obj[date_field], obj['id']
+    else:
+        date, pk = getattr(obj, date_field), obj.pk
+    raw = f'{date.isoformat()}{CURSOR_SEPARATOR}{pk}'
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Распаковывает токен курсора в пару (дата, id).
+
+    Для повреждённого или чужого токена возвращает None.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = urlsafe_b64decode(padded.encode()).decode()
+        pub_date, pk = raw.rsplit(CURSOR_SEPARATOR, 1)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (ValueError, UnicodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPaginator(Paginator):
+    """
+    Пагинатор по ключу (дата, id) без COUNT(*) и OFFSET.
+
+    Страница выбирается условием «строго после/до курсора» по составному
+    индексу, поэтому глубокая страница стоит столько же, сколько первая.
+    Общее число страниц неизвестно: num_pages только сообщает Page,
+    есть ли следующая страница. По умолчанию листает посты от новых
+    к старым; descending=False листает от старых к новым.
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 descending=True):
+        self.date_field = date_field
+        self.descending = descending
+        order = '-' if descending else ''
+        super().__init__(
+            object_list.order_by(f'{order}{date_field}', f'{order}pk'),
+            per_page
+        )
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    def get_cursor_page(self, params):
+        """
+        Возвращает страницу по параметрам запроса.
+
+        Понимает ?after= и ?before= с токенами курсора, а старые ссылки
+        вида ?page=N обслуживает без подсчёта общего числа записей.
+        """
+        after = decode_cursor(params.get('after'))
+        if after is not None:
+            return self._after(after)
+        before = decode_cursor(params.get('before'))
+        if before is not None:
+            return self._before(before)
+        try:
+            number = max(int(params.get('page', 1)), 1)
+        except (TypeError, ValueError):
+            number = 1
+        return self._numbered(number)
+
+    def dump_page(self, page):
+        """Возвращает состояние страницы, пригодное для кеша."""
+        return (
+            list(page.object_list), page.number, self._num_pages,
+            self.next_cursor, self.previous_cursor
+        )
+
+    def load_page(self, state):
+        """Восстанавливает страницу из состояния dump_page."""
+        rows, number, self._num_pages, self.next_cursor, \
+            self.previous_cursor = state
+        return Page(rows, number, self)
+
+    def _beyond(self, key, forward, key_field='pk'):
+        """Условие «строго дальше ключа» в направлении листания."""
+        date, pk = key
+        lookup = 'lt' if forward == self.descending else 'gt'
+        return (
+            Q(**{f'{self.date_field}__{lookup}': date})
+            | Q(**{self.date_field: date, f'{key_field}__{lookup}': pk})
+        )
+
+    def _rows(self, key, forward, limit, offset=0):
+        """
+        Возвращает limit записей за ключом key в направлении листания.
+
+        Без ключа записи отсчитываются от начала ленты.
+        """
+        rows = self.object_list
+        if key is not None:
+            rows = rows.filter(self._beyond(key, forward))
+        if not forward:
+            rows = rows.reverse()
+        return list(rows[offset:offset + limit])
+
+    def _after(self, key):
+        rows = self._rows(key, True, self.per_page + 1)
+        return self._build(rows[:self.per_page], 2, len(rows) > self.per_page)
+
+    def _before(self, key):
+        rows = self._rows(key, False, self.per_page + 1)
+        number = 2 if len(rows) > self.per_page else 1
+        rows = rows[:self.per_page][::-1]
+        return self._build(rows, number, True)
+
+    def _numbered(self, number):
+        bottom = (number - 1) * self.per_page
+        rows = self._rows(None, True, self.per_page + 1, bottom)
+        return self._build(
+            rows[:self.per_page], number, len(rows) > self.per_page
+        )
+
+    def _build(self, rows, number, has_next):
+        if not rows:
+            has_next = False
+        self._num_pages = number + 1 if has_next else number
+        if has_next:
+            self.next_cursor = encode_cursor(rows[-1], self.date_field)
+        if number > 1 and rows:
+            self.previous_cursor = encode_cursor(rows[0], self.date_field)
+        return Page(rows, number, self)
@@ -0,0 +1,103 @@
+"""
+Чтение с реплик базы для страниц только на чтение.
+
+ReplicaMiddleware на время представления из REPLICA_VIEWS выбирает одну
+из реплик REPLICA_DATABASES, и ReplicaRouter направляет туда чтения.
+Записи всегда идут в default. Реплики отстают от основной базы, поэтому
+после записи клиент получает куку, и пока она жива, его чтения тоже идут
+в default: автор сразу видит свой пост, комментарий или подписку.
+Сессии читаются только из default, иначе свежий вход мог бы потеряться,
+как и очередь фоновых задач.
+
+Прочитанное с реплики попадает в общие кеши под версиями, которые запись
+уже подняла. Поэтому страница, чьи области кеша лент менялись за
+REPLICA_PIN_SECONDS, читается из default (avoid_lag), и в кеш не попадут
+данные до записи. Тело потокового ответа читается после представления,
+и выбранная база действует, пока поток не закрыт.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+
+PIN_COOKIE = 'pin_primary'
+PRIMARY = 'default'
+PRIMARY_APPS = ('sessions', 'core')
+# Служебные записи не закрепляют клиента: их данные он не читает.
+UNPINNED_APPS = ('sessions', 'thumbnail', 'core')
+
+_state = threading.local()
+
+
+def read_database():
+    """Возвращает базу для чтений текущего запроса."""
+    return getattr(_state, 'database', None) or PRIMARY
+
+
+def avoid_lag(changed):
+    """Переводит чтения в default, если данные менялись позже changed."""
+    if time.time() - changed < settings.REPLICA_PIN_SECONDS:
+        _state.database = None
+
+
+class ReplicaRouter:
+    """Направляет чтения страниц на реплику, а записи — в default."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return PRIMARY
+        return read_database()
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in UNPINNED_APPS:
+            _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии одной базы.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == PRIMARY
+
+
+class ReplicaMiddleware:
+    """Выбирает базу для чтений и закрепляет писавших за default."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.database = None
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            if _state.wrote:
+                response.set_cookie(
+                    PIN_COOKIE, '1',
+                    max_age=settings.REPLICA_PIN_SECONDS, httponly=True
+                )
+            if response.streaming and _state.database:
+                response.streaming_content = self._route(
+                    response.streaming_content, _state.database
+                )
+            return response
+        finally:
+            _state.database = None
+
+    def _route(self, content, database):
+        # Поток читается сервером уже после выхода из middleware.
+        _state.database = database
+        try:
+            yield from content
+        finally:
+            _state.database = None
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (settings.REPLICA_DATABASES
+                and request.method in ('GET', 'HEAD')
+                and PIN_COOKIE not in request.COOKIES
+                and request.resolver_match.view_name
+                in settings.REPLICA_VIEWS):
+            _state.database = random.choice(settings.REPLICA_DATABASES)
@@ -0,0 +1,270 @@
+"""
+Полнотекстовый поиск по постам.
+
+Текст поста разбивается на слова, стоп-слова выбрасываются, остальное
+сводится к основам стеммером Snowball (русским для кириллицы,
+английским для латиницы). Основы хранятся в инвертированном индексе:
+в виртуальной таблице SQLite FTS5, если база её поддерживает, или в
+обычной таблице SearchTerm. Индекс обновляется сигналами при записи
+поста и пересобирается командой rebuild_search_index.
+"""
+import math
+import re
+import threading
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import lru_cache
+
+import snowballstemmer
+from django.core.paginator import Page, Paginator
+from django.db import connection, transaction
+from django.db.models import (Case, Count, ExpressionWrapper, F, FloatField,
+                              Q, Sum, Value, When)
+from posts.models import Post, SearchTerm
+
+FTS_TABLE = 'posts_post_fts'
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('[а-я]')
+MAX_QUERY_TERMS = 10
+INDEX_BATCH_SIZE = 500
+STEM_CACHE_SIZE = 50000
+STOP_WORDS = frozenset((
+    'а без более бы был была были было быть в вам вас ведь во вот все '
+    'всего всех вы где да даже для до его ее ей ему если есть еще же за '
+    'здесь и из или им их к как какой когда кто ли либо мне может мы на '
+    'над надо наш не него нее нет ни них но ну о об однако он она они '
+    'оно от очень по под при про с со так также такой там те тем то того '
+    'тоже только том ты у уж уже хотя чего чей чем что чтобы эта эти '
+    'это этот я a an and are as at be by for from in is it of on or the '
+    'to with'
+).split())
+
+_stemmers = threading.local()
+
+
+# Основа слова не меняется, а слова в текстах часто повторяются:
+# при пакетной индексации стемминг был самой дорогой частью записи.
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def _stem(word):
+    # Стеммеры Snowball хранят состояние, поэтому у каждого потока свои.
+    if not hasattr(_stemmers, 'russian'):
+        _stemmers.russian = snowballstemmer.stemmer('russian')
+        _stemmers.english = snowballstemmer.stemmer('english')
+    if CYRILLIC_RE.search(word):
+        return _stemmers.russian.stemWord(word)
+    return _stemmers.english.stemWord(word)
+
+
+def tokenize(text):
+    """Возвращает основы значимых слов текста в порядке появления."""
+    words = WORD_RE.findall(text.lower().replace('ё', 'е'))
+    return [_stem(word) for word in words if word not in STOP_WORDS]
+
+
+def query_terms(query):
+    """Возвращает уникальные основы слов запроса."""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def encode_rank_cursor(score, post_id):
+    raw = f'{score!r}|{post_id}'
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_rank_cursor(token):
+    """Распаковывает токен в пару (score, id) или возвращает None."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        score, post_id = urlsafe_b64decode(
+            padded.encode()).decode().rsplit('|', 1)
+        return float(score), int(post_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+class FtsBackend:
+    """Индекс в виртуальной таблице SQLite FTS5 с ранжированием bm25."""
+
+    def index(self, post_id, text, created=False):
+        with connection.cursor() as cursor:
+            if not created:
+                cursor.execute(
+                    f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+                )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, terms) VALUES (%s, %s)',
+                [post_id, ' '.join(tokenize(text))]
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, terms, after, limit):
+        """Возвращает пары (score, id); меньший score — лучше."""
+        match = ' '.join(f'"{term}"' for term in terms)
+        sql = (
+            f'SELECT bm25({FTS_TABLE}) AS score, rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s'
+        )
+        params = [match]
+        if after is not None:
+            sql += (
+                f' AND (bm25({FTS_TABLE}) > %s'
+                f' OR (bm25({FTS_TABLE}) = %s AND rowid > %s))'
+            )
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY score, rowid LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class TableBackend:
+    """
+    Индекс в таблице SearchTerm для баз без FTS5.
+
+    Ранг — сумма вхождений основ, взвешенных обратной частотой основы;
+    score берётся со знаком минус, чтобы порядок совпадал с bm25.
+    Модель терминов передаётся явно, чтобы индекс можно было заполнить
+    из миграции с исторической моделью.
+    """
+
+    def __init__(self, term_model=SearchTerm):
+        self.term_model = term_model
+
+    def index(self, post_id, text, created=False):
+        weights = {}
+        for term in tokenize(text):
+            term = term[:self.term_model._meta.get_field('term').max_length]
+            weights[term] = weights.get(term, 0) + 1
+        if not created:
+            self.term_model.objects.filter(post_id=post_id).delete()
+        self.term_model.objects.bulk_create(
+            self.term_model(term=term, post_id=post_id, weight=weight)
+            for term, weight in weights.items()
+        )
+
+    def remove(self, post_id):
+        self.term_model.objects.filter(post_id=post_id).delete()
+
+    def clear(self):
+        self.term_model.objects.all().delete()
+
+    def search(self, terms, after, limit):
+        frequencies = dict(
+            self.term_model.objects.filter(term__in=terms).values(
+                'term').annotate(posts=Count('id')).values_list(
+                'term', 'posts')
+        )
+        if len(frequencies) < len(terms):
+            return []
+        score = Sum(Case(
+            *(
+                When(term=term, then=ExpressionWrapper(
+                    F('weight') * Value(-1 / (1 + math.log(posts))),
+                    output_field=FloatField()
+                ))
+                for term, posts in frequencies.items()
+            ),
+            output_field=FloatField()
+        ))
+        rows = self.term_model.objects.filter(term__in=terms).values(
+            'post_id').annotate(
+            matched=Count('term', distinct=True), score=score
+        ).filter(matched=len(terms))
+        if after is not None:
+            rows = rows.filter(
+                Q(score__gt=after[0])
+                | Q(score=after[0], post_id__gt=after[1])
+            )
+        rows = rows.order_by('score', 'post_id')[:limit]
+        return [(row['score'], row['post_id']) for row in rows]
+
+
+_fts_available = {}
+
+
+def get_backend():
+    """Выбирает FTS5, если таблица индекса есть в базе, иначе таблицу."""
+    key = connection.settings_dict['NAME']
+    if key not in _fts_available:
+        _fts_available[key] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return FtsBackend() if _fts_available[key] else TableBackend()
+
+
+def index_post(post, created=False):
+    get_backend().index(post.pk, post.text, created)
+
+
+def remove_post(post_id):
+    get_backend().remove(post_id)
+
+
+def index_queryset(queryset, backend=None):
+    """Индексирует посты queryset пачками."""
+    backend = backend or get_backend()
+    posts = queryset.order_by().values_list('pk', 'text')
+    indexed = 0
+    with transaction.atomic():
+        for post_id, text in posts.iterator(chunk_size=INDEX_BATCH_SIZE):
+            backend.index(post_id, text)
+            indexed += 1
+    return indexed
+
+
+def rebuild():
+    """Пересобирает индекс по всем постам."""
+    with transaction.atomic():
+        get_backend().clear()
+        return index_queryset(Post.objects.all())
+
+
+class SearchPaginator(Paginator):
+    """
+    Курсорный пагинатор по рангу результатов поиска.
+
+    Как и CursorPaginator, не считает общее число результатов:
+    курсор ?after= хранит (score, id) последнего показанного поста.
+    """
+
+    def __init__(self, query, per_page):
+        super().__init__([], per_page)
+        self.terms = query_terms(query)
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    def get_cursor_page(self, params):
+        after = decode_rank_cursor(params.get('after'))
+        rows = []
+        if self.terms:
+            rows = get_backend().search(self.terms, after, self.per_page + 1)
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for _, post_id in rows]
+        )
+        object_list = [
+            posts[post_id] for _, post_id in rows if post_id in posts
+        ]
+        number = 1 if after is None else 2
+        self._num_pages = number + 1 if has_next else number
+        if has_next:
+            self.next_cursor = encode_rank_cursor(*rows[-1])
+        return Page(object_list, number, self)
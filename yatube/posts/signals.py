@@ -0,0 +1,268 @@
+from django.core.files.images import get_image_dimensions
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from posts import (counters, feed_cache, media, search, sitemaps, thumbnails,
+                   timeline)
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    """Запоминает прежние группу и картинку, чтобы обработать их смену."""
+    instance._previous_group_id = None
+    instance._previous_image = None
+    if instance.pk is None:
+        return
+    previous = Post.objects.filter(pk=instance.pk).values(
+        'group_id', 'image').first()
+    if previous is not None:
+        instance._previous_group_id = previous['group_id']
+        instance._previous_image = previous['image']
+
+
+@receiver(pre_save, sender=Post)
+def store_image_size(sender, instance, **kwargs):
+    """Запоминает размеры новой картинки, пока она ещё в памяти."""
+    image = instance.image
+    if image.name == getattr(instance, '_previous_image', None):
+        return
+    instance.image_width = instance.image_height = None
+    # Уже сохранённый файл не перечитывается из хранилища.
+    if image and not image._committed:
+        instance.image_width, instance.image_height = (
+            get_image_dimensions(image)
+        )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, created=False, **kwargs):
+    scopes = feed_cache.post_scopes(instance.author_id, instance.group_id)
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id not in (None, instance.group_id):
+        scopes.append(f'{feed_cache.FEED_GROUP}:{previous_group_id}')
+    # Ленты подписчиков нового поста сбрасывает его раскладка.
+    if not (created and timeline.is_enabled()):
+        scopes += timeline.follower_scopes(instance.author_id)
+    feed_cache.bump(*scopes)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_sitemaps(sender, instance, **kwargs):
+    # Пост меняет lastmod профиля автора и своей группы.
+    group_ids = {
+        instance.group_id, getattr(instance, '_previous_group_id', None)
+    } - {None}
+    feed_cache.bump(
+        sitemaps.shard_scope(sitemaps.POSTS, instance.pk),
+        sitemaps.shard_scope(sitemaps.PROFILES, instance.author_id),
+        *(sitemaps.shard_scope(sitemaps.GROUPS, pk) for pk in group_ids)
+    )
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_card(sender, instance, created, **kwargs):
+    if not created:
+        feed_cache.bump(f'{feed_cache.CARD_POST}:{instance.pk}')
+
+
+def _author_scopes(author_id):
+    """Возвращает области закешированных страниц с именем автора."""
+    group_ids = Post.objects.filter(
+        author_id=author_id, group__isnull=False
+    ).values_list('group_id', flat=True).distinct()
+    # Имя автора комментария есть на странице поста, а она в области
+    # профиля автора поста.
+    commented_ids = Post.objects.filter(
+        comments__author_id=author_id
+    ).values_list('author_id', flat=True).distinct()
+    return [
+        feed_cache.FEED_INDEX,
+        f'{feed_cache.FEED_PROFILE}:{author_id}',
+        *(f'{feed_cache.FEED_GROUP}:{group_id}' for group_id in group_ids),
+        *(f'{feed_cache.FEED_PROFILE}:{post_author_id}'
+          for post_author_id in commented_ids),
+        *timeline.follower_scopes(author_id),
+    ]
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cards(sender, instance, created, update_fields,
+                            **kwargs):
+    # Вход меняет только last_login, которого на страницах нет.
+    if not created and update_fields != frozenset(('last_login',)):
+        feed_cache.bump(
+            f'{feed_cache.CARD_AUTHOR}:{instance.pk}',
+            *_author_scopes(instance.pk),
+            # Имя пользователя — часть адреса профиля в карте сайта.
+            sitemaps.shard_scope(sitemaps.PROFILES, instance.pk)
+        )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, **kwargs):
+    if Comment.post.is_cached(instance):
+        # Пост уже прочитан представлением, второй запрос не нужен.
+        post = {
+            'author_id': instance.post.author_id,
+            'group_id': instance.post.group_id,
+        }
+    else:
+        post = Post.objects.filter(pk=instance.post_id).values(
+            'author_id', 'group_id').first()
+    # При каскадном удалении поста ленты уже сброшены его сигналом.
+    if post is not None:
+        feed_cache.bump(
+            *feed_cache.post_scopes(post['author_id'], post['group_id']),
+            *timeline.follower_scopes(post['author_id'])
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    feed_cache.bump(
+        feed_cache.SCOPE_ALL,
+        sitemaps.shard_scope(sitemaps.GROUPS, instance.pk)
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, **kwargs):
+    feed_cache.bump(
+        feed_cache.follow_scope(instance.user_id),
+        # Число подписчиков на странице автора и у его постов.
+        f'{feed_cache.FEED_PROFILE}:{instance.author_id}',
+    )
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created and timeline.is_enabled():
+        timeline.fan_out_posts.delay(
+            instance.author_id,
+            [(instance.pk, instance.pub_date.isoformat())]
+        )
+
+
+# Счётчик сдвигается раньше дозаполнения ленты: по числу подписчиков
+# выбираются популярные авторы, которые не раскладываются.
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        _shift_follow(instance, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    _shift_follow(instance, -1)
+
+
+def _shift_follow(follow, delta):
+    counters.shift(
+        UserCounters.objects.filter(user_id=follow.user_id),
+        following_count=delta
+    )
+    counters.shift(
+        UserCounters.objects.filter(user_id=follow.author_id),
+        followers_count=delta
+    )
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created and timeline.is_enabled():
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    if timeline.is_enabled():
+        timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=User)
+def create_user_counters(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        counters.shift(
+            UserCounters.objects.filter(user_id=instance.author_id),
+            posts_count=1
+        )
+        _shift_group(instance.group_id, 1)
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        _shift_group(previous_group_id, -1)
+        _shift_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.shift(
+        UserCounters.objects.filter(user_id=instance.author_id),
+        posts_count=-1
+    )
+    _shift_group(instance.group_id, -1)
+
+
+def _shift_group(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=F('posts_count') + delta,
+            # Пересчитывается тем же запросом: пост мог уйти из группы.
+            last_post_at=counters.latest(Post, 'group', 'pub_date'),
+        )
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.shift(
+            Post.objects.filter(pk=instance.post_id), comments_count=1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.shift(Post.objects.filter(pk=instance.post_id), comments_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, created, **kwargs):
+    search.index_post(instance, created)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def prepare_thumbnails(sender, instance, **kwargs):
+    image = instance.image.name
+    if image and image != getattr(instance, '_previous_image', None):
+        thumbnails.schedule(image)
+
+
+@receiver(post_save, sender=Post)
+def reference_image(sender, instance, **kwargs):
+    image = instance.image.name
+    previous_image = getattr(instance, '_previous_image', None)
+    if image != previous_image:
+        media.release(previous_image)
+        media.retain(image)
+
+
+@receiver(post_delete, sender=Post)
+def dereference_image(sender, instance, **kwargs):
+    media.release(instance.image.name)
@@ -0,0 +1,255 @@
+"""
+Карта сайта: индекс и шарды для постов, профилей и групп.
+
+Шард — диапазон id из SITEMAP_SHARD_SIZE записей, поэтому запись всегда
+попадает в один и тот же шард, и новый пост меняет только последний.
+Шард читается пачками по условию «id больше последнего прочитанного»,
+без OFFSET, и отдаётся потоком. У каждого шарда своя область кеша лент:
+её поднимают сигналы записи постов, групп и пользователей, и готовый XML
+шарда и его lastmod в индексе кешируются до следующей записи в шард.
+lastmod берётся из данных: дата поста, последнего поста автора или
+группы.
+"""
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.http import RFC3986_SUBDELIMS
+from django.views.decorators.http import require_safe
+from posts import conditional
+from posts.models import Group, Post, User
+
+POSTS = 'posts'
+PROFILES = 'profiles'
+GROUPS = 'groups'
+CONTENT_TYPE = 'application/xml; charset=utf-8'
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def shard_of(pk):
+    return (pk - 1) // settings.SITEMAP_SHARD_SIZE
+
+
+def _scope(section, number):
+    return f'sitemap:{section}:{number}'
+
+
+def shard_scope(section, pk):
+    """Возвращает область кеша шарда, в который попадает запись pk."""
+    return _scope(section, shard_of(pk))
+
+
+def _window(queryset, start, end, field='pk'):
+    return queryset.filter(
+        **{f'{field}__gt': start, f'{field}__lte': end}
+    ).order_by(field)
+
+
+class Section:
+    """
+    Раздел карты сайта.
+
+    Наследники задают rows — строки (id, аргумент URL, lastmod) записей
+    с id из диапазона и lastmod — наибольший lastmod диапазона.
+    """
+
+    name = None
+    model = None
+    url_name = None
+    # Аргумент, который подходит конвертеру пути и не встречается в URL.
+    sentinel = 'sitemap-arg'
+
+    def rows(self, start, end):
+        raise NotImplementedError
+
+    def lastmod(self, start, end):
+        raise NotImplementedError
+
+    def url_parts(self):
+        """Делит путь URL на части до и после аргумента."""
+        return reverse(self.url_name, args=(self.sentinel,)).split(
+            str(self.sentinel), 1
+        )
+
+    def shards(self):
+        """Возвращает номера шардов до шарда последней записи."""
+        last = self.model.objects.aggregate(last=Max('pk'))['last']
+        return range(shard_of(last) + 1) if last else range(0)
+
+    def bounds(self, shard):
+        size = settings.SITEMAP_SHARD_SIZE
+        return shard * size, (shard + 1) * size
+
+    def iter_rows(self, shard):
+        """Выдаёт строки шарда, читая их пачками по id."""
+        last, end = self.bounds(shard)
+        chunk_size = settings.SITEMAP_CHUNK_SIZE
+        while True:
+            count = 0
+            for row in self.rows(last, end)[:chunk_size].iterator():
+                count += 1
+                last = row[0]
+                yield row
+            if count < chunk_size:
+                return
+
+
+class PostSection(Section):
+    name = POSTS
+    model = Post
+    url_name = 'posts:post_detail'
+    sentinel = 10 ** 12
+
+    def rows(self, start, end):
+        return _window(Post.objects, start, end).values_list(
+            'pk', 'pk', 'pub_date'
+        )
+
+    def lastmod(self, start, end):
+        return _window(Post.objects, start, end).aggregate(
+            lastmod=Max('pub_date')
+        )['lastmod']
+
+
+class ProfileSection(Section):
+    """Профили без постов пусты, в карту попадают только авторы."""
+
+    name = PROFILES
+    model = User
+    url_name = 'posts:profile'
+
+    def rows(self, start, end):
+        return _window(User.objects, start, end).annotate(
+            lastmod=Max('posts__pub_date')
+        ).filter(lastmod__isnull=False).values_list(
+            'pk', 'username', 'lastmod'
+        )
+
+    def lastmod(self, start, end):
+        return _window(Post.objects, start, end, 'author_id').aggregate(
+            lastmod=Max('pub_date')
+        )['lastmod']
+
+
+class GroupSection(Section):
+    name = GROUPS
+    model = Group
+    url_name = 'posts:group_list'
+
+    def rows(self, start, end):
+        return _window(Group.objects, start, end).values_list(
+            'pk', 'slug', 'last_post_at'
+        )
+
+    def lastmod(self, start, end):
+        return _window(Group.objects, start, end).aggregate(
+            lastmod=Max('last_post_at')
+        )['lastmod']
+
+
+SECTIONS = {
+    section.name: section
+    for section in (PostSection(), ProfileSection(), GroupSection())
+}
+
+
+def _w3c(date):
+    return date.replace(microsecond=0).isoformat() if date else None
+
+
+def _entry(tag, loc, lastmod):
+    lastmod = f'<lastmod>{lastmod}</lastmod>' if lastmod else ''
+    return f'<{tag}><loc>{escape(loc)}</loc>{lastmod}</{tag}>\n'
+
+
+def _shard_lastmods(shards, versions):
+    """Возвращает lastmod шардов, считая только сброшенные записью."""
+    keys = [
+        f'sitemap_lastmod:{section.name}:{number}:{version}'
+        for (section, number), version in zip(shards, versions)
+    ]
+    found = cache.get_many(keys)
+    missing = {}
+    for (section, number), key in zip(shards, keys):
+        if key not in found:
+            found[key] = missing[key] = _w3c(
+                section.lastmod(*section.bounds(number))
+            )
+    cache.set_many(missing, settings.SITEMAP_CACHE_TIMEOUT)
+    return [found[key] for key in keys]
+
+
+@require_safe
+@conditional.conditional
+def index(request):
+    shards = [
+        (section, number)
+        for section in SECTIONS.values() for number in section.shards()
+    ]
+    conditional.check(request, [
+        _scope(section.name, number) for section, number in shards
+    ])
+    _, versions = request._page_state
+    lastmods = _shard_lastmods(shards, versions)
+    parts = [XML_HEADER, f'<sitemapindex xmlns="{XMLNS}">\n']
+    for (section, number), lastmod in zip(shards, lastmods):
+        loc = request.build_absolute_uri(reverse(
+            'posts:sitemap', args=(section.name, number)
+        ))
+        parts.append(_entry('sitemap', loc, lastmod))
+    parts.append('</sitemapindex>\n')
+    return HttpResponse(''.join(parts), content_type=CONTENT_TYPE)
+
+
+def _render_shard(request, section, number):
+    # URL строк различаются только аргументом, и reverse на каждую
+    # строку был бы самой дорогой частью шарда.
+    head, tail = section.url_parts()
+    head = request.build_absolute_uri(head)
+    yield XML_HEADER
+    yield f'<urlset xmlns="{XMLNS}">\n'
+    for _, arg, lastmod in section.iter_rows(number):
+        loc = head + quote(str(arg), safe=RFC3986_SUBDELIMS + '/~:@') + tail
+        yield _entry('url', loc, _w3c(lastmod))
+    yield '</urlset>\n'
+
+
+def _store(parts, key):
+    chunk = []
+    content = []
+    for part in parts:
+        chunk.append(part)
+        if len(chunk) == settings.SITEMAP_CHUNK_SIZE:
+            content.append(''.join(chunk))
+            chunk = []
+            yield content[-1]
+    content.append(''.join(chunk))
+    yield content[-1]
+    cache.set(key, ''.join(content), settings.SITEMAP_CACHE_TIMEOUT)
+
+
+@require_safe
+@conditional.conditional
+def shard(request, section, number):
+    if section not in SECTIONS:
+        raise Http404
+    section = SECTIONS[section]
+    conditional.check(request, [_scope(section.name, number)])
+    _, (version,) = request._page_state
+    key = (f'sitemap:{section.name}:{number}:{version}:'
+           f'{request.get_host()}')
+    content = cache.get(key)
+    if content is not None:
+        return HttpResponse(content, content_type=CONTENT_TYPE)
+    # Шарда за последней записью нет: пустой ответ не кешируется.
+    if number not in section.shards():
+        raise Http404
+    return StreamingHttpResponse(
+        _store(_render_shard(request, section, number), key),
+        content_type=CONTENT_TYPE
+    )
@@ -0,0 +1,66 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+DEFAULT_FILE_MODE = 0o644
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла — хеш его содержимого.
+
+    Папка из upload_to и расширение сохраняются, имя заменяется на
+    SHA-256 байтов: posts/photo.jpg → posts/ab/cd/abcd….jpg. Повторная
+    загрузка тех же байтов не пишет файл, а только обновляет время его
+    изменения, и возвращает то же имя.
+    Файл с таким именем всегда хранит те же байты, поэтому запись
+    заменяет его атомарно и гонка двух одинаковых загрузок безвредна.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return '/'.join(filter(None, (
+            directory, digest[:2], digest[2:4], digest + extension
+        )))
+
+    def get_available_name(self, name, max_length=None):
+        # Имя задаётся содержимым в _save: суффиксы не нужны.
+        return name
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        full_path = self.path(name)
+        try:
+            # Свежее время изменения не даёт сборке мусора удалить файл,
+            # пока коммитится пост, который на него сошлётся.
+            os.utime(full_path)
+            return name
+        except FileNotFoundError:
+            pass
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        if hasattr(content, 'temporary_file_path'):
+            file_move_safe(
+                content.temporary_file_path(), full_path,
+                allow_overwrite=True
+            )
+        else:
+            with tempfile.NamedTemporaryFile(
+                    dir=directory, delete=False) as temporary:
+                for chunk in content.chunks():
+                    temporary.write(chunk)
+            os.replace(temporary.name, full_path)
+        os.chmod(full_path, self.file_permissions_mode or DEFAULT_FILE_MODE)
+        return name
+
+
+post_image_storage = ContentAddressedStorage()
@@ -0,0 +1,214 @@
+"""
+Ленты RSS и Atom: общая лента, группы и авторы.
+
+Лента отдаётся потоком: конверт ленты пишется до записей, записи
+читаются пачками по ключу (дата, id), как в CursorPaginator, и каждая
+пачка уходит клиенту сразу после отрисовки. ETag и Last-Modified
+считаются по областям кеша лент, как у HTML-страниц, поэтому
+агрегатор, который опрашивает неизменившуюся ленту, получает 304 без
+запросов к постам. Готовый XML кешируется по версиям областей и
+отдаётся из кеша целиком, пока запись не поднимет версию.
+"""
+import io
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import feedgenerator, timezone
+from django.utils.xmlutils import SimplerXMLGenerator
+from django.views.decorators.http import require_safe
+from posts import conditional, feed_cache, groups
+from posts.models import Post, User
+from posts.paginator import CursorPaginator
+
+TITLE_LENGTH = 60
+
+
+class StreamingFeedMixin:
+    """Пишет ленту feedgenerator кусками: конверт, пачки записей, конец."""
+
+    item_element = None
+
+    def write_items(self, handler):
+        # Записи пишет stream, здесь только место для них в конверте.
+        self._items_offset = len(self._buffer.getvalue())
+
+    def latest_post_date(self):
+        return self.feed['updated']
+
+    def stream(self, chunks):
+        """Выдаёт XML ленты; chunks — пачки записей для add_item."""
+        self._buffer = buffer = io.StringIO()
+        self.write(buffer, 'utf-8')
+        envelope = buffer.getvalue()
+        yield envelope[:self._items_offset]
+        handler = SimplerXMLGenerator(buffer, 'utf-8')
+        for chunk in chunks:
+            buffer.seek(0)
+            buffer.truncate()
+            for item in chunk:
+                self.add_item(**item)
+                item = self.items.pop()
+                handler.startElement(
+                    self.item_element, self.item_attributes(item)
+                )
+                self.add_item_elements(handler, item)
+                handler.endElement(self.item_element)
+            yield buffer.getvalue()
+        yield envelope[self._items_offset:]
+
+
+class RssFeed(StreamingFeedMixin, feedgenerator.Rss201rev2Feed):
+    item_element = 'item'
+
+
+class AtomFeed(StreamingFeedMixin, feedgenerator.Atom1Feed):
+    item_element = 'entry'
+
+
+FORMATS = {
+    'rss': RssFeed,
+    'atom': AtomFeed,
+}
+
+
+def iter_posts(queryset, limit, chunk_size=None):
+    """
+    Выдаёт пачки последних постов queryset, не больше limit постов.
+
+    Каждая пачка читается условием «старше последнего поста прошлой
+    пачки» по составному индексу, без OFFSET.
+    """
+    chunk_size = chunk_size or settings.SYNDICATION_CHUNK_SIZE
+    paginator = CursorPaginator(queryset, min(chunk_size, limit))
+    params = {}
+    while limit > 0:
+        paginator.next_cursor = None
+        posts = list(paginator.get_cursor_page(params))[:limit]
+        if not posts:
+            return
+        yield posts
+        limit -= len(posts)
+        if paginator.next_cursor is None:
+            return
+        params = {'after': paginator.next_cursor}
+
+
+def _author_name(user):
+    return user.get_full_name() or user.username
+
+
+def _items(request, chunks):
+    for posts in chunks:
+        items = []
+        for post in posts:
+            link = request.build_absolute_uri(
+                reverse('posts:post_detail', args=(post.pk,))
+            )
+            title = post.text.splitlines()[0] if post.text else ''
+            items.append({
+                'title': title[:TITLE_LENGTH],
+                'link': link,
+                'unique_id': link,
+                'description': post.text,
+                'pubdate': post.pub_date,
+                'author_name': _author_name(post.author),
+                'categories': [post.group.title] if post.group else None,
+            })
+        yield items
+
+
+def _chain(first, chunks):
+    if first:
+        yield first
+    yield from chunks
+
+
+def _store(chunks, key):
+    parts = []
+    for part in chunks:
+        parts.append(part)
+        yield part
+    cache.set(key, ''.join(parts), settings.SYNDICATION_CACHE_TIMEOUT)
+
+
+def _feed_key(request, fmt):
+    _, versions = request._page_state
+    version = '.'.join(str(value) for value in versions)
+    # Ссылки в ленте абсолютные, поэтому ключ зависит и от хоста.
+    return f'syndication:{fmt}:{request.get_host()}{request.path}:{version}'
+
+
+def render_feed(request, fmt, scopes, queryset, title, link, description):
+    """
+    Отдаёт ленту постов queryset в формате fmt.
+
+    scopes — области кеша лент, от которых лента зависит.
+    """
+    if fmt not in FORMATS:
+        raise Http404
+    conditional.check(request, scopes)
+    feed_class = FORMATS[fmt]
+    key = _feed_key(request, fmt)
+    content = cache.get(key)
+    if content is not None:
+        return HttpResponse(content, content_type=feed_class.content_type)
+    chunks = iter_posts(
+        queryset.select_related('author', 'group'), settings.SYNDICATION_ITEMS
+    )
+    # Первая пачка читается здесь: её дата нужна конверту, а остальные
+    # читаются, пока клиент принимает начало ленты.
+    first = next(chunks, [])
+    feed = feed_class(
+        title=title,
+        link=request.build_absolute_uri(link),
+        description=description,
+        language=settings.LANGUAGE_CODE,
+        feed_url=request.build_absolute_uri(),
+        updated=first[0].pub_date if first else timezone.now(),
+    )
+    stream = feed.stream(_items(request, _chain(first, chunks)))
+    return StreamingHttpResponse(
+        _store(stream, key), content_type=feed_class.content_type
+    )
+
+
+@require_safe
+@conditional.conditional
+def index(request, fmt):
+    return render_feed(
+        request, fmt, feed_cache.feed_scopes(feed_cache.FEED_INDEX),
+        Post.objects.all(),
+        title='Последние обновления на сайте',
+        link=reverse('posts:index'),
+        description='Последние записи всех авторов.',
+    )
+
+
+@require_safe
+@conditional.conditional
+def group_posts(request, slug, fmt):
+    group = groups.get_group(slug)
+    return render_feed(
+        request, fmt, feed_cache.feed_scopes(feed_cache.FEED_GROUP, group.id),
+        Post.objects.filter(group_id=group.id),
+        title=group.title,
+        link=reverse('posts:group_list', args=(group.slug,)),
+        description=group.description,
+    )
+
+
+@require_safe
+@conditional.conditional
+def profile(request, username, fmt):
+    author = get_object_or_404(User, username=username)
+    return render_feed(
+        request, fmt,
+        feed_cache.feed_scopes(feed_cache.FEED_PROFILE, author.id),
+        Post.objects.filter(author_id=author.id),
+        title=f'Записи {_author_name(author)}',
+        link=reverse('posts:profile', args=(author.username,)),
+        description=f'Последние записи автора {author.username}.',
+    )
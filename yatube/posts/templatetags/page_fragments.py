@@ -0,0 +1,14 @@
+from django import template
+from django.utils.safestring import mark_safe
+from posts.page_cache import fragment_markup
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def fragment(context, template_name):
+    """Выводит шаблон, который кеш страниц отрисует для пользователя."""
+    fragment_template = context.template.engine.get_template(template_name)
+    with context.push():
+        content = fragment_template.render(context)
+    return mark_safe(fragment_markup(template_name, content))
@@ -0,0 +1,10 @@
+from django import template
+from posts import cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_card(post, template_name=cards.CARD_TEMPLATE):
+    """Показывает карточку поста из кеша карточек."""
+    return cards.get_card(post, template_name)
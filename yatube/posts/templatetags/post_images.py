@@ -0,0 +1,20 @@
+from django import template
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post, alias='card'):
+    """Показывает адаптивную картинку поста или заглушку."""
+    if not post.image:
+        return {'image': None}
+    width, height = thumbnails.get_size(
+        alias, post.image_width, post.image_height
+    )
+    return {
+        'image': post.image,
+        'picture': thumbnails.get_picture(post, alias),
+        'width': width,
+        'height': height,
+    }
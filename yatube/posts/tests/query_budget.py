@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Допустимое число SQL-запросов на один запрос к странице при холодном
+# кеше, включая чтение сессии и пользователя. Бюджет не должен зависеть
+# от объёма данных: рост числа запросов вместе с данными — это N+1.
+QUERY_BUDGETS = {
+    'posts:index': 3,
+    # Описания картинок всей страницы читаются одним запросом.
+    'posts:index:images': 4,
+    'posts:group_list': 4,
+    'posts:profile': 5,
+    'posts:post_detail': 4,
+    # Ключи страницы читаются из материализованной ленты, посты — по id.
+    'posts:follow_index': 5,
+    # Поиск по индексу и посты найденной страницы — по запросу.
+    'posts:search': 4,
+    'posts:post_create': 3,
+    # Рассылка в ленты подписчиков: их id и одна вставка на всех.
+    'posts:post_create:post': 11,
+    'posts:post_edit': 4,
+    # Правка и комментарий сбрасывают ленты подписчиков автора: их id
+    # читаются одним запросом.
+    'posts:post_edit:post': 12,
+    'posts:add_comment:post': 6,
+    'posts:profile_follow:post': 10,
+    'posts:profile_unfollow:post': 8,
+}
+
+# Управление транзакциями не тратит бюджет: его набор зависит от того,
+# идёт ли тест внутри транзакции TestCase.
+TRANSACTION_STATEMENTS = (
+    'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE'
+)
+# Путь к JSON-отчёту с фактическим числом запросов или «-» для stderr.
+REPORT_ENV = 'QUERY_BUDGET_REPORT'
+
+
+class QueryBudgetMixin:
+    """
+    Проверяет, что страница укладывается в бюджет SQL-запросов.
+
+    Кеш очищается перед каждым замером, чтобы считать холодный путь.
+    Фактические числа собираются в отчёт, который пишется после класса,
+    если задана переменная окружения QUERY_BUDGET_REPORT.
+    """
+    query_report = {}
+
+    def assertWithinQueryBudget(self, budget_name, request):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        statements = [
+            query['sql'] for query in queries.captured_queries
+            if not query['sql'].startswith(TRANSACTION_STATEMENTS)
+        ]
+        used = len(statements)
+        budget = QUERY_BUDGETS[budget_name]
+        self.query_report[budget_name] = {'queries': used, 'budget': budget}
+        self.assertLessEqual(
+            used, budget,
+            f'{budget_name}: {used} запросов при бюджете {budget}:\n'
+            + '\n'.join(statements)
+        )
+        return response
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        target = os.environ.get(REPORT_ENV)
+        if not target or not cls.query_report:
+            return
+        report = json.dumps(cls.query_report, indent=2, sort_keys=True)
+        if target == '-':
+            sys.stderr.write(report + '\n')
+            return
+        with open(target, 'w') as report_file:
+            report_file.write(report)
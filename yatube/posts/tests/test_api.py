@@ -0,0 +1,145 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import groups
+from posts.models import Comment, Follow, Group, Post, User
+
+NUMBER_OF_POSTS = 12
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='api_author', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='api-group',
+            description='Тестовое описание',
+        )
+        for number in range(NUMBER_OF_POSTS):
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+        cls.post = Post.objects.create(
+            text='Последний пост', author=cls.author, group=cls.group
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        groups.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_index_pages_by_cursor(self):
+        """Лента листается курсором до конца."""
+        url = reverse('api:index')
+        response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        data = response.json()
+        self.assertEqual(len(data['results']), 10)
+        self.assertEqual(data['results'][0]['text'], 'Последний пост')
+        self.assertEqual(data['results'][0]['author'], 'api_author')
+        self.assertEqual(data['results'][0]['group'], 'api-group')
+        self.assertIsNone(data['previous'])
+        data = self.guest_client.get(data['next']).json()
+        self.assertEqual(len(data['results']), NUMBER_OF_POSTS + 1 - 10)
+        self.assertIsNone(data['next'])
+        self.assertIsNotNone(data['previous'])
+
+    def test_sparse_fields(self):
+        """fields[тип] оставляет только запрошенные поля."""
+        response = self.guest_client.get(
+            reverse('api:index'), {'fields[posts]': 'id,text', 'limit': 2}
+        )
+        data = response.json()
+        self.assertEqual(
+            data['results'][0], {'id': self.post.id, 'text': 'Последний пост'}
+        )
+        self.assertIn('fields[posts]=id,text', data['next'])
+
+    def test_unknown_field_rejected(self):
+        """Неизвестное поле даёт 400 с описанием."""
+        response = self.guest_client.get(
+            reverse('api:index'), {'fields[posts]': 'id,password'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('password', response.json()['detail'])
+
+    def test_index_reads_values_in_one_query(self):
+        """Страница ленты для гостя стоит одного запроса."""
+        with self.assertNumQueries(1):
+            self.guest_client.get(reverse('api:index'))
+
+    def test_group_profile_and_post(self):
+        """Группа, профиль и пост отдаются вместе с их лентами."""
+        group = self.guest_client.get(
+            reverse('api:group_posts', kwargs={'slug': self.group.slug})
+        ).json()
+        self.assertEqual(group['group']['title'], 'Тестовая группа')
+        self.assertEqual(group['group']['posts_count'], NUMBER_OF_POSTS + 1)
+        directory = self.guest_client.get(reverse('api:group_list')).json()
+        self.assertEqual(directory['results'][0]['slug'], 'api-group')
+        profile = self.guest_client.get(
+            reverse('api:profile', kwargs={'username': 'api_author'})
+        ).json()
+        self.assertEqual(profile['profile']['followers_count'], 1)
+        self.assertEqual(len(profile['results']), 10)
+        detail = self.guest_client.get(
+            reverse('api:post_detail', kwargs={'post_id': self.post.id})
+        ).json()
+        self.assertEqual(detail['post']['comments_count'], 1)
+        self.assertEqual(detail['results'][0]['text'], 'Комментарий')
+
+    def test_missing_objects_return_json_404(self):
+        """Несуществующие объекты дают 404 в JSON."""
+        urls = (
+            reverse('api:group_posts', kwargs={'slug': 'missing'}),
+            reverse('api:profile', kwargs={'username': 'missing'}),
+            reverse('api:post_detail', kwargs={'post_id': 0}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertIn('detail', response.json())
+
+    def test_follow_requires_login(self):
+        """Лента подписок доступна только пользователю."""
+        url = reverse('api:follow_index')
+        self.assertEqual(
+            self.guest_client.get(url).status_code, HTTPStatus.UNAUTHORIZED
+        )
+        data = self.reader_client.get(url).json()
+        self.assertEqual(data['results'][0]['id'], self.post.id)
+
+    def test_etag_revalidation(self):
+        """Неизменившийся ответ отдаёт 304, новая запись сбрасывает его."""
+        url = reverse('api:index')
+        response = self.guest_client.get(url)
+        cached = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(text='Новый пост', author=self.author)
+        fresh = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(fresh.status_code, HTTPStatus.OK)
+
+    def test_write_methods_not_allowed(self):
+        """API только для чтения."""
+        response = self.reader_client.post(reverse('api:index'))
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED
+        )
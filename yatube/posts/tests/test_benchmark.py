@@ -0,0 +1,30 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from posts.models import Post
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_benchmark_generates_data_and_reports_endpoints(self):
+        """Команда benchmark наполняет базу и пишет JSON-отчёт."""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark', users=10, groups=2, posts=40, follows=15,
+                comments=20, requests=2, warmup=0, seed=1, output=output,
+                stdout=StringIO()
+            )
+            with open(output) as report_file:
+                report = json.load(report_file)
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(report['dataset']['posts'], 40)
+        for name in ('posts:index', 'posts:post_detail', 'posts:profile'):
+            with self.subTest(name=name):
+                metrics = report['endpoints'][name]
+                self.assertEqual(metrics['errors'], 0)
+                self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+        self.assertIn('posts:add_comment', report['skipped'])
@@ -0,0 +1,212 @@
+import base64
+import json
+import tempfile
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import bulk
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+def ndjson(*rows):
+    return '\n'.join(
+        row if isinstance(row, str) else json.dumps(row) for row in rows
+    )
+
+
+class BulkImportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='bulk_author', password='bulk-password'
+        )
+        cls.reader = User.objects.create_user(username='bulk_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='bulk-group',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def post_ndjson(self, client, name, body):
+        return client.post(
+            reverse(name), body, content_type='application/x-ndjson'
+        )
+
+    def test_posts_import(self):
+        """Посты пишутся пачкой, ошибочные строки попадают в отчёт."""
+        self.guest_client.get(reverse('posts:index'))
+        response = self.post_ndjson(
+            self.author_client, 'api:bulk_posts', ndjson(
+                {'text': 'Пачка про кошку', 'group': 'bulk-group'},
+                {'text': 'Второй пост'},
+                'не json',
+                {'text': ''},
+                {'text': 'Без группы', 'group': 'missing'},
+                {'text': 'Третий пост', 'group': 'bulk-group'},
+            )
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        report = response.json()
+        self.assertEqual(report['created'], 3)
+        self.assertEqual(
+            [(error['line'], list(error['errors']))
+             for error in report['errors']],
+            [(3, ['__all__']), (4, ['text']), (5, ['group'])]
+        )
+        self.author.counters.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.author.counters.posts_count, 3)
+        self.assertEqual(self.group.posts_count, 2)
+        self.assertIsNotNone(self.group.last_post_at)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3
+        )
+        self.assertContains(
+            self.guest_client.get(reverse('posts:index')), 'Третий пост'
+        )
+        self.assertContains(
+            self.guest_client.get(reverse('posts:search'), {'q': 'кошки'}),
+            'Пачка про кошку'
+        )
+
+    def test_comments_import(self):
+        """Комментарии пишутся пачкой и сдвигают счётчик поста."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        report = self.post_ndjson(
+            self.reader_client, 'api:bulk_comments', ndjson(
+                {'post': post.id, 'text': 'Первый'},
+                {'post': post.id, 'text': 'Второй'},
+                {'post': 0, 'text': 'Потерянный'},
+            )
+        ).json()
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(report['errors'][0]['line'], 3)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(
+            Comment.objects.filter(post=post, author=self.reader).count(), 2
+        )
+
+    def test_follows_import(self):
+        """Подписки пишутся пачкой, повторные и на себя не создаются."""
+        Post.objects.create(text='Старый пост', author=self.reader)
+        report = self.post_ndjson(
+            self.author_client, 'api:bulk_follows', ndjson(
+                {'author': 'bulk_reader'},
+                {'author': 'bulk_reader'},
+                {'author': 'bulk_author'},
+                {'author': 'missing'},
+            )
+        ).json()
+        self.assertEqual(report['created'], 1)
+        self.assertEqual([error['line'] for error in report['errors']], [3, 4])
+        self.reader.counters.refresh_from_db()
+        self.assertEqual(self.reader.counters.followers_count, 1)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.author).exists()
+        )
+
+    def test_follow_made_during_import(self):
+        """Подписка, появившаяся после чтения пачки, не ломает импорт."""
+        prepare = bulk.FollowImporter.prepare
+        reader_client = Client()
+        writer = User.objects.create_user(username='bulk_writer')
+        reader_client.force_login(writer)
+
+        def prepare_and_follow(importer, rows):
+            context = prepare(importer, rows)
+            Follow.objects.create(user=writer, author=self.author)
+            return context
+
+        with mock.patch.object(
+            bulk.FollowImporter, 'prepare', prepare_and_follow
+        ):
+            response = self.post_ndjson(
+                reader_client, 'api:bulk_follows',
+                ndjson({'author': 'bulk_author'})
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            Follow.objects.filter(user=writer, author=self.author).count(), 1
+        )
+        self.author.counters.refresh_from_db()
+        writer.counters.refresh_from_db()
+        self.assertEqual(self.author.counters.followers_count, 2)
+        self.assertEqual(writer.counters.following_count, 1)
+
+    def test_basic_auth_import_without_csrf(self):
+        """Скрипт входит паролем и пишет без CSRF-токена."""
+        client = Client(enforce_csrf_checks=True)
+        credentials = base64.b64encode(b'bulk_author:bulk-password').decode()
+        response = client.post(
+            reverse('api:bulk_posts'), ndjson({'text': 'Пост'}),
+            content_type='application/x-ndjson',
+            HTTP_AUTHORIZATION=f'Basic {credentials}'
+        )
+        self.assertEqual(response.json()['created'], 1)
+        self.assertTrue(Post.objects.filter(author=self.author).exists())
+        wrong = base64.b64encode(b'bulk_author:wrong').decode()
+        response = client.post(
+            reverse('api:bulk_posts'), ndjson({'text': 'Пост'}),
+            content_type='application/x-ndjson',
+            HTTP_AUTHORIZATION=f'Basic {wrong}'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertIn('detail', response.json())
+
+    def test_session_import_requires_csrf(self):
+        """Запрос из сессии без CSRF-токена получает 403 в JSON."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.author)
+        response = self.post_ndjson(
+            client, 'api:bulk_posts', ndjson({'text': 'Пост'})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        self.assertIn('detail', response.json())
+        self.assertFalse(Post.objects.exists())
+
+    def test_guest_cannot_import(self):
+        """Гость не может писать пачками, а GET не принимается."""
+        response = self.post_ndjson(
+            self.guest_client, 'api:bulk_posts', ndjson({'text': 'Пост'})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertIn('detail', response.json())
+        self.assertEqual(
+            self.author_client.get(reverse('api:bulk_posts')).status_code,
+            HTTPStatus.METHOD_NOT_ALLOWED
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_command_imports_file_in_chunks(self):
+        """Команда bulk_import читает файл пачками."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as source:
+            source.write(ndjson(*(
+                {'text': f'Пост {number}'} for number in range(5)
+            )))
+            source.flush()
+            out = StringIO()
+            call_command(
+                'bulk_import', 'posts', source.name,
+                '--user', 'bulk_author', '--chunk-size', '2', stdout=out
+            )
+        self.assertIn('Создано: 5, ошибок: 0', out.getvalue())
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            [f'Пост {number}' for number in range(5)]
+        )
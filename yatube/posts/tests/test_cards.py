@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import cards, feed_cache
+from posts.models import Post, User
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='card_author', first_name='Анна', last_name='Каренина'
+        )
+        cls.post = Post.objects.create(
+            text='Текст карточки',
+            author=cls.user,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get_post(self):
+        return Post.objects.select_related('author').get(pk=self.post.pk)
+
+    def test_card_rendered_once(self):
+        """Повторный показ карточки берёт её из кеша без рендеринга."""
+        cards.prefetch([self.get_post()])
+        post = self.get_post()
+        with mock.patch.object(cards, 'render_to_string') as render:
+            cards.prefetch([post])
+        render.assert_not_called()
+        self.assertIn('Текст карточки', cards.get_card(post))
+
+    def test_post_edit_refreshes_card(self):
+        """Правка поста заново отрисовывает его карточку."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        self.post.text = 'Исправленный текст'
+        self.post.save()
+        self.assertContains(self.guest_client.get(url), 'Исправленный текст')
+
+    def test_author_rename_refreshes_cards(self):
+        """Смена имени автора заново отрисовывает его карточки."""
+        url = reverse('posts:index')
+        self.assertContains(self.guest_client.get(url), 'Анна Каренина')
+        self.user.last_name = 'Вронская'
+        self.user.save()
+        self.assertContains(self.guest_client.get(url), 'Анна Вронская')
+
+    def test_author_rename_keeps_other_feeds(self):
+        """Смена имени автора не сбрасывает ленты без его записей."""
+        other = User.objects.create_user(username='other_author')
+        scopes = (
+            f'{feed_cache.FEED_PROFILE}:{self.user.pk}',
+            f'{feed_cache.FEED_PROFILE}:{other.pk}',
+            feed_cache.SCOPE_ALL,
+        )
+        before = feed_cache.get_versions(*scopes)
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Анастасия'
+        author.save()
+        after = feed_cache.get_versions(*scopes)
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1:], before[1:])
+
+    def test_login_keeps_cards(self):
+        """Вход автора не сбрасывает его карточки."""
+        cards.prefetch([self.get_post()])
+        self.user.save(update_fields=['last_login'])
+        with mock.patch.object(cards, 'render_to_string') as render:
+            cards.prefetch([self.get_post()])
+        render.assert_not_called()
+
+    def test_placeholder_card_not_cached(self):
+        """Карточка с заглушкой вместо картинки не кешируется."""
+        post = self.get_post()
+        post.image.name = 'posts/not_ready.gif'
+        with mock.patch('posts.thumbnails.schedule'):
+            cards.prefetch([post])
+            self.assertIn('Изображение обрабатывается', cards.get_card(post))
+            post = self.get_post()
+            post.image.name = 'posts/not_ready.gif'
+            with mock.patch.object(cards, 'render_to_string',
+                                   return_value='') as render:
+                cards.prefetch([post])
+        render.assert_called_once()
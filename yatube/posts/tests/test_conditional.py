@@ -0,0 +1,140 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import groups
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='user_author')
+        cls.user_reader = User.objects.create_user(username='user_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.user_author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        groups.clear()
+        self.guest_client = Client()
+        self.reader = Client()
+        self.reader.force_login(self.user_reader)
+
+    def revalidate(self, client, url):
+        """Повторяет запрос с валидаторами первого ответа."""
+        response = client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response, client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+
+    def test_pages_answer_not_modified(self):
+        """Неизменившиеся страницы отдают 304."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:profile', kwargs={'username': self.user_author}
+            ),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            for client in (self.guest_client, self.reader):
+                with self.subTest(url=url, client=client):
+                    response, repeated = self.revalidate(client, url)
+                    self.assertIn('Last-Modified', response)
+                    self.assertEqual(
+                        repeated.status_code, HTTPStatus.NOT_MODIFIED
+                    )
+        _, repeated = self.revalidate(
+            self.reader, reverse('posts:follow_index')
+        )
+        self.assertEqual(repeated.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_if_modified_since(self):
+        """Страница без изменений отдаёт 304 и по Last-Modified."""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        repeated = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(repeated.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_not_modified_skips_page_queries(self):
+        """Ответ 304 не читает ленту и комментарии."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        response = self.reader.get(url)
+        # Сессия, пользователь и пост.
+        with self.assertNumQueries(3):
+            self.reader.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_writes_change_etag(self):
+        """Записи, которые меняют страницу, меняют и её ETag."""
+        writes = {
+            reverse('posts:index'): self.create_post,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}):
+                self.edit_group,
+            reverse('posts:profile', kwargs={'username': self.user_author}):
+                self.follow_author,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}):
+                self.comment_post,
+        }
+        for url, write in writes.items():
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                write()
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def create_post(self):
+        Post.objects.create(text='Новый пост', author=self.user_reader)
+
+    def edit_group(self):
+        Group.objects.get(pk=self.group.pk).save()
+
+    def follow_author(self):
+        Follow.objects.create(user=self.user_reader, author=self.user_author)
+
+    def comment_post(self):
+        Comment.objects.create(
+            post=self.post, author=self.user_reader, text='Комментарий'
+        )
+
+    def test_authenticated_variants(self):
+        """Страницы пользователя не делят ETag с гостем и приватны."""
+        url = reverse('posts:index')
+        guest_response = self.guest_client.get(url)
+        reader_response = self.reader.get(url)
+        self.assertNotEqual(guest_response['ETag'], reader_response['ETag'])
+        self.assertIn('Cookie', reader_response['Vary'])
+        self.assertIn('private', reader_response['Cache-Control'])
+        response = self.reader.get(
+            url, HTTP_IF_NONE_MATCH=guest_response['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_missing_objects_are_not_found(self):
+        """Валидаторы не мешают 404 для несуществующих объектов."""
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 0}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
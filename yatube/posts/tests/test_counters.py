@@ -0,0 +1,82 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='user_author')
+        cls.author = Client()
+        cls.author.force_login(cls.user_author)
+        cls.user_reader = User.objects.create_user(username='user_reader')
+        cls.reader = Client()
+        cls.reader.force_login(cls.user_reader)
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовое описание группы',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counters_follow_writes(self):
+        """Счётчики сдвигаются при создании и удалении записей."""
+        self.author.post(
+            reverse('posts:post_create'),
+            data={'text': 'Новая запись', 'group': self.group.id}
+        )
+        post = Post.objects.get(text='Новая запись')
+        self.reader.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.id}),
+            data={'text': 'Комментарий'}
+        )
+        self.reader.post(reverse(
+            'posts:profile_follow', kwargs={'username': self.user_author}
+        ))
+        author_counters = UserCounters.objects.get(user=self.user_author)
+        reader_counters = UserCounters.objects.get(user=self.user_reader)
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(author_counters.posts_count, 1)
+        self.assertEqual(author_counters.followers_count, 1)
+        self.assertEqual(reader_counters.following_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+
+        post.delete()
+        self.group.refresh_from_db()
+        author_counters.refresh_from_db()
+        self.assertEqual(author_counters.posts_count, 0)
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_recount_counters_command(self):
+        """Команда recount_counters восстанавливает разошедшиеся счётчики."""
+        post = Post.objects.create(
+            text='Тестовый текст',
+            author=self.user_author,
+            group=self.group
+        )
+        Comment.objects.create(
+            post=post, author=self.user_reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.user_reader, author=self.user_author)
+        UserCounters.objects.update(
+            posts_count=0, followers_count=0, following_count=0
+        )
+        Post.objects.update(comments_count=0)
+        Group.objects.update(posts_count=0)
+        call_command('recount_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        author_counters = UserCounters.objects.get(user=self.user_author)
+        self.assertEqual(author_counters.posts_count, 1)
+        self.assertEqual(author_counters.followers_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
@@ -0,0 +1,103 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import groups
+from posts.models import Group, Post, User
+
+
+class GroupsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.quiet_group = Group.objects.create(
+            title='Тихая группа',
+            slug='quiet',
+            description='Без постов',
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Другое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        groups.clear()
+        self.guest_client = Client()
+
+    def test_last_post_at_follows_posts(self):
+        """Время последнего поста группы следует за постами."""
+        first = Post.objects.create(
+            author=self.user, text='Первый', group=self.group
+        )
+        second = Post.objects.create(
+            author=self.user, text='Второй', group=self.group
+        )
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.last_post_at, second.pub_date)
+
+        second.group = self.other_group
+        second.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.last_post_at, first.pub_date)
+        self.assertEqual(self.other_group.last_post_at, second.pub_date)
+
+        first.delete()
+        self.group.refresh_from_db()
+        self.assertIsNone(self.group.last_post_at)
+
+    def test_directory_reads_precomputed_summary(self):
+        """Каталог групп читает группы одним запросом без агрегатов."""
+        Post.objects.create(author=self.user, text='Пост', group=self.group)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(reverse('posts:group_index'))
+        statements = [
+            query['sql'] for query in queries.captured_queries
+            if 'posts_group' in query['sql']
+        ]
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn('COUNT(', statements[0])
+        self.assertEqual(
+            list(response.context['groups']),
+            [self.group, self.other_group, self.quiet_group]
+        )
+        self.assertContains(response, 'Постов: 1')
+
+    def test_group_page_skips_lookup_when_warm(self):
+        """Повторный заход на группу не ищет её в базе."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            # Другая строка запроса минует кеш целых страниц.
+            response = self.guest_client.get(url, {'page': 1})
+        self.assertFalse(any(
+            'FROM "posts_group"' in query['sql']
+            for query in queries.captured_queries
+        ))
+        self.assertEqual(response.context['group'], self.group)
+
+    def test_group_edit_invalidates_cache(self):
+        """Правка группы сбрасывает её запись в LRU."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest_client.get(url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        response = self.guest_client.get(url)
+        self.assertEqual(response.context['group'].title, 'Новое название')
+
+    def test_unknown_group_is_not_found(self):
+        """Несуществующая группа отдаёт 404 и не кешируется."""
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,123 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginator import CursorPaginator
+from posts.views import NUMBER_OF_COMMENTS, NUMBER_OF_POSTS
+
+# Старые SQLite пишут «SCAN TABLE», новые — «SCAN».
+FULL_SCAN = r'SCAN (TABLE )?posts_post\b(?! USING)'
+
+
+class FeedIndexTests(TestCase):
+    """Запросы лент идут по составным индексам без сортировки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.author, group=cls.group
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def page_query(self, post_list, **kwargs):
+        paginator = CursorPaginator(post_list, NUMBER_OF_POSTS, **kwargs)
+        return paginator.object_list[:paginator.per_page + 1]
+
+    def assertUsesIndex(self, queryset, index):
+        plan = self.explain(queryset)
+        self.assertIn(index, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feeds_read_pages_by_index(self):
+        """Главная, группа и профиль читают страницу по индексу."""
+        feeds = {
+            'post_pub_date_id_idx': Post.objects.all(),
+            'post_group_pub_date_idx': self.group.posts.all(),
+            'post_author_pub_date_idx': self.author.posts.all(),
+        }
+        for index, post_list in feeds.items():
+            with self.subTest(index=index):
+                self.assertUsesIndex(self.page_query(post_list), index)
+
+    def test_cursor_pages_read_by_index(self):
+        """Страница после курсора тоже читается по индексу."""
+        paginator = CursorPaginator(self.group.posts.all(), NUMBER_OF_POSTS)
+        queryset = paginator.object_list.filter(paginator._beyond(
+            (self.post.pub_date, self.post.pk), forward=True
+        ))[:NUMBER_OF_POSTS + 1]
+        self.assertUsesIndex(queryset, 'post_group_pub_date_idx')
+
+    def test_comments_read_by_index(self):
+        """Комментарии поста читаются по индексу."""
+        paginator = CursorPaginator(
+            self.post.comments.all(), NUMBER_OF_COMMENTS,
+            date_field='created', descending=False
+        )
+        self.assertUsesIndex(
+            paginator.object_list[:NUMBER_OF_COMMENTS + 1],
+            'comment_post_created_idx'
+        )
+
+    def test_followers_read_by_index(self):
+        """Подписчики автора ищутся по индексу (author, user)."""
+        followers = Follow.objects.filter(
+            author=self.author).values_list('user_id', flat=True)
+        self.assertIn('follow_author_user_idx', self.explain(followers))
+
+    def follow_queries(self, enabled):
+        """Запросы первой страницы ленты подписок и страницы после курсора."""
+        paginator = timeline.follow_paginator(
+            self.reader, Post.objects.all(), NUMBER_OF_POSTS
+        )
+        key = (self.post.pub_date, self.post.pk)
+        if enabled:
+            return [
+                paginator.entry_keys(None, True, NUMBER_OF_POSTS + 1),
+                paginator.entry_keys(key, True, NUMBER_OF_POSTS + 1),
+            ]
+        return [
+            paginator.object_list[:NUMBER_OF_POSTS + 1],
+            paginator.object_list.filter(
+                paginator._beyond(key, forward=True)
+            )[:NUMBER_OF_POSTS + 1],
+        ]
+
+    def test_follow_feed_reads_by_index(self):
+        """Лента подписок читает страницы по индексу без сортировки."""
+        indexes = {
+            True: 'timeline_user_pub_date_idx',
+            False: 'post_author_pub_date_idx',
+        }
+        for enabled, index in indexes.items():
+            with override_settings(FOLLOW_TIMELINE_ENABLED=enabled):
+                queries = self.follow_queries(enabled)
+            for page, query in enumerate(queries):
+                with self.subTest(timeline=enabled, page=page):
+                    plan = self.explain(query)
+                    self.assertIn(index, plan)
+                    self.assertNotRegex(plan, FULL_SCAN)
+                    # Без материализованной ленты посты нескольких
+                    # авторов сливаются сортировкой.
+                    if enabled:
+                        self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,185 @@
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from posts import media, thumbnails
+from posts.models import MediaBlob, Post, User
+from posts.storage import post_image_storage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\x00\xFF', 1)
+DAY = 24 * 60 * 60
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedMediaTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='user_author')
+        cls.author = Client()
+        cls.author.force_login(cls.user_author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails.store.clear_local()
+
+    def publish(self, text, content=SMALL_GIF, name='meme.gif'):
+        self.author.post(reverse('posts:post_create'), data={
+            'text': text,
+            'image': SimpleUploadedFile(name, content, 'image/gif'),
+        })
+        return Post.objects.get(text=text)
+
+    def test_same_content_stored_once(self):
+        """Повторная загрузка тех же байтов не создаёт новый файл."""
+        first = self.publish('Первый', name='meme.gif')
+        second = self.publish('Второй', name='copy.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith('posts/'))
+        self.assertTrue(first.image.name.endswith('.gif'))
+        directory = os.path.dirname(post_image_storage.path(
+            first.image.name))
+        self.assertEqual(len(os.listdir(directory)), 1)
+        blob = MediaBlob.objects.get(name=first.image.name)
+        self.assertEqual(blob.refcount, 2)
+
+    def test_seen_content_not_rendered_again(self):
+        """Варианты уже виденной картинки не рендерятся заново."""
+        post = self.publish('Первый')
+        with mock.patch.object(
+                thumbnails.backend, 'render_variants',
+                wraps=thumbnails.backend.render_variants) as render:
+            thumbnails.render(post.image.name)
+            thumbnails.render(self.publish('Второй').image.name)
+        self.assertEqual(
+            render.call_count, len(settings.POST_IMAGE_VARIANTS)
+        )
+
+    def test_references_follow_edits_and_deletes(self):
+        """Счётчик ссылок сдвигается при смене картинки и удалении."""
+        post = self.publish('Пост')
+        old_name = post.image.name
+        self.author.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            data={
+                'text': 'Пост',
+                'image': SimpleUploadedFile('new.gif', OTHER_GIF),
+            }
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertEqual(MediaBlob.objects.get(name=old_name).refcount, 0)
+        self.assertEqual(
+            MediaBlob.objects.get(name=post.image.name).refcount, 1
+        )
+        post.delete()
+        self.assertEqual(
+            MediaBlob.objects.get(name=post.image.name).refcount, 0
+        )
+
+    def test_collect_removes_unreferenced_files(self):
+        """Сборка мусора удаляет файлы без ссылок вместе с вариантами."""
+        kept = self.publish('Остаётся')
+        removed = self.publish('Удаляется', content=OTHER_GIF)
+        thumbnails.render(removed.image.name)
+        variant_names = [
+            variant['name']
+            for source in thumbnails.get_variants(
+                removed.image.name, 'card')['sources']
+            for variant in source['srcset']
+        ]
+        removed.delete()
+        self.assertEqual(media.collect(dry_run=True), [])
+
+        collected = media.collect(grace=timedelta(0))
+        self.assertEqual(collected, [removed.image.name])
+        self.assertFalse(post_image_storage.exists(removed.image.name))
+        self.assertTrue(post_image_storage.exists(kept.image.name))
+        self.assertFalse(
+            MediaBlob.objects.filter(name=removed.image.name).exists()
+        )
+        self.assertIsNone(thumbnails.get_variants(removed.image.name, 'card'))
+        for name in variant_names:
+            self.assertFalse(thumbnails.default.storage.exists(name))
+
+    def test_collect_keeps_shared_variants(self):
+        """Файлы вариантов, нужные другой картинке, не удаляются."""
+        removed = self.publish('Удаляется')
+        thumbnails.render(removed.image.name)
+        variants = thumbnails.get_variants(removed.image.name, 'card')
+        thumbnails.link_variants('other', variants)
+        removed.delete()
+        media.collect(grace=timedelta(0))
+        self.assertIsNone(thumbnails.get_variants(removed.image.name, 'card'))
+        for name in thumbnails.variant_names(variants):
+            self.assertTrue(thumbnails.default.storage.exists(name))
+        self.assertEqual(
+            thumbnails.unlink_variants('other', variants),
+            sorted(thumbnails.variant_names(variants))
+        )
+
+    def test_collect_rechecks_references_before_delete(self):
+        """Файл, на который успели сослаться, сборка мусора не удаляет."""
+        post = self.publish('Пост')
+        name = post.image.name
+        post.delete()
+        threshold = timezone.now() + timedelta(minutes=1)
+        self.assertTrue(
+            MediaBlob.objects.filter(name=name, refcount=0).exists()
+        )
+        self.publish('Снова', name='again.gif')
+        self.assertFalse(media._claim(name, threshold))
+        self.assertTrue(MediaBlob.objects.filter(name=name).exists())
+        self.assertTrue(post_image_storage.exists(name))
+
+    def test_reupload_refreshes_modified_time(self):
+        """Повторная загрузка тех же байтов обновляет время файла."""
+        name = post_image_storage.save(
+            'posts/first.gif', ContentFile(SMALL_GIF))
+        week_ago = time.time() - 7 * DAY
+        os.utime(post_image_storage.path(name), (week_ago, week_ago))
+        self.assertEqual(post_image_storage.save(
+            'posts/second.gif', ContentFile(SMALL_GIF)), name)
+        self.assertGreater(
+            os.path.getmtime(post_image_storage.path(name)), week_ago + DAY
+        )
+
+    def test_collect_media_command_removes_stale_orphans(self):
+        """Команда удаляет старые файлы, которых нет в учёте."""
+        stale = post_image_storage.save(
+            'posts/stale.gif', ContentFile(SMALL_GIF))
+        fresh = post_image_storage.save(
+            'posts/fresh.gif', ContentFile(OTHER_GIF))
+        week_ago = time.time() - 7 * DAY
+        os.utime(post_image_storage.path(stale), (week_ago, week_ago))
+        out = StringIO()
+        call_command('collect_media', stdout=out)
+        self.assertIn(stale, out.getvalue())
+        self.assertFalse(post_image_storage.exists(stale))
+        self.assertTrue(post_image_storage.exists(fresh))
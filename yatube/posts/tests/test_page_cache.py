@@ -0,0 +1,103 @@
+import subprocess
+import sys
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import feed_cache
+from posts.models import Comment, Post, User
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader_name')
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.user,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_guest_page_served_from_cache(self):
+        """Повторный заход гостя отдаётся из кеша без запросов к базе."""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            cached = self.guest_client.get(url)
+        self.assertIsNone(cached.context)
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertIn('Cookie', cached['Vary'])
+
+    def test_writes_invalidate_pages(self):
+        """Запись поста и комментария сбрасывает страницы из кеша."""
+        index_url = reverse('posts:index')
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}
+        )
+        self.guest_client.get(index_url)
+        self.guest_client.get(detail_url)
+        Post.objects.create(text='Свежий пост', author=self.user)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Свежий комментарий'
+        )
+        self.assertContains(self.guest_client.get(index_url), 'Свежий пост')
+        self.assertContains(
+            self.guest_client.get(detail_url), 'Комментариев:<span>1</span>'
+        )
+
+    def test_shared_page_gets_user_header(self):
+        """Пользователь получает общую страницу из кеша со своей шапкой."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        # Сессия и пользователь.
+        with self.assertNumQueries(2):
+            response = self.authorized_client.get(url)
+        self.assertNotIn('page_obj', response.context)
+        self.assertContains(response, 'Пользователь: reader_name')
+        self.assertContains(response, reverse('posts:follow_index'))
+        self.assertContains(response, 'Тестовый текст')
+        self.assertNotContains(response, reverse('users:login'))
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_personal_page_not_shared(self):
+        """Страницы с личными кнопками пользователю рисуются заново."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.guest_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(
+            response,
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id})
+        )
+
+    def test_cached_page_answers_not_modified(self):
+        """Страница из кеша по-прежнему отдаёт 304."""
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_bump_in_other_process_invalidates_pages(self):
+        """Версию, поднятую другим процессом, видят страницы этого."""
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        subprocess.run(
+            [
+                sys.executable, 'manage.py', 'shell', '-c',
+                'from posts import feed_cache; '
+                f'feed_cache.bump({feed_cache.FEED_INDEX!r})'
+            ],
+            cwd=settings.BASE_DIR, check=True
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,131 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.benchmark import generate_dataset
+from posts.models import Follow, Group, Post, User, UserCounters
+from posts.tests.query_budget import QueryBudgetMixin
+
+# Объём данных N; каждая страница замеряется при N и при 3N.
+DATASET = {
+    'users': 30,
+    'groups': 3,
+    'posts': 300,
+    'follows': 150,
+    'comments': 900,
+}
+# Во сколько раз растут данные перед замером: N, затем ещё 2N.
+GROWTH = (1, 2)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    def grow(self, scale):
+        """Добавляет данные генератором стенда и выбирает объекты страниц."""
+        generate_dataset(
+            seed=scale,
+            **{name: size * scale for name, size in DATASET.items()}
+        )
+        counters = UserCounters.objects.select_related('user')
+        self.user_reader = counters.order_by('-following_count')[0].user
+        self.author = counters.order_by('-posts_count')[0].user
+        self.group = Group.objects.order_by('-posts_count')[0]
+        self.commented = Post.objects.order_by('-comments_count')[0]
+        self.post = Post.objects.create(
+            text='Тестовый текст', author=self.user_reader, group=self.group
+        )
+        self.not_followed = User.objects.exclude(
+            pk=self.user_reader.pk
+        ).exclude(following__user=self.user_reader).first()
+        self.reader = Client()
+        self.reader.force_login(self.user_reader)
+
+    def assertBudgetDoesNotGrow(self, make_requests):
+        """
+        Замеряет запросы при N и 3N записей: оба замера укладываются
+        в бюджет и совпадают, иначе страница делает запрос на строку.
+        """
+        used = []
+        for scale in GROWTH:
+            self.grow(scale)
+            counts = {}
+            for budget_name, request in make_requests().items():
+                with self.subTest(budget_name=budget_name, scale=scale):
+                    self.assertWithinQueryBudget(budget_name, request)
+                counts[budget_name] = (
+                    self.query_report[budget_name]['queries']
+                )
+            used.append(counts)
+        small, large = used
+        for budget_name, count in large.items():
+            with self.subTest(budget_name=budget_name):
+                self.assertEqual(
+                    count, small[budget_name],
+                    f'{budget_name}: число запросов растёт вместе с данными'
+                )
+
+    def read_requests(self):
+        pages = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': self.author}
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.commented.id}
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+            'posts:search': '{}?q={}'.format(
+                reverse('posts:search'), self.commented.text.split()[0]
+            ),
+            'posts:post_create': reverse('posts:post_create'),
+            'posts:post_edit': reverse(
+                'posts:post_edit', kwargs={'post_id': self.post.id}
+            ),
+        }
+        return {
+            budget_name: lambda url=url: self.reader.get(url)
+            for budget_name, url in pages.items()
+        }
+
+    def write_requests(self):
+        username = {'username': self.not_followed}
+        post_id = {'post_id': self.post.id}
+        requests = {
+            'posts:post_create:post': (
+                reverse('posts:post_create'),
+                {'text': 'Новая запись', 'group': self.group.id}
+            ),
+            'posts:post_edit:post': (
+                reverse('posts:post_edit', kwargs=post_id),
+                {'text': 'Изменённая запись', 'group': self.group.id}
+            ),
+            'posts:add_comment:post': (
+                reverse('posts:add_comment', kwargs=post_id),
+                {'text': 'Комментарий'}
+            ),
+            'posts:profile_follow:post': (
+                reverse('posts:profile_follow', kwargs=username), {}
+            ),
+            'posts:profile_unfollow:post': (
+                reverse('posts:profile_unfollow', kwargs=username), {}
+            ),
+        }
+        return {
+            budget_name: lambda url=url, data=data: self.reader.post(url, data)
+            for budget_name, (url, data) in requests.items()
+        }
+
+    def test_read_views_within_budget(self):
+        """Страницы чтения укладываются в бюджет при любом объёме данных."""
+        self.assertBudgetDoesNotGrow(self.read_requests)
+
+    def test_write_views_within_budget(self):
+        """Записывающие страницы укладываются в бюджет при любом объёме."""
+        self.assertBudgetDoesNotGrow(self.write_requests)
+
+    def test_reader_follows_authors(self):
+        """Читатель замеров подписан на авторов, лента не пуста."""
+        self.grow(GROWTH[0])
+        self.assertTrue(
+            Follow.objects.filter(user=self.user_reader).exists()
+        )
@@ -0,0 +1,135 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+from posts import conditional, feed_cache, replicas
+from posts.models import Post, User
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRoutingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        self.router = replicas.ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def respond(self, request, write=False, view=None):
+        """Прогоняет запрос через middleware и запоминает базу чтений."""
+        def get_response(request):
+            middleware.process_view(request, None, (), {})
+            if view is not None:
+                view(request)
+            self.read_database = self.router.db_for_read(Post)
+            if write:
+                self.router.db_for_write(Post)
+            return HttpResponse()
+        request.resolver_match = resolve(request.path_info)
+        middleware = replicas.ReplicaMiddleware(get_response)
+        return middleware(request)
+
+    def test_read_only_views_use_replica(self):
+        """Страницы на чтение читают с реплики."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('about:tech'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.respond(self.factory.get(url))
+                self.assertEqual(self.read_database, 'replica1')
+                self.assertEqual(replicas.read_database(), 'default')
+
+    def test_other_requests_use_primary(self):
+        """Прочие страницы, POST и закреплённые клиенты читают default."""
+        requests = (
+            self.factory.get(reverse('posts:post_create')),
+            self.factory.post(reverse('posts:index')),
+            self.factory.get(
+                reverse('posts:index'),
+                HTTP_COOKIE=f'{replicas.PIN_COOKIE}=1'
+            ),
+        )
+        for request in requests:
+            with self.subTest(path=request.path, method=request.method):
+                self.respond(request)
+                self.assertEqual(self.read_database, 'default')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas_everything_uses_primary(self):
+        """Без реплик всё читается из основной базы."""
+        self.respond(self.factory.get(reverse('posts:index')))
+        self.assertEqual(self.read_database, 'default')
+
+    def test_sessions_read_from_primary(self):
+        """Сессии всегда читаются из основной базы."""
+        self.respond(self.factory.get(reverse('posts:index')))
+        self.assertEqual(self.router.db_for_read(Session), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_write_pins_client_to_primary(self):
+        """После записи клиент получает куку закрепления."""
+        response = self.respond(self.factory.get(reverse('posts:index')))
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+        response = self.respond(
+            self.factory.get(reverse('posts:index')), write=True
+        )
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}
+        ))
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+
+    def check_index(self, request):
+        request.user = AnonymousUser()
+        conditional.check(
+            request, feed_cache.feed_scopes(feed_cache.FEED_INDEX)
+        )
+
+    def test_recent_write_reads_primary(self):
+        """Страница, данные которой только что менялись, читает default."""
+        feed_cache.bump(feed_cache.FEED_INDEX)
+        self.respond(
+            self.factory.get(reverse('posts:index')), view=self.check_index
+        )
+        self.assertEqual(self.read_database, 'default')
+        later = time.time() + settings.REPLICA_PIN_SECONDS + 1
+        with mock.patch.object(replicas.time, 'time', return_value=later):
+            self.respond(
+                self.factory.get(reverse('posts:index')),
+                view=self.check_index
+            )
+        self.assertEqual(self.read_database, 'replica1')
+
+    def test_stream_reads_replica_until_closed(self):
+        """Тело потокового ответа читается с той же реплики."""
+        def stream():
+            yield self.router.db_for_read(Post)
+
+        def get_response(request):
+            middleware.process_view(request, None, (), {})
+            return StreamingHttpResponse(stream())
+
+        request = self.factory.get(reverse('posts:index_feed', args=('rss',)))
+        request.resolver_match = resolve(request.path_info)
+        middleware = replicas.ReplicaMiddleware(get_response)
+        response = middleware(request)
+        self.assertEqual(replicas.read_database(), 'default')
+        self.assertEqual(b''.join(response.streaming_content), b'replica1')
+        response.close()
+        self.assertEqual(replicas.read_database(), 'default')
@@ -0,0 +1,107 @@
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.db.utils import OperationalError
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import search
+from posts.models import Post, SearchTerm, User
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='user_author')
+        cls.post_cats = Post.objects.create(
+            text='Кошки любят спать. Кошка спит весь день.',
+            author=cls.user_author
+        )
+        cls.post_dog = Post.objects.create(
+            text='Собака гуляет, а кошка смотрит в окно.',
+            author=cls.user_author
+        )
+        cls.post_other = Post.objects.create(
+            text='Совсем другой текст про погоду.',
+            author=cls.user_author
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get_results(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response.context['page_obj']
+
+    def test_tokenize_stems_russian_words(self):
+        """Разные формы русского слова сводятся к одной основе."""
+        self.assertEqual(search.tokenize('Кошки'), search.tokenize('кошкой'))
+        self.assertNotIn('и', search.tokenize('кошки и собаки'))
+
+    def test_search_finds_word_forms_ranked(self):
+        """Поиск находит формы слова и ставит выше более релевантный пост."""
+        results = list(self.get_results('кошкой').object_list)
+        self.assertEqual(results, [self.post_cats, self.post_dog])
+
+    def test_search_follows_post_edit_and_delete(self):
+        """Индекс обновляется при правке и удалении поста."""
+        self.post_other.text = 'Теперь и здесь есть кошка.'
+        self.post_other.save()
+        self.assertIn(self.post_other, self.get_results('кошка').object_list)
+        self.post_other.delete()
+        self.assertNotIn(
+            self.post_other, self.get_results('кошка').object_list
+        )
+
+    def test_search_cursor_pages(self):
+        """Результаты листаются курсором без повторов."""
+        Post.objects.bulk_create(
+            Post(text=f'Кошка №{number}', author=self.user_author)
+            for number in range(12)
+        )
+        search.rebuild()
+        first_page = self.get_results('кошка')
+        second_page = self.get_results(
+            'кошка', after=first_page.paginator.next_cursor
+        )
+        self.assertEqual(len(first_page) + len(second_page), 14)
+        self.assertFalse(
+            set(first_page.object_list) & set(second_page.object_list)
+        )
+
+    def test_table_backend(self):
+        """Запасной индекс на таблице ранжирует так же, как FTS5."""
+        backend = search.TableBackend()
+        for post in Post.objects.all():
+            backend.index(post.pk, post.text)
+        self.assertTrue(
+            SearchTerm.objects.filter(post=self.post_cats).exists()
+        )
+        rows = backend.search(search.query_terms('кошкой'), None, 10)
+        self.assertEqual(
+            [post_id for _, post_id in rows],
+            [self.post_cats.pk, self.post_dog.pk]
+        )
+        rows = backend.search(search.query_terms('кошкой'), rows[0], 10)
+        self.assertEqual(
+            [post_id for _, post_id in rows], [self.post_dog.pk]
+        )
+
+    def test_migration_without_fts_fills_table_index(self):
+        """Без FTS5 миграция индексирует существующие посты в таблицу."""
+        migration = import_module('posts.migrations.0019_search_index')
+        schema_editor = mock.Mock(connection=connection)
+        schema_editor.execute.side_effect = OperationalError(
+            'no such module: fts5'
+        )
+        migration.create_fts_table(apps, schema_editor)
+        self.assertEqual(
+            set(SearchTerm.objects.values_list('post_id', flat=True)),
+            {self.post_cats.pk, self.post_dog.pk, self.post_other.pk}
+        )
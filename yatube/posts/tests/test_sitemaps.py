@@ -0,0 +1,133 @@
+from http import HTTPStatus
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Group, Post, User
+
+SITEMAP = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+SHARD_SIZE = 3
+
+
+def shard_of(post):
+    return (post.pk - 1) // SHARD_SIZE
+
+
+def read(response):
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+    return ElementTree.fromstring(content)
+
+
+def locs(tree):
+    return [loc.text for loc in tree.iter(f'{SITEMAP}loc')]
+
+
+@override_settings(SITEMAP_SHARD_SIZE=SHARD_SIZE, SITEMAP_CHUNK_SIZE=2)
+class SitemapTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='map_author')
+        cls.reader = User.objects.create_user(username='map_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='map-group',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def shard(self, section, number):
+        return self.guest_client.get(
+            reverse('posts:sitemap', args=(section, number))
+        )
+
+    def test_index_lists_shards_with_lastmod(self):
+        """Индекс перечисляет шарды всех разделов с lastmod."""
+        response = self.guest_client.get(reverse('posts:sitemap_index'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        tree = read(response)
+        shards = [loc.rsplit('/', 1)[1] for loc in locs(tree)]
+        self.assertIn('sitemap-groups-0.xml', shards)
+        self.assertIn('sitemap-profiles-0.xml', shards)
+        last = shard_of(self.posts[-1])
+        self.assertIn(f'sitemap-posts-{last}.xml', shards)
+        self.assertNotIn(f'sitemap-posts-{last + 1}.xml', shards)
+        self.assertTrue(all(
+            entry.findtext(f'{SITEMAP}lastmod')
+            for entry in tree.iter(f'{SITEMAP}sitemap')
+            if 'posts' in entry.findtext(f'{SITEMAP}loc')
+        ))
+
+    def test_shards_cover_every_post_once(self):
+        """Шарды постов вместе содержат каждый пост ровно один раз."""
+        urls = []
+        for number in range(shard_of(self.posts[-1]) + 1):
+            response = self.shard('posts', number)
+            self.assertTrue(response.streaming)
+            urls += locs(read(response))
+        self.assertEqual(urls, [
+            'http://testserver' + reverse('posts:post_detail', args=(post.pk,))
+            for post in self.posts
+        ])
+
+    def test_profiles_only_list_authors(self):
+        """В карту попадают только профили авторов постов."""
+        urls = locs(read(self.shard('profiles', 0)))
+        self.assertEqual(urls, ['http://testserver' + reverse(
+            'posts:profile', args=('map_author',)
+        )])
+
+    def test_shard_cached_until_write(self):
+        """Шард берётся из кеша, пока в него не записали пост."""
+        number = shard_of(self.posts[-1])
+        response = self.shard('posts', number)
+        content = b''.join(response.streaming_content)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.shard('posts', number).content, content)
+            cached = self.guest_client.get(
+                reverse('posts:sitemap', args=('posts', number)),
+                HTTP_IF_NONE_MATCH=response['ETag']
+            )
+            self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.filter(pk=self.posts[-1].pk).delete()
+        fresh = self.shard('posts', number)
+        self.assertTrue(fresh.streaming)
+        self.assertNotIn(
+            reverse('posts:post_detail', args=(self.posts[-1].pk,)),
+            ''.join(locs(read(fresh)))
+        )
+
+    def test_shard_past_last_post_not_found(self):
+        """Шард за последним постом даёт 404, пока в него не запишут."""
+        number = shard_of(self.posts[-1]) + 1
+        self.assertEqual(
+            self.shard('posts', number).status_code, HTTPStatus.NOT_FOUND
+        )
+        post = self.posts[-1]
+        while shard_of(post) < number:
+            post = Post.objects.create(text='Новый пост', author=self.author)
+        response = self.shard('posts', number)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(
+            reverse('posts:post_detail', args=(post.pk,)),
+            ''.join(locs(read(response)))
+        )
+
+    def test_unknown_section(self):
+        """Неизвестный раздел даёт 404."""
+        self.assertEqual(
+            self.shard('comments', 0).status_code, HTTPStatus.NOT_FOUND
+        )
@@ -0,0 +1,37 @@
+import os
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+from posts import sqlite
+
+
+class SqlitePragmaTests(TestCase):
+    def test_connection_gets_pragmas(self):
+        """Соединение Django открывается с PRAGMA из настроек."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            busy_timeout, = cursor.fetchone()
+            cursor.execute('PRAGMA cache_size')
+            cache_size, = cursor.fetchone()
+        self.assertEqual(
+            busy_timeout, settings.SQLITE_PRAGMAS['busy_timeout']
+        )
+        self.assertEqual(cache_size, settings.SQLITE_PRAGMAS['cache_size'])
+
+    def test_file_database_switches_to_wal(self):
+        """Файловая база переходит в WAL и обратно."""
+        with tempfile.TemporaryDirectory() as directory:
+            database = sqlite3.connect(os.path.join(directory, 'db.sqlite3'))
+            try:
+                cursor = database.cursor()
+                sqlite.apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone(), ('wal',))
+                sqlite.apply_pragmas(cursor, sqlite.BASELINE_PRAGMAS)
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone(), ('delete',))
+            finally:
+                database.close()
@@ -0,0 +1,118 @@
+from http import HTTPStatus
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import groups, syndication
+from posts.models import Group, Post, User
+
+NUMBER_OF_POSTS = 7
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+def read(response):
+    content = b''.join(response.streaming_content)
+    return ElementTree.fromstring(content)
+
+
+@override_settings(SYNDICATION_ITEMS=5, SYNDICATION_CHUNK_SIZE=2)
+class SyndicationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='feed_author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='feed-group',
+            description='Тестовое описание',
+        )
+        for number in range(NUMBER_OF_POSTS):
+            Post.objects.create(
+                text=f'Пост {number}\nВторая строка', author=cls.author,
+                group=cls.group if number % 2 else None
+            )
+
+    def setUp(self):
+        cache.clear()
+        groups.clear()
+        self.guest_client = Client()
+
+    def test_rss_streams_latest_posts(self):
+        """RSS отдаётся потоком и содержит последние посты по порядку."""
+        response = self.guest_client.get(
+            reverse('posts:index_feed', args=('rss',))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['Content-Type'].startswith(
+            'application/rss+xml'
+        ))
+        items = read(response).findall('channel/item')
+        self.assertEqual(
+            [item.findtext('title') for item in items],
+            [f'Пост {number}' for number in range(6, 1, -1)]
+        )
+        self.assertIn('Вторая строка', items[0].findtext('description'))
+
+    def test_atom_for_group_and_profile(self):
+        """Atom группы и автора содержит только их посты."""
+        group = read(self.guest_client.get(
+            reverse('posts:group_feed', args=(self.group.slug, 'atom'))
+        ))
+        self.assertEqual(group.findtext(f'{ATOM}title'), 'Тестовая группа')
+        self.assertEqual(len(group.findall(f'{ATOM}entry')), 3)
+        profile = read(self.guest_client.get(
+            reverse('posts:profile_feed', args=('feed_author', 'atom'))
+        ))
+        entry = profile.find(f'{ATOM}entry')
+        self.assertEqual(
+            entry.findtext(f'{ATOM}author/{ATOM}name'), 'Лев Толстой'
+        )
+
+    def test_unknown_format_and_object(self):
+        """Неизвестный формат или объект даёт 404."""
+        urls = (
+            reverse('posts:index_feed', args=('json',)),
+            reverse('posts:group_feed', args=('missing', 'rss')),
+            reverse('posts:profile_feed', args=('missing', 'rss')),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.guest_client.get(url).status_code,
+                    HTTPStatus.NOT_FOUND
+                )
+
+    def test_conditional_and_cached_feed(self):
+        """Повторный опрос получает 304, а готовый XML берётся из кеша."""
+        url = reverse('posts:index_feed', args=('atom',))
+        response = self.guest_client.get(url)
+        content = b''.join(response.streaming_content)
+        with self.assertNumQueries(0):
+            cached = self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+            self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+            self.assertEqual(self.guest_client.get(url).content, content)
+        Post.objects.create(text='Свежий пост', author=self.author)
+        fresh = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(fresh.status_code, HTTPStatus.OK)
+        self.assertIn('Свежий пост', b''.join(
+            fresh.streaming_content).decode())
+
+    def test_iter_posts_reads_chunks_by_key(self):
+        """Посты читаются пачками, каждая пачка — один запрос."""
+        with self.assertNumQueries(3):
+            chunks = list(syndication.iter_posts(
+                Post.objects.all(), limit=5, chunk_size=2
+            ))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(
+            [post.text.split()[1] for chunk in chunks for post in chunk],
+            ['6', '5', '4', '3', '2']
+        )
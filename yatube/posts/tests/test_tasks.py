@@ -0,0 +1,127 @@
+from datetime import timedelta
+from io import StringIO
+
+from core import tasks
+from core.models import QueuedTask
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from posts.models import Follow, Post, TimelineEntry, User
+
+calls = []
+
+
+@tasks.task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@tasks.task(name='tests.fail', max_retries=1)
+def fail():
+    raise ValueError('Ошибка задачи')
+
+
+@override_settings(TASKS_EAGER=False)
+class TaskQueueTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+        tasks.metrics.clear()
+
+    def run_worker(self):
+        out = StringIO()
+        call_command('run_tasks', '--once', '--workers', '2', stdout=out)
+        return out.getvalue()
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_queue_refuses_process_cache(self):
+        """Очередь не запускается с кешем в памяти процесса."""
+        with self.assertRaises(ImproperlyConfigured):
+            tasks.check_cache()
+        with self.settings(TASKS_EAGER=True):
+            tasks.check_cache()
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_task_runs_at_once(self):
+        """В режиме TASKS_EAGER задача выполняется без очереди."""
+        record.delay(1)
+        self.assertEqual(calls, [1])
+        self.assertFalse(QueuedTask.objects.exists())
+        self.assertEqual(
+            tasks.metrics.snapshot()['tests.record'][tasks.SUCCEEDED], 1
+        )
+
+    def test_worker_runs_queued_tasks(self):
+        """Рабочий выполняет задачи из очереди и удаляет их."""
+        record.delay(1)
+        record.delay(2)
+        self.assertEqual(calls, [])
+        output = self.run_worker()
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertFalse(QueuedTask.objects.exists())
+        self.assertIn('tests.record: выполнено 2', output)
+
+    def test_claimed_task_is_not_claimed_again(self):
+        """Забранную задачу не забирает другой рабочий."""
+        record.delay(1)
+        self.assertEqual(len(tasks.claim(10)), 1)
+        self.assertEqual(tasks.claim(10), [])
+
+    def test_failed_task_is_retried_with_backoff(self):
+        """Упавшая задача повторяется с растущей задержкой."""
+        fail.delay()
+        self.run_worker()
+        job = QueuedTask.objects.get()
+        self.assertEqual(job.status, QueuedTask.QUEUED)
+        self.assertIn('Ошибка задачи', job.error)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(tasks.retry_delay(2), 2 * tasks.retry_delay(1))
+        QueuedTask.objects.update(run_at=timezone.now())
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, QueuedTask.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(tasks.metrics.snapshot()['tests.fail'], {
+            tasks.SUCCEEDED: 0, tasks.RETRIED: 1, tasks.FAILED: 1,
+            'seconds': tasks.metrics.snapshot()['tests.fail']['seconds'],
+        })
+
+    def test_stale_running_task_is_requeued(self):
+        """Задача умершего рабочего возвращается в очередь."""
+        record.delay(1)
+        tasks.claim(1)
+        QueuedTask.objects.update(
+            started=timezone.now() - timedelta(hours=1)
+        )
+        self.run_worker()
+        self.assertEqual(calls, [1])
+
+    def test_fan_out_waits_for_worker(self):
+        """Пост попадает в ленты подписчиков, когда задачу выполнит рабочий."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        post = Post.objects.create(author=author, text='Пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.run_worker()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=reader, post=post).exists()
+        )
+
+    def test_signup_sends_welcome_email_in_background(self):
+        """Письмо новому пользователю отправляет фоновая задача."""
+        Client().post(reverse('users:signup'), data={
+            'username': 'newbie',
+            'email': 'newbie@example.com',
+            'password1': 'Sup3r-secret-pass',
+            'password2': 'Sup3r-secret-pass',
+        })
+        self.assertEqual(mail.outbox, [])
+        self.run_worker()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['newbie@example.com'])
+        self.assertIn('newbie', mail.outbox[0].body)
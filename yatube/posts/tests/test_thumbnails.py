@@ -0,0 +1,232 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from core.models import QueuedTask
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from PIL import Image
+from posts import thumbnails
+from posts.models import Post, User
+from posts.tests.query_budget import QueryBudgetMixin
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+PLACEHOLDER = 'Изображение обрабатывается'
+NUMBER_OF_POSTS = 10
+
+
+def uploaded_gif(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTemplateTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='user_author')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.user_author,
+            image=uploaded_gif(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails.store.clear_local()
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Пока миниатюры нет, страница показывает заглушку."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        with mock.patch.object(
+                thumbnails.backend, 'render_variants') as render:
+            response = self.client.get(url)
+        render.assert_not_called()
+        self.assertContains(response, PLACEHOLDER)
+        self.assertNotContains(response, '<img class="card-img')
+
+        thumbnails.render(self.post.image.name)
+        response = self.client.get(url)
+        self.assertNotContains(response, PLACEHOLDER)
+        self.assertContains(response, '<img class="card-img')
+
+    def test_variants_in_modern_formats_and_widths(self):
+        """Картинка отдаётся через <picture> с вариантами по ширинам."""
+        thumbnails.render(self.post.image.name)
+        variants = thumbnails.get_variants(
+            self.post.image.name, 'card'
+        )
+        types = [source['type'] for source in variants['sources']]
+        self.assertIn('image/webp', types)
+        self.assertEqual(types[-1], 'image/gif')
+        # Картинка 2x1 вписывается в рамку 960x339 по высоте.
+        for source in variants['sources']:
+            self.assertEqual(
+                [variant['height'] for variant in source['srcset']],
+                [170, 339]
+            )
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, ' 340w, ')
+        self.assertContains(response, 'width="678" height="339"')
+
+    @override_settings(POST_IMAGE_VARIANTS={
+        'card': {
+            'geometry': '960x339',
+            'widths': (960,),
+            'formats': ('WEBP',),
+            'upscale': True,
+            'quality': 90,
+            'min_quality': 30,
+            'max_bytes': 1,
+            'sizes': '960px',
+        },
+    })
+    def test_variants_fit_size_budget(self):
+        """Вариант больше бюджета пережимается с меньшим качеством."""
+        noise = Image.effect_noise((320, 120), 64).convert('RGB')
+        buffer = BytesIO()
+        noise.save(buffer, format='JPEG', quality=95)
+        post = Post.objects.create(
+            text='Пост с шумом',
+            author=self.user_author,
+            image=SimpleUploadedFile(
+                name='noise.jpg',
+                content=buffer.getvalue(),
+                content_type='image/jpeg'
+            ),
+        )
+        variants = thumbnails.backend.render_variants(post.image.name, 'card')
+        for source in variants['sources']:
+            self.assertEqual(source['srcset'][0]['quality'], 30)
+
+    def test_image_size_stored_on_upload(self):
+        """Размеры картинки сохраняются в посте при загрузке."""
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        post.text = 'Изменённый текст'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        post.image = None
+        post.save()
+        self.assertIsNone(post.image_width)
+
+    def test_image_feed_resolves_pictures_in_one_query(self):
+        """Картинки ленты не добавляют запросов на каждый пост."""
+        posts = [
+            Post.objects.create(
+                text=f'Картинка №{number}',
+                author=self.user_author,
+                image=uploaded_gif(f'feed_{number}.gif'),
+            )
+            for number in range(NUMBER_OF_POSTS)
+        ]
+        for post in posts:
+            thumbnails.render(post.image.name)
+        thumbnails.store.clear_local()
+        response = self.assertWithinQueryBudget(
+            'posts:index:images',
+            lambda: self.client.get(reverse('posts:index'))
+        )
+        self.assertContains(
+            response, '<img class="card-img', count=NUMBER_OF_POSTS
+        )
+        self.assertWithinQueryBudget(
+            'posts:index', lambda: self.client.get(reverse('posts:index'))
+        )
+
+    def test_variant_store_evicts_least_recent(self):
+        """LRU хранилища вытесняет давно не читанные описания."""
+        variant_store = thumbnails.VariantStore(maxsize=2)
+        variant_store.set('first', {'width': 1})
+        variant_store.set('second', {'width': 2})
+        variant_store.get('first')
+        variant_store.set('third', {'width': 3})
+        self.assertEqual(
+            variant_store._local.keys(), ['first', 'third']
+        )
+        cache.clear()
+        self.assertEqual(
+            variant_store.get_many(['second', 'missing']),
+            {'second': {'width': 2}}
+        )
+
+    @override_settings(TASKS_EAGER=False)
+    def test_enqueue_skips_pending_images(self):
+        """Картинка, уже стоящая в очереди, не ставится повторно."""
+        thumbnails.enqueue('posts/pending.gif')
+        thumbnails.enqueue('posts/pending.gif')
+        thumbnails.enqueue('posts/other.gif')
+        self.assertEqual(
+            list(QueuedTask.objects.order_by('id').values_list(
+                'args', flat=True)),
+            ['["posts/pending.gif"]', '["posts/other.gif"]']
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        thumbnails.store.clear_local()
+        self.user_author = User.objects.create_user(username='user_author')
+        self.author = Client()
+        self.author.force_login(self.user_author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_thumbnails_rendered_after_commit(self):
+        """Миниатюры готовы к первому просмотру после публикации поста."""
+        self.author.post(
+            reverse('posts:post_create'),
+            data={'text': 'Новая запись', 'image': uploaded_gif()}
+        )
+        post = Post.objects.get(text='Новая запись')
+        with mock.patch.object(
+                thumbnails.backend, 'render_variants') as render:
+            response = self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.id})
+            )
+        render.assert_not_called()
+        self.assertContains(response, '<img class="card-img')
+
+    @override_settings(TASKS_EAGER=False)
+    def test_publication_queues_rendering(self):
+        """Публикация ставит рендеринг в очередь, а не рендерит сама."""
+        with mock.patch.object(
+                thumbnails.backend, 'render_variants') as render:
+            self.author.post(
+                reverse('posts:post_create'),
+                data={'text': 'Новая запись', 'image': uploaded_gif()}
+            )
+        render.assert_not_called()
+        post = Post.objects.get(text='Новая запись')
+        self.assertTrue(QueuedTask.objects.filter(
+            name=thumbnails.render.name, args=f'["{post.image.name}"]'
+        ).exists())
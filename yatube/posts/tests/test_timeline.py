@@ -0,0 +1,152 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import feed_cache, timeline
+from posts.models import Follow, Post, TimelineEntry, User, UserCounters
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='user_author')
+        cls.user_reader = User.objects.create_user(username='user_reader')
+        cls.reader = Client()
+        cls.reader.force_login(cls.user_reader)
+        cls.old_post = Post.objects.create(
+            text='Старый пост',
+            author=cls.user_author
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        """Подписка дозаполняет ленту, отписка вычищает её."""
+        self.reader.post(reverse(
+            'posts:profile_follow', kwargs={'username': self.user_author}
+        ))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_reader, post=self.old_post).exists())
+        self.reader.post(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.user_author}
+        ))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_reader).exists()
+        )
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает в материализованную ленту подписчика."""
+        Follow.objects.create(user=self.user_reader, author=self.user_author)
+        post = Post.objects.create(text='Новый пост', author=self.user_author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_reader, post=post).exists())
+        response = self.reader.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'].object_list)
+
+    @override_settings(FOLLOW_TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_posts_are_read_on_the_fly(self):
+        """Посты популярного автора не раскладываются, но видны в ленте."""
+        Follow.objects.create(user=self.user_reader, author=self.user_author)
+        cache.clear()
+        post = Post.objects.create(text='Новый пост', author=self.user_author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        response = self.reader.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'].object_list)
+
+    def test_post_edit_bumps_only_followers_feeds(self):
+        """Правка поста сбрасывает ленты подписок только подписчиков."""
+        stranger = User.objects.create_user(username='stranger')
+        Follow.objects.create(user=self.user_reader, author=self.user_author)
+        scopes = (
+            feed_cache.follow_scope(self.user_reader.pk),
+            feed_cache.follow_scope(stranger.pk),
+            feed_cache.FEED_FOLLOW,
+        )
+        before = feed_cache.get_versions(*scopes)
+        post = Post.objects.get(pk=self.old_post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        after = feed_cache.get_versions(*scopes)
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1:], before[1:])
+
+    @override_settings(FOLLOW_TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_post_bumps_author_scope(self):
+        """Пост популярного автора поднимает одну его область."""
+        Follow.objects.create(user=self.user_reader, author=self.user_author)
+        scopes = (
+            feed_cache.follow_author_scope(self.user_author.pk),
+            feed_cache.follow_scope(self.user_reader.pk),
+        )
+        reader = User.objects.get(pk=self.user_reader.pk)
+        self.assertIn(scopes[0], timeline.follow_scopes(reader))
+        before = feed_cache.get_versions(*scopes)
+        Post.objects.create(text='Новый пост', author=self.user_author)
+        after = feed_cache.get_versions(*scopes)
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1], before[1])
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты по подпискам."""
+        Follow.objects.create(user=self.user_reader, author=self.user_author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_reader, post=self.old_post).exists())
+
+    @override_settings(FOLLOW_TIMELINE_FANOUT_LIMIT=1)
+    def test_cursor_pages_merge_timeline_and_popular_posts(self):
+        """Курсорные страницы сливают ленту и посты популярных авторов."""
+        popular = User.objects.create_user(username='popular_author')
+        fan = User.objects.create_user(username='popular_fan')
+        Follow.objects.create(user=fan, author=popular)
+        Follow.objects.create(user=self.user_reader, author=popular)
+        Follow.objects.create(user=self.user_reader, author=self.user_author)
+        cache.clear()
+        posts = [self.old_post] + [
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=popular if number % 2 else self.user_author
+            )
+            for number in range(5)
+        ]
+        paginator = timeline.follow_paginator(
+            self.user_reader, Post.objects.all(), 2
+        )
+        read = []
+        params = {}
+        while True:
+            paginator.next_cursor = None
+            read += paginator.get_cursor_page(params)
+            if paginator.next_cursor is None:
+                break
+            params = {'after': paginator.next_cursor}
+        self.assertEqual(read, posts[::-1])
+        previous = paginator.get_cursor_page(
+            {'before': paginator.previous_cursor}
+        )
+        self.assertEqual(list(previous), posts[::-1][2:4])
+
+    def test_fill_all_backfills_existing_follows(self):
+        """Миграционное заполнение раскладывает посты существующих подписок."""
+        Follow.objects.create(user=self.user_reader, author=self.user_author)
+        TimelineEntry.objects.all().delete()
+        timeline.fill_all(Follow, Post, TimelineEntry, UserCounters)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_reader, post=self.old_post).exists())
+
+    @override_settings(FOLLOW_TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_authors_read_from_counters(self):
+        """Популярные авторы выбираются по счётчику, без подсчёта подписок."""
+        cache.clear()
+        UserCounters.objects.filter(user=self.user_author).update(
+            followers_count=2
+        )
+        with self.assertNumQueries(1) as queries:
+            author_ids = timeline.popular_author_ids()
+        self.assertEqual(author_ids, {self.user_author.id})
+        self.assertNotIn('posts_follow', queries.captured_queries[0]['sql'])
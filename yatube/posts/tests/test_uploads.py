@@ -0,0 +1,150 @@
+import shutil
+import struct
+import tempfile
+import zlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, PngImagePlugin
+from posts import uploads
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION_TAG = 0x0112
+MAKE_TAG = 0x010F
+
+
+def image_bytes(format_, size=(40, 20), **options):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 10, 10)).save(buffer, format_, **options)
+    return buffer.getvalue()
+
+
+def png_chunk(chunk_type, data):
+    crc = zlib.crc32(chunk_type + data)
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack(
+        '>I', crc)
+
+
+def feed_by_byte(metadata_filter, data):
+    output = b''.join(
+        metadata_filter.feed(data[index:index + 1])
+        for index in range(len(data))
+    )
+    return output + metadata_filter.close()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='user_author')
+        cls.author = Client()
+        cls.author.force_login(cls.user_author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, name, content, content_type='image/jpeg'):
+        return self.author.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(name, content, content_type),
+            }
+        )
+
+    def assertRejected(self, response, error):
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', 'image', error)
+        self.assertFalse(Post.objects.exists())
+
+    def test_rejects_wrong_signature(self):
+        """Файл с чужой сигнатурой отклоняется по первому куску."""
+        response = self.upload('photo.jpg', b'<?php echo 1; ?>' * 10)
+        self.assertRejected(response, uploads.ERROR_FORMAT)
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1024)
+    def test_rejects_oversized_upload(self):
+        """Файл больше предела отклоняется, не дописываясь на диск."""
+        content = image_bytes('PNG', size=(10, 10)) + b'\x00' * 4096
+        response = self.upload('big.png', content, 'image/png')
+        self.assertRejected(response, uploads.ERROR_BYTES.format(limit=0))
+
+    def test_rejects_decompression_bomb(self):
+        """Картинка с огромными размерами в заголовке отклоняется."""
+        header = struct.pack('>IIBBBBB', 100000, 100000, 8, 2, 0, 0, 0)
+        content = (
+            b'\x89PNG\r\n\x1a\n'
+            + png_chunk(b'IHDR', header)
+            + png_chunk(b'IDAT', zlib.compress(b'\x00' * 64))
+            + png_chunk(b'IEND', b'')
+        )
+        response = self.upload('bomb.png', content, 'image/png')
+        self.assertRejected(response, uploads.ERROR_PIXELS.format(
+            limit=settings.POST_IMAGE_MAX_PIXELS // 1000000
+        ))
+
+    def test_jpeg_metadata_stripped_but_orientation_kept(self):
+        """Из JPEG вырезается EXIF, кроме ориентации."""
+        exif = Image.Exif()
+        exif[ORIENTATION_TAG] = 6
+        exif[MAKE_TAG] = 'SecretCam'
+        content = image_bytes('JPEG', exif=exif.tobytes())
+        self.upload('photo.jpg', content)
+        post = Post.objects.get()
+        self.assertIn(b'SecretCam', content)
+        self.assertNotIn(b'SecretCam', post.image.read())
+        with Image.open(post.image) as image:
+            self.assertEqual(dict(image.getexif()), {ORIENTATION_TAG: 6})
+        self.assertEqual((post.image_width, post.image_height), (40, 20))
+
+    def test_png_text_chunks_stripped(self):
+        """Из PNG вырезаются текстовые чанки."""
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Comment', 'секрет')
+        content = image_bytes('PNG', pnginfo=info)
+        self.upload('picture.png', content, 'image/png')
+        post = Post.objects.get()
+        stored = post.image.read()
+        self.assertNotIn(b'tEXt', stored)
+        self.assertNotIn(b'iTXt', stored)
+        with Image.open(BytesIO(stored)) as image:
+            image.load()
+            self.assertEqual(image.size, (40, 20))
+
+    def test_filters_do_not_depend_on_chunk_boundaries(self):
+        """Фильтры метаданных дают один результат при любой нарезке."""
+        exif = Image.Exif()
+        exif[MAKE_TAG] = 'SecretCam'
+        samples = (
+            (uploads.JpegMetadataFilter, image_bytes(
+                'JPEG', exif=exif.tobytes())),
+            (uploads.PngMetadataFilter, image_bytes('PNG')),
+        )
+        for metadata_filter, content in samples:
+            with self.subTest(metadata_filter=metadata_filter.__name__):
+                whole = metadata_filter()
+                expected = whole.feed(content) + whole.close()
+                self.assertEqual(
+                    feed_by_byte(metadata_filter(), content), expected
+                )
+                self.assertNotIn(b'SecretCam', expected)
+
+    def test_reads_size_from_header(self):
+        """Размеры читаются из заголовка во всех форматах."""
+        for format_, options in (
+            ('JPEG', {}), ('PNG', {}), ('GIF', {}),
+            ('WEBP', {}), ('WEBP', {'lossless': True}),
+        ):
+            with self.subTest(format_=format_, options=options):
+                content = image_bytes(format_, **options)
+                self.assertEqual(
+                    uploads.read_size(content), (format_, (40, 20))
+                )
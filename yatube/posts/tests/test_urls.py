@@ -32,6 +32,7 @@ class PostURLTests(TestCase):
         """Проверяет доступность страниц для неавторизованного клиента."""
         urls = {
             '/': HTTPStatus.OK,
+            '/group/': HTTPStatus.OK,
             f'/group/{PostURLTests.group.slug}/': HTTPStatus.OK,
             f'/profile/{PostURLTests.user_author}/': HTTPStatus.OK,
             f'/posts/{PostURLTests.post.id}/': HTTPStatus.OK,
@@ -115,6 +116,7 @@ class PostURLTests(TestCase):
         """URL-адрес использует соответствующий шаблон."""
         templates = {
             '/': 'posts/index.html',
+            '/group/': 'posts/group_index.html',
             f'/group/{PostURLTests.group.slug}/': 'posts/group_list.html',
             f'/profile/{PostURLTests.user_author}/': 'posts/profile.html',
             f'/posts/{PostURLTests.post.id}/': 'posts/post_detail.html',
@@ -3,12 +3,16 @@ from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase
 from django.urls import reverse
-from posts.models import Follow, Group, Post, User
+from posts.models import Comment, Follow, Group, Post, User
 
 NUMBER_OF_POSTS_TEST = 13
 FIRST_PAGE_POSTS = 10
 SECOND_PAGE_POSTS = 3
 NUMBER_OF_FOLLOW = 1
+NUMBER_OF_COMMENTS_TEST = 25
+FIRST_PAGE_COMMENTS = 20
+# Сессия, пользователь, пост с автором и группой, страница комментариев.
+POST_DETAIL_QUERIES = 4
 
 
 class PostURLTests(TestCase):
@@ -169,7 +173,10 @@ class PostURLTests(TestCase):
         self.assertNotIn(PostURLTests.post, page_obj, None)
 
     def test_cache_index(self):
-        """Проверяет кеширование главной страницы."""
+        """
+        Проверяет кеширование главной страницы: правка в обход моделей
+        не видна до очистки кеша, а удаление поста сбрасывает ленту.
+        """
         cache.clear()
         post = Post.objects.create(
             text='Пост',
@@ -178,7 +185,7 @@ class PostURLTests(TestCase):
         )
         content_page_post = PostURLTests.author.get(
             reverse('posts:index')).content
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Изменённый пост')
         content_page = PostURLTests.author.get(
             reverse('posts:index')).content
         self.assertEqual(content_page_post, content_page)
@@ -186,6 +193,31 @@ class PostURLTests(TestCase):
         page_after_cache_clear = PostURLTests.author.get(
             reverse('posts:index')).content
         self.assertNotEqual(content_page_post, page_after_cache_clear)
+        post.delete()
+        page_after_delete = PostURLTests.author.get(
+            reverse('posts:index')).content
+        self.assertNotEqual(page_after_cache_clear, page_after_delete)
+
+    def test_feed_cache_varies_by_page_and_user(self):
+        """
+        Проверяет, что лента подписок не отдаёт кеш главной страницы,
+        а вторая страница не отдаёт первую.
+        """
+        cache.clear()
+        Post.objects.bulk_create(
+            Post(text=f'Пост №{number}', author=self.user_author)
+            for number in range(NUMBER_OF_POSTS_TEST)
+        )
+        first_page = PostURLTests.author.get(
+            reverse('posts:index')).context['page_obj']
+        second_page = PostURLTests.author.get(
+            reverse('posts:index') + '?page=2').context['page_obj']
+        self.assertNotEqual(
+            list(first_page.object_list), list(second_page.object_list)
+        )
+        follow_page = PostURLTests.author.get(
+            reverse('posts:follow_index')).context['page_obj']
+        self.assertEqual(len(follow_page), 0)
 
 
 class FollowTests(TestCase):
@@ -269,6 +301,7 @@ class FollowTests(TestCase):
         Новая запись пользователя появляется в ленте тех,
         кто на него подписан.
         """
+        cache.clear()
         post = Post.objects.create(
             text='Пост',
             author=self.user_author,
@@ -291,6 +324,7 @@ class FollowTests(TestCase):
         Новая запись пользователя не появляется в ленте тех,
         кто на него не подписан.
         """
+        cache.clear()
         post = Post.objects.create(
             text='Пост',
             author=self.user_author,
@@ -348,3 +382,75 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(
                     len(response.context['page_obj']), number_of_posts_in_page
                 )
+
+    def test_cursor_pages_follow_each_other(self):
+        """
+        Проверяет, что переход по курсорам ?after= и ?before= отдаёт
+        страницы без пропусков и повторов.
+        """
+        cache.clear()
+        url = reverse('posts:index')
+        first_page = PaginatorViewsTest.author.get(url).context['page_obj']
+        next_cursor = first_page.paginator.next_cursor
+        self.assertIsNotNone(next_cursor)
+        second_page = PaginatorViewsTest.author.get(
+            url, {'after': next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page), SECOND_PAGE_POSTS)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        self.assertFalse(
+            set(first_page.object_list) & set(second_page.object_list)
+        )
+        previous_page = PaginatorViewsTest.author.get(
+            url, {'before': second_page.paginator.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            list(previous_page.object_list), list(first_page.object_list)
+        )
+        self.assertFalse(previous_page.has_previous())
+
+
+class CommentsViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='user_author')
+        cls.author = Client()
+        cls.author.force_login(cls.user_author)
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.user_author
+        )
+        commentators = [
+            User.objects.create_user(username=f'user_{number}')
+            for number in range(NUMBER_OF_COMMENTS_TEST)
+        ]
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=commentator, text='Комментарий')
+            for commentator in commentators
+        )
+
+    def test_post_detail_queries_do_not_grow_with_comments(self):
+        """Страница поста не делает запрос на автора каждого комментария."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        with self.assertNumQueries(POST_DETAIL_QUERIES):
+            response = CommentsViewsTest.author.get(url)
+        self.assertEqual(
+            len(response.context['comments']), FIRST_PAGE_COMMENTS
+        )
+
+    def test_post_detail_comments_cursor_pages(self):
+        """Комментарии листаются курсором от старых к новым."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        first_page = CommentsViewsTest.author.get(url).context['comments']
+        second_page = CommentsViewsTest.author.get(
+            url, {'after': first_page.paginator.next_cursor}
+        ).context['comments']
+        self.assertEqual(
+            len(second_page), NUMBER_OF_COMMENTS_TEST - FIRST_PAGE_COMMENTS
+        )
+        self.assertEqual(
+            list(first_page.object_list) + list(second_page.object_list),
+            list(Comment.objects.order_by('created', 'pk'))
+        )
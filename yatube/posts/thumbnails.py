@@ -0,0 +1,408 @@
+"""
+Фоновая подготовка адаптивных вариантов картинок постов.
+
+После коммита поста с новой картинкой фоновая задача render для каждого
+набора из POST_IMAGE_VARIANTS рендерит варианты нескольких ширин
+в современных форматах и в формате исходника. Файлы вариантов названы
+по хешу содержимого и кешируются навсегда, а их описания хранятся в
+VariantStore. Ленты разрешают описания всех картинок страницы одной
+пачкой, шаблоны только читают их и до появления описания показывают
+заглушку, поэтому поток запроса никогда не ресайзит картинку. Готовые
+варианты сбрасывают кеш страниц с постами этой картинки.
+"""
+import hashlib
+
+from core.tasks import task
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, cache, caches
+from django.db import transaction
+from PIL import Image
+from posts import feed_cache, timeline
+from posts.lru import LRUCache
+from posts.models import Post
+from posts.storage import post_image_storage
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import deserialize, serialize, tokey
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+from sorl.thumbnail.parsers import parse_geometry
+
+VARIANTS_IDENTITY = 'variants'
+VARIANT_USERS_IDENTITY = 'variant_users'
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+}
+EXTENSIONS = {
+    'AVIF': 'avif',
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+}
+LOSSY_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+QUALITY_STEP = 10
+
+
+def encodable_formats(formats):
+    """Оставляет форматы, которые умеет записывать установленный Pillow."""
+    Image.init()
+    return [format_ for format_ in formats if format_ in Image.SAVE]
+
+
+def variants_key(name, alias):
+    """Возвращает ключ описания вариантов картинки name для набора alias."""
+    # Настройки набора входят в ключ: после их смены варианты
+    # считаются неготовыми и рендерятся заново.
+    config = settings.POST_IMAGE_VARIANTS[alias]
+    source = ImageFile(name, post_image_storage)
+    return add_prefix(
+        tokey(source.key, alias, serialize(config)), VARIANTS_IDENTITY
+    )
+
+
+def _users_key(variant_name):
+    return add_prefix(tokey(variant_name), VARIANT_USERS_IDENTITY)
+
+
+def variant_names(variants):
+    """Возвращает имена файлов вариантов из описания."""
+    return {
+        variant['name']
+        for source in variants['sources'] for variant in source['srcset']
+    }
+
+
+def link_variants(key, variants, kvstore_model=KVStore):
+    """
+    Запоминает, что описание key ссылается на файлы своих вариантов.
+
+    Одинаковые варианты разных картинок делят один файл, и для каждого
+    файла в key-value хранилище лежит список ключей описаний с ним.
+    """
+    for name in variant_names(variants):
+        with transaction.atomic():
+            row, _ = kvstore_model.objects.get_or_create(
+                key=_users_key(name), defaults={'value': serialize([])}
+            )
+            users = deserialize(row.value)
+            if key not in users:
+                kvstore_model.objects.filter(key=row.key).update(
+                    value=serialize(users + [key])
+                )
+
+
+def unlink_variants(key, variants):
+    """Забывает ссылки описания key; возвращает файлы без ссылок."""
+    orphans = []
+    for name in sorted(variant_names(variants)):
+        rows = KVStore.objects.filter(key=_users_key(name))
+        row = rows.first()
+        users = [
+            user for user in deserialize(row.value) if user != key
+        ] if row else []
+        if users:
+            rows.update(value=serialize(users))
+        else:
+            rows.delete()
+            orphans.append(name)
+    return orphans
+
+
+def link_all(kvstore_model):
+    """
+    Заводит ссылки на файлы для всех описаний вариантов.
+
+    Модель передаётся явно, чтобы функцию можно было вызвать
+    из миграции с исторической моделью.
+    """
+    manifests = kvstore_model.objects.filter(
+        key__startswith=add_prefix('', VARIANTS_IDENTITY)
+    ).values_list('key', 'value')
+    for key, value in manifests.iterator():
+        link_variants(key, deserialize(value), kvstore_model)
+
+
+class VariantStore:
+    """
+    Key-value хранилище описаний вариантов картинок.
+
+    Описания лежат в таблице key-value хранилища sorl-thumbnail и в общем
+    кеше. Описание под ключом не меняется: другая картинка или другие
+    настройки дают другой ключ, поэтому найденные описания держатся
+    в LRU процесса без сброса; удаляет их только сборка мусора картинок.
+    Промахи LRU ищутся пачкой сначала в общем кеше, затем одним запросом
+    в базе.
+    """
+
+    def __init__(self, maxsize):
+        self._local = LRUCache(maxsize)
+
+    @property
+    def cache(self):
+        try:
+            return caches[thumbnail_settings.THUMBNAIL_CACHE]
+        except InvalidCacheBackendError:
+            return cache
+
+    def get_many(self, keys):
+        """Возвращает словарь найденных описаний по ключам."""
+        found = self._local.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if not missing:
+            return found
+        raw = {
+            key: value
+            for key, value in self.cache.get_many(missing).items()
+            # sorl-thumbnail кеширует промахи служебным значением.
+            if isinstance(value, str)
+        }
+        missing = [key for key in missing if key not in raw]
+        if missing:
+            stored = dict(KVStore.objects.filter(
+                key__in=missing).values_list('key', 'value'))
+            self.cache.set_many(
+                stored, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            raw.update(stored)
+        loaded = {key: deserialize(value) for key, value in raw.items()}
+        self._local.set_many(loaded)
+        found.update(loaded)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set(self, key, value):
+        raw = serialize(value)
+        KVStore.objects.update_or_create(key=key, defaults={'value': raw})
+        self.cache.set(key, raw, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        self._local.set(key, value)
+
+    def delete(self, key):
+        KVStore.objects.filter(key=key).delete()
+        self.cache.delete(key)
+        self._local.pop(key)
+
+    def clear_local(self):
+        """Очищает LRU процесса."""
+        self._local.clear()
+
+
+store = VariantStore(settings.POST_IMAGE_LRU_SIZE)
+
+
+class PostThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail для адаптивных вариантов картинок постов."""
+
+    def render_variants(self, file_, alias):
+        """Рендерит варианты набора alias и сохраняет их описание."""
+        source = ImageFile(file_, post_image_storage)
+        config = settings.POST_IMAGE_VARIANTS[alias]
+        fallback = self._get_format(source)
+        formats = [
+            format_ for format_ in encodable_formats(config['formats'])
+            if format_ != fallback
+        ]
+        source_image = default.engine.get_image(source)
+        try:
+            sources = [
+                {
+                    'type': MIME_TYPES[format_],
+                    'srcset': self._render_widths(
+                        source_image, format_, config
+                    ),
+                }
+                for format_ in formats + [fallback]
+            ]
+        finally:
+            default.engine.cleanup(source_image)
+        largest = sources[-1]['srcset'][-1]
+        variants = {
+            'width': largest['width'],
+            'height': largest['height'],
+            'sources': sources,
+        }
+        key = variants_key(file_, alias)
+        store.set(key, variants)
+        link_variants(key, variants)
+        return variants
+
+    def _render_widths(self, source_image, format_, config):
+        srcset = []
+        for width in sorted(config['widths']):
+            variant = self._render_width(source_image, format_, width, config)
+            # Без upscale узкий исходник даёт одинаковые варианты.
+            if not srcset or srcset[-1]['width'] != variant['width']:
+                srcset.append(variant)
+        return srcset
+
+    def _render_width(self, source_image, format_, width, config):
+        box_width, box_height = parse_geometry(config['geometry'])
+        options = dict(
+            self.default_options,
+            format=format_,
+            upscale=config.get('upscale', False)
+        )
+        ratio = default.engine.get_image_ratio(source_image, options)
+        geometry = parse_geometry(
+            f'{width}x{round(box_height * width / box_width)}', ratio
+        )
+        image = default.engine.create(source_image, geometry, options)
+        # Бюджет задан для самой широкой ширины и уменьшается с площадью.
+        budget = config['max_bytes'] * (width / max(config['widths'])) ** 2
+        quality = config['quality']
+        raw_data = self._encode(image, format_, quality)
+        while (format_ in LOSSY_FORMATS and len(raw_data) > budget
+               and quality - QUALITY_STEP >= config['min_quality']):
+            quality -= QUALITY_STEP
+            raw_data = self._encode(image, format_, quality)
+        actual_width, actual_height = default.engine.get_image_size(image)
+        return {
+            'name': self._store(raw_data, format_),
+            'width': actual_width,
+            'height': actual_height,
+            'size': len(raw_data),
+            'quality': quality,
+        }
+
+    def _encode(self, image, format_, quality):
+        return default.engine._get_raw_data(
+            image, format_, quality, image_info={}
+        )
+
+    def _store(self, raw_data, format_):
+        digest = hashlib.sha256(raw_data).hexdigest()
+        name = (
+            f'{thumbnail_settings.THUMBNAIL_PREFIX}variants/'
+            f'{digest[:2]}/{digest[2:4]}/{digest}.{EXTENSIONS[format_]}'
+        )
+        variant = ImageFile(name, default.storage)
+        if not variant.exists():
+            variant.write(raw_data)
+        return variant.name
+
+
+backend = PostThumbnailBackend()
+
+
+@task(unique=True)
+def render(name):
+    """
+    Рендерит варианты картинки для всех наборов.
+
+    Имя картинки задаётся её содержимым, поэтому повторная загрузка
+    тех же байтов находит готовые варианты и не рендерит их заново.
+    """
+    rendered = False
+    for alias in settings.POST_IMAGE_VARIANTS:
+        if get_variants(name, alias) is None:
+            backend.render_variants(name, alias)
+            rendered = True
+    if rendered:
+        _invalidate_pages(name)
+
+
+def _invalidate_pages(name):
+    """Сбрасывает страницы и карточки, где вместо картинки была заглушка."""
+    scopes = set()
+    for post_id, author_id, group_id in Post.objects.filter(
+            image=name).values_list('id', 'author_id', 'group_id'):
+        scopes.update(feed_cache.post_scopes(author_id, group_id))
+        scopes.update(timeline.follower_scopes(author_id))
+        scopes.add(f'{feed_cache.CARD_POST}:{post_id}')
+    feed_cache.bump(*scopes)
+
+
+def enqueue(name):
+    """
+    Ставит картинку в очередь на рендеринг.
+
+    Повторные вызовы, пока картинка в очереди, ничего не делают.
+    """
+    render.delay(name)
+
+
+def schedule(name):
+    """Ставит картинку в очередь после коммита текущей транзакции."""
+    if name:
+        transaction.on_commit(lambda: enqueue(name))
+
+
+def _srcset(variants):
+    return ', '.join(
+        f'{default.storage.url(variant["name"])} {variant["width"]}w'
+        for variant in variants
+    )
+
+
+def get_variants(name, alias):
+    """Возвращает описание готовых вариантов или None."""
+    return store.get(variants_key(name, alias))
+
+
+def _picture(variants, alias):
+    *sources, fallback = variants['sources']
+    return {
+        'sources': [
+            {'type': source['type'], 'srcset': _srcset(source['srcset'])}
+            for source in sources
+        ],
+        'src': default.storage.url(fallback['srcset'][-1]['name']),
+        'srcset': _srcset(fallback['srcset']),
+        'sizes': settings.POST_IMAGE_VARIANTS[alias]['sizes'],
+        'width': variants['width'],
+        'height': variants['height'],
+    }
+
+
+def prefetch(posts, alias='card'):
+    """
+    Разрешает картинки постов одной пачкой.
+
+    Разметка <picture> или None для неготовых картинок сохраняется
+    в посте, и тег post_image больше не обращается к хранилищу.
+    Неготовые картинки ставятся в очередь на рендеринг.
+    """
+    posts = [post for post in posts if post.image]
+    keys = {post.pk: variants_key(post.image.name, alias) for post in posts}
+    found = store.get_many(keys.values())
+    for post in posts:
+        variants = found.get(keys[post.pk])
+        if variants is None:
+            schedule(post.image.name)
+        pictures = post.__dict__.setdefault('_pictures', {})
+        pictures[alias] = variants and _picture(variants, alias)
+
+
+def get_picture(post, alias):
+    """Возвращает данные для разметки <picture> или None."""
+    pictures = getattr(post, '_pictures', {})
+    if alias not in pictures:
+        prefetch([post], alias)
+    return post._pictures[alias]
+
+
+def get_size(alias, width=None, height=None):
+    """
+    Возвращает размеры самого широкого варианта для заглушки.
+
+    Если размеры исходника известны, картинка вписывается в рамку так же,
+    как при рендеринге, иначе берётся рамка целиком.
+    """
+    config = settings.POST_IMAGE_VARIANTS[alias]
+    box_width, box_height = parse_geometry(config['geometry'])
+    largest = max(config['widths'])
+    box_width, box_height = largest, round(box_height * largest / box_width)
+    if not width or not height:
+        return box_width, box_height
+    scale = min(box_width / width, box_height / height)
+    if not config.get('upscale', False):
+        scale = min(scale, 1)
+    return round(width * scale), round(height * scale)
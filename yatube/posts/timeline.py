@@ -0,0 +1,249 @@
+"""
+Материализованные ленты подписок (fan-out on write).
+
+Новый пост раскладывается в ленты подписчиков автора фоновой задачей
+fan_out_posts: у автора с тысячами подписчиков это тысячи строк, и
+публикация не должна их ждать. Подписка дозаполняет ленту последними
+постами автора, отписка вычищает их.
+Авторы, у которых подписчиков больше FOLLOW_TIMELINE_FANOUT_LIMIT,
+не раскладываются: их посты подмешиваются при чтении.
+
+Страница ленты читается TimelinePaginator: ключи (дата, id поста)
+берутся диапазоном индекса материализованной ленты, ключи постов
+популярных авторов — диапазоном индекса постов автора, и посты
+страницы читаются по id.
+"""
+from core.tasks import task
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.dateparse import parse_datetime
+from posts import feed_cache
+from posts.models import Follow, Post, TimelineEntry, UserCounters
+from posts.paginator import CursorPaginator
+
+POPULAR_AUTHORS_KEY = 'timeline:popular_authors'
+POPULAR_AUTHORS_TIMEOUT = 60 * 5
+
+
+def is_enabled():
+    return settings.FOLLOW_TIMELINE_ENABLED
+
+
+def _popular_ids(counters_model):
+    # Диапазон индекса по счётчику подписчиков, а не GROUP BY подписок.
+    return set(counters_model.objects.filter(
+        followers_count__gt=settings.FOLLOW_TIMELINE_FANOUT_LIMIT
+    ).values_list('user_id', flat=True))
+
+
+def popular_author_ids():
+    """Возвращает id авторов, чьи посты читаются без раскладки."""
+    author_ids = cache.get(POPULAR_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = _popular_ids(UserCounters)
+        cache.set(POPULAR_AUTHORS_KEY, author_ids, POPULAR_AUTHORS_TIMEOUT)
+    return author_ids
+
+
+def followed_popular_ids(user):
+    """Возвращает id популярных авторов, на которых подписан читатель."""
+    # Запоминается в пользователе: нужен и областям, и чтению страницы.
+    if not hasattr(user, '_followed_popular_ids'):
+        popular_ids = popular_author_ids()
+        user._followed_popular_ids = list(Follow.objects.filter(
+            user_id=user.pk, author_id__in=popular_ids
+        ).values_list('author_id', flat=True)) if popular_ids else []
+    return user._followed_popular_ids
+
+
+def follow_scopes(user):
+    """Возвращает области ленты подписок читателя."""
+    return feed_cache.feed_scopes(feed_cache.FEED_FOLLOW, user.pk) + [
+        feed_cache.follow_author_scope(author_id)
+        for author_id in followed_popular_ids(user)
+    ]
+
+
+def _scopes(follower_ids):
+    return [feed_cache.follow_scope(user_id) for user_id in follower_ids]
+
+
+def follower_scopes(author_id):
+    """Возвращает области лент подписок, в которые попадают посты автора."""
+    # Без кеша популярность решается числом подписчиков автора, как её
+    # посчитает popular_author_ids, и GROUP BY по всем подпискам не нужен.
+    popular_ids = cache.get(POPULAR_AUTHORS_KEY)
+    if popular_ids is not None and author_id in popular_ids:
+        return [feed_cache.follow_author_scope(author_id)]
+    follower_ids = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    if popular_ids is None:
+        limit = settings.FOLLOW_TIMELINE_FANOUT_LIMIT
+        follower_ids = follower_ids[:limit + 1]
+        if len(follower_ids) > limit:
+            return [feed_cache.follow_author_scope(author_id)]
+    return _scopes(follower_ids)
+
+
+def fan_out_many(author_id, posts):
+    """
+    Добавляет посты автора, пары (id, дата), в ленты его подписчиков.
+
+    Возвращает области изменившихся лент подписок.
+    """
+    if author_id in popular_author_ids():
+        return [feed_cache.follow_author_scope(author_id)]
+    follower_ids = list(Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date
+            )
+            for post_id, pub_date in posts
+            for user_id in follower_ids
+        ),
+        batch_size=settings.FOLLOW_TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    return _scopes(follower_ids)
+
+
+@task()
+def fan_out_posts(author_id, posts):
+    """Раскладывает новые посты автора; posts — пары (id, дата в ISO)."""
+    # Данные постов передаются в задаче, чтобы не читать их ещё раз.
+    scopes = fan_out_many(author_id, [
+        (post_id, parse_datetime(pub_date)) for post_id, pub_date in posts
+    ])
+    # Ленты подписок, закешированные до раскладки, постов не содержат.
+    feed_cache.bump(*scopes)
+
+
+def _backfill(post_model, entry_model, user_id, author_id):
+    posts = post_model.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:settings.FOLLOW_TIMELINE_BACKFILL]
+    entry_model.objects.bulk_create(
+        (
+            entry_model(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date
+            )
+            for post_id, pub_date in posts
+        ),
+        batch_size=settings.FOLLOW_TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill(user_id, author_id):
+    """Дозаполняет ленту читателя последними постами автора."""
+    if author_id not in popular_author_ids():
+        _backfill(Post, TimelineEntry, user_id, author_id)
+
+
+def fill_all(follow_model, post_model, entry_model, counters_model):
+    """
+    Дозаполняет ленты всех подписок последними постами авторов.
+
+    Модели передаются явно, чтобы функцию можно было вызвать
+    из миграции с историческими моделями.
+    """
+    follows = follow_model.objects.exclude(
+        author_id__in=_popular_ids(counters_model)
+    ).values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        _backfill(post_model, entry_model, user_id, author_id)
+
+
+@task()
+def backfill_many(user_id, author_ids):
+    """Дозаполняет ленту читателя постами новых подписок."""
+    for author_id in author_ids:
+        backfill(user_id, author_id)
+    feed_cache.bump(feed_cache.follow_scope(user_id))
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты читателя."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_id):
+    """Пересобирает ленту читателя с нуля."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    author_ids = Follow.objects.filter(
+        user_id=user_id).values_list('author_id', flat=True)
+    for author_id in author_ids:
+        backfill(user_id, author_id)
+
+
+def _row_id(row):
+    return row['id'] if isinstance(row, dict) else row.pk
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Курсорный пагинатор ленты подписок по материализованной ленте.
+
+    object_list — queryset, которым читаются посты страницы по id:
+    объекты или .values() с полями id и pub_date.
+    """
+
+    def __init__(self, user, object_list, per_page):
+        super().__init__(object_list, per_page)
+        self.user = user
+
+    def entry_keys(self, key, forward, limit):
+        """Ключи (дата, id поста) из ленты читателя одним диапазоном."""
+        return self._keys(
+            TimelineEntry.objects.filter(user_id=self.user.pk),
+            key, forward, limit, 'post_id'
+        )
+
+    def _keys(self, queryset, key, forward, limit, key_field):
+        if key is not None:
+            queryset = queryset.filter(self._beyond(key, forward, key_field))
+        order = '-' if forward else ''
+        return queryset.order_by(
+            f'{order}pub_date', f'{order}{key_field}'
+        ).values_list('pub_date', key_field)[:limit]
+
+    def _rows(self, key, forward, limit, offset=0):
+        count = offset + limit
+        keys = list(self.entry_keys(key, forward, count))
+        for author_id in followed_popular_ids(self.user):
+            keys += self._keys(
+                Post.objects.filter(author_id=author_id),
+                key, forward, count, 'id'
+            )
+        # Пост популярного автора мог попасть в ленты до того,
+        # как автор стал популярным.
+        ids = [pk for _, pk in sorted(set(keys), reverse=forward)]
+        ids = ids[offset:count]
+        if not ids:
+            return []
+        rows = {
+            _row_id(row): row
+            for row in self.object_list.filter(pk__in=ids).order_by()
+        }
+        return [rows[pk] for pk in ids if pk in rows]
+
+
+def follow_paginator(user, posts, per_page):
+    """
+    Возвращает курсорный пагинатор ленты подписок читателя.
+
+    posts — queryset всех постов, которым читаются посты страницы.
+    """
+    if not is_enabled():
+        return CursorPaginator(
+            posts.filter(author__following__user=user), per_page
+        )
+    return TimelinePaginator(user, posts, per_page)
@@ -0,0 +1,303 @@
+"""
+Потоковый приём картинок постов.
+
+ImageUploadHandler пишет загрузку во временный файл по частям и
+проверяет её, не раскодируя картинку: формат — по сигнатуре первого
+куска, размеры в пикселях — по заголовку. Слишком большие файлы и
+картинки-бомбы отбрасываются, не дописываясь на диск. Тем же проходом
+из JPEG и PNG вырезаются метаданные; из EXIF остаётся только ориентация.
+"""
+import struct
+import warnings
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+# Заголовок JPEG идёт после сегментов метаданных, поэтому размеры
+# ищутся в первых HEADER_LIMIT байтах, а не в первом куске.
+HEADER_LIMIT = 256 * 1024
+EXIF_HEADER = b'Exif\x00\x00'
+ORIENTATION_TAG = 0x0112
+
+ERROR_FORMAT = 'Загрузите картинку в формате JPEG, PNG, GIF или WebP.'
+ERROR_HEADER = 'Не удалось прочитать размеры картинки.'
+ERROR_BYTES = 'Файл больше {limit} МБ.'
+ERROR_PIXELS = 'Картинка больше {limit} мегапикселей.'
+
+
+def detect_format(head):
+    """Определяет формат картинки по сигнатуре или возвращает None."""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+    for signature, format_ in SIGNATURES:
+        if head.startswith(signature):
+            return format_
+    return None
+
+
+def read_webp_size(head):
+    """Читает размеры холста WebP из первого чанка."""
+    chunk = head[12:16]
+    if chunk == b'VP8X' and len(head) >= 30:
+        width = int.from_bytes(head[24:27], 'little') + 1
+        height = int.from_bytes(head[27:30], 'little') + 1
+    elif chunk == b'VP8 ' and len(head) >= 30:
+        width, height = struct.unpack('<HH', head[26:30])
+        width, height = width & 0x3FFF, height & 0x3FFF
+    elif chunk == b'VP8L' and len(head) >= 25:
+        bits, = struct.unpack('<I', head[21:25])
+        width, height = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    else:
+        return None
+    return 'WEBP', (width, height)
+
+
+def read_size(head):
+    """Читает размеры из заголовка, не раскодируя пиксели."""
+    # Pillow открывает WebP целиком, поэтому заголовок разбирается вручную.
+    if detect_format(head) == 'WEBP':
+        return read_webp_size(head)
+    with warnings.catch_warnings():
+        # Предел в пикселях проверяется отдельно, до раскодирования.
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        try:
+            with Image.open(BytesIO(head)) as image:
+                return image.format, image.size
+        except Image.DecompressionBombError:
+            raise
+        except Exception:
+            return None
+
+
+def read_orientation(exif):
+    """Возвращает ориентацию из полезной нагрузки сегмента EXIF."""
+    tiff = exif[len(EXIF_HEADER):]
+    try:
+        order = {b'II': '<', b'MM': '>'}[tiff[:2]]
+        offset, = struct.unpack(order + 'I', tiff[4:8])
+        count, = struct.unpack(order + 'H', tiff[offset:offset + 2])
+        for index in range(count):
+            start = offset + 2 + index * 12
+            tag, _, _, value = struct.unpack(
+                order + 'HHIH', tiff[start:start + 10]
+            )
+            if tag == ORIENTATION_TAG:
+                return value
+    except (KeyError, struct.error):
+        pass
+    return None
+
+
+def orientation_segment(orientation):
+    """Собирает минимальный сегмент APP1 с одной ориентацией."""
+    tiff = (
+        b'MM\x00\x2a\x00\x00\x00\x08'
+        + struct.pack('>HHHIHH', 1, ORIENTATION_TAG, 3, 1, orientation, 0)
+        + b'\x00\x00\x00\x00'
+    )
+    payload = EXIF_HEADER + tiff
+    return b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+
+
+class PassthroughFilter:
+    """Пропускает данные без изменений."""
+
+    def feed(self, data):
+        return data
+
+    def close(self):
+        return b''
+
+
+class JpegMetadataFilter:
+    """
+    Вырезает из JPEG сегменты EXIF, XMP, IPTC и комментарии.
+
+    Сегменты до начала сканирования буферизуются целиком (каждый не
+    длиннее 64 КБ), дальше данные идут насквозь. Ориентация из EXIF
+    переносится в минимальный сегмент, чтобы картинка не перевернулась.
+    """
+    STRIPPED = (0xE1, 0xED, 0xFE)
+    # SOS и EOI: после них метаданных уже нет.
+    PASSTHROUGH = (0xDA, 0xD9)
+
+    def __init__(self):
+        self._buffer = b''
+        self._passthrough = False
+
+    def feed(self, data):
+        if self._passthrough:
+            return data
+        self._buffer += data
+        output = []
+        if self._buffer[:2] == b'\xff\xd8':
+            output.append(self._buffer[:2])
+            self._buffer = self._buffer[2:]
+        while len(self._buffer) >= 4 and not self._passthrough:
+            marker = self._buffer[1]
+            if self._buffer[0] != 0xFF or marker in self.PASSTHROUGH:
+                self._passthrough = True
+                break
+            length, = struct.unpack('>H', self._buffer[2:4])
+            if len(self._buffer) < length + 2:
+                break
+            segment = self._buffer[:length + 2]
+            self._buffer = self._buffer[length + 2:]
+            output.append(self._filter_segment(marker, segment))
+        if self._passthrough:
+            output.append(self._buffer)
+            self._buffer = b''
+        return b''.join(output)
+
+    def _filter_segment(self, marker, segment):
+        if marker not in self.STRIPPED:
+            return segment
+        if marker == 0xE1 and segment[4:10] == EXIF_HEADER:
+            orientation = read_orientation(segment[4:])
+            if orientation not in (None, 1):
+                return orientation_segment(orientation)
+        return b''
+
+    def close(self):
+        rest, self._buffer = self._buffer, b''
+        return rest
+
+
+class PngMetadataFilter:
+    """
+    Вырезает из PNG текстовые чанки, EXIF и время изменения.
+
+    Чанки не буферизуются: по заголовку чанка решается, пропустить
+    его целиком или скопировать.
+    """
+    SIGNATURE_LENGTH = 8
+    STRIPPED = (b'eXIf', b'tEXt', b'zTXt', b'iTXt', b'tIME')
+
+    def __init__(self):
+        self._buffer = b''
+        self._signature = False
+        self._copy = 0
+        self._skip = 0
+
+    def feed(self, data):
+        self._buffer += data
+        output = []
+        while self._buffer:
+            if self._copy or self._skip:
+                size = self._copy or self._skip
+                part = self._buffer[:size]
+                self._buffer = self._buffer[size:]
+                if self._copy:
+                    output.append(part)
+                    self._copy -= len(part)
+                else:
+                    self._skip -= len(part)
+                continue
+            if not self._signature:
+                if len(self._buffer) < self.SIGNATURE_LENGTH:
+                    break
+                self._signature = True
+                self._copy = self.SIGNATURE_LENGTH
+                continue
+            if len(self._buffer) < 8:
+                break
+            length, chunk_type = struct.unpack('>I4s', self._buffer[:8])
+            # Заголовок, данные и CRC.
+            if chunk_type in self.STRIPPED:
+                self._skip = length + 12
+            else:
+                self._copy = length + 12
+        return b''.join(output)
+
+    def close(self):
+        rest, self._buffer = self._buffer, b''
+        return rest
+
+
+FILTERS = {
+    'JPEG': JpegMetadataFilter,
+    'PNG': PngMetadataFilter,
+}
+
+
+class RejectedUpload(UploadedFile):
+    """Пустая загрузка с причиной отказа для сообщения в форме."""
+
+    def __init__(self, name, content_type, error):
+        super().__init__(BytesIO(), name, content_type, 0)
+        self.upload_error = error
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет картинку во временный файл, проверяя её на лету.
+
+    Обрабатывает все файлы запроса: других загрузок в проекте нет.
+    Отклонённая загрузка дочитывается из запроса, но не сохраняется,
+    а форма получает RejectedUpload с текстом ошибки.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.error = None
+        self.head = b''
+        self.received = 0
+        self.size_checked = False
+        self.filter = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error is None:
+            self.received += len(raw_data)
+            self.error = self._check(raw_data)
+        if self.error is None:
+            self.file.write(self.filter.feed(raw_data))
+
+    def _check(self, raw_data):
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return ERROR_BYTES.format(
+                limit=settings.POST_IMAGE_MAX_BYTES // (1024 * 1024)
+            )
+        if self.size_checked:
+            return None
+        self.head += raw_data
+        format_ = detect_format(self.head)
+        if format_ not in settings.POST_IMAGE_FORMATS:
+            return ERROR_FORMAT
+        if self.filter is None:
+            self.filter = FILTERS.get(format_, PassthroughFilter)()
+        try:
+            header = read_size(self.head)
+        except Image.DecompressionBombError:
+            header = None, (settings.POST_IMAGE_MAX_PIXELS + 1, 1)
+        if header is None:
+            return ERROR_HEADER if len(self.head) >= HEADER_LIMIT else None
+        self.size_checked = True
+        self.head = b''
+        _, (width, height) = header
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            return ERROR_PIXELS.format(
+                limit=settings.POST_IMAGE_MAX_PIXELS // 1000000
+            )
+        return None
+
+    def file_complete(self, file_size):
+        if self.error is None and not self.size_checked:
+            self.error = ERROR_HEADER
+        if self.error is not None:
+            self.file.close()
+            return RejectedUpload(
+                self.file_name, self.content_type, self.error
+            )
+        self.file.write(self.filter.close())
+        self.file.size = self.file.tell()
+        self.file.seek(0)
+        return self.file
@@ -1,16 +1,32 @@
 from django.urls import path
-from posts import views
+from posts import sitemaps, syndication, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('feed/<str:fmt>/', syndication.index, name='index_feed'),
+    path('group/', views.group_index, name='group_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path(
+        'group/<slug:slug>/feed/<str:fmt>/', syndication.group_posts,
+        name='group_feed'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/feed/<str:fmt>/', syndication.profile,
+        name='profile_feed'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('sitemap.xml', sitemaps.index, name='sitemap_index'),
+    path(
+        'sitemap-<slug:section>-<int:number>.xml', sitemaps.shard,
+        name='sitemap'
+    ),
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
     ),
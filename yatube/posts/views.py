@@ -1,29 +1,66 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
+from posts import cards, conditional, feed_cache, groups, page_cache, timeline
 from posts.forms import CommentForm, PostForm
-from posts.models import Follow, Group, Post, User
+from posts.models import Follow, Post, User
+from posts.paginator import CursorPaginator
+from posts.search import SearchPaginator
 
 NUMBER_OF_POSTS = 10
+NUMBER_OF_COMMENTS = 20
 
 
+def get_page_obj(request, post_list, feed, scope_id=None,
+                 card_template=cards.CARD_TEMPLATE, paginator=None):
+    """
+    Возвращает страницу ленты по курсору из параметров запроса.
+
+    Страница берётся из кеша лент, если её версии не сброшены записью.
+    Карточки всех постов страницы разрешаются одной пачкой.
+    paginator заменяет курсорный пагинатор по post_list.
+    """
+    if paginator is None:
+        paginator = CursorPaginator(post_list, NUMBER_OF_POSTS)
+    key = feed_cache.feed_key(feed, request.GET, scope_id)
+    page_obj = feed_cache.get_page(paginator, request.GET, key)
+    cards.prefetch(page_obj, card_template)
+    return page_obj
+
+
+@page_cache.full_page(shared=True)
+@conditional.conditional
 def index(request):
+    conditional.check(
+        request, feed_cache.feed_scopes(feed_cache.FEED_INDEX)
+    )
     post_list = Post.objects.select_related('author', 'group')
-    paginator = Paginator(post_list, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page_obj(request, post_list, feed_cache.FEED_INDEX)
     context = {
         'page_obj': page_obj
     }
     return render(request, 'posts/index.html', context)
 
 
+def group_index(request):
+    """Каталог групп со счётчиками постов."""
+    context = {
+        'groups': groups.directory(),
+    }
+    return render(request, 'posts/group_index.html', context)
+
+
+@page_cache.full_page(shared=True)
+@conditional.conditional
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    group = groups.get_group(slug)
+    conditional.check(
+        request, feed_cache.feed_scopes(feed_cache.FEED_GROUP, group.id)
+    )
     post_list = group.posts.all().select_related('author')
-    paginator = Paginator(post_list, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page_obj(
+        request, post_list, feed_cache.FEED_GROUP, group.id
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -31,14 +68,20 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@page_cache.full_page()
+@conditional.conditional
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    conditional.check(request, conditional.profile_scopes(request, author.id))
     following = request.user.is_authenticated and author.following.filter(
         user=request.user).exists()
     post_list = author.posts.all().select_related('group')
-    paginator = Paginator(post_list, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page_obj(
+        request, post_list, feed_cache.FEED_PROFILE, author.id,
+        card_template='includes/author_post_card.html'
+    )
     context = {
         'author': author,
         'following': following,
@@ -47,10 +90,19 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@page_cache.full_page()
+@conditional.conditional
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'), id=post_id
+    )
+    conditional.check(request, conditional.post_scopes(post))
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    paginator = CursorPaginator(
+        post.comments.select_related('author'), NUMBER_OF_COMMENTS,
+        date_field='created', descending=False
+    )
+    comments = paginator.get_cursor_page(request.GET)
     context = {
         'post': post,
         'form': form,
@@ -59,7 +111,23 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def search(request):
+    """Полнотекстовый поиск по постам."""
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = SearchPaginator(query, NUMBER_OF_POSTS)
+        page_obj = paginator.get_cursor_page(request.GET)
+        cards.prefetch(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     if request.method == 'POST':
         form = PostForm(
@@ -80,9 +148,10 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.id:
         return redirect('posts:post_detail', post_id=post.id)
     form = PostForm(
         request.POST or None,
@@ -97,6 +166,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -109,12 +179,16 @@ def add_comment(request, post_id):
 
 
 @login_required
+@conditional.conditional
 def follow_index(request):
-    post_list = Post.objects.select_related(
-        'author', 'group').filter(author__following__user=request.user)
-    paginator = Paginator(post_list, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    conditional.check(request, timeline.follow_scopes(request.user))
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = get_page_obj(
+        request, post_list, feed_cache.FEED_FOLLOW, request.user.id,
+        paginator=timeline.follow_paginator(
+            request.user, post_list, NUMBER_OF_POSTS
+        )
+    )
     context = {
         'page_obj': page_obj
     }
@@ -122,6 +196,7 @@ def follow_index(request):
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     """Подписка на автора."""
     author = get_object_or_404(User, username=username)
@@ -134,6 +209,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     """Отписка."""
     author = get_object_or_404(User, username=username)
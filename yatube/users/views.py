@@ -1,9 +1,17 @@
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
 from users.forms import CreationForm
+from users.tasks import send_welcome_email
 
 
 class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy('posts:index')
     template_name = 'users/signup.html'
+
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        if self.object.email:
+            # Письмо отправляет фоновая задача, регистрация его не ждёт.
+            send_welcome_email.delay(self.object.pk)
+        return response
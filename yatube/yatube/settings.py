@@ -36,16 +36,34 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.replicas.ReplicaMiddleware',
+    'posts.page_cache.PageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
+# Боевой профиль шаблонов: каждый шаблон компилируется один раз и
+# дальше берётся из памяти процесса. Правки шаблонов тогда видны только
+# после перезапуска, поэтому при DEBUG профиль выключен, пока не задан
+# YATUBE_TEMPLATE_CACHE=1.
+TEMPLATE_CACHE = os.environ.get(
+    'YATUBE_TEMPLATE_CACHE', '0' if DEBUG else '1'
+) == '1'
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATE_CACHE:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -64,8 +82,59 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами одного потока.
+        'CONN_MAX_AGE': 60,
     }
 }
+# PRAGMA для каждого нового соединения SQLite, см. posts.sqlite.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    # Миллисекунды ожидания чужой блокировки на запись.
+    'busy_timeout': 5000,
+    # Отрицательное значение — размер в КБ: 64 МБ страниц в памяти.
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+
+# Реплики только для чтения. Локально это копии db.sqlite3, которые
+# обновляет команда sync_replicas; число копий задаёт YATUBE_REPLICAS.
+REPLICA_DATABASES = []
+for number in range(1, int(os.environ.get('YATUBE_REPLICAS', 0)) + 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['posts.replicas.ReplicaRouter']
+# Страницы, которые читают с реплик.
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+    'api:index',
+    'api:group_list',
+    'api:group_posts',
+    'api:profile',
+    'api:post_detail',
+    'api:follow_index',
+    'posts:index_feed',
+    'posts:group_feed',
+    'posts:profile_feed',
+    'posts:sitemap_index',
+    'posts:sitemap',
+    'about:author',
+    'about:tech',
+)
+# Сколько секунд после записи клиент читает из основной базы.
+REPLICA_PIN_SECONDS = 10
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -108,11 +177,106 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+TEST_RUNNER = 'core.runner.EagerTasksRunner'
+
+# Фоновые задачи (core.tasks) ставятся в очередь в базе и выполняются
+# командой python manage.py run_tasks. YATUBE_TASKS_EAGER=1 выполняет их
+# сразу в процессе, который их поставил, — для разработки без рабочего.
+# Тесты включают TASKS_EAGER сами (core.runner.EagerTasksRunner). Без
+# TASKS_EAGER задачи поднимают версии лент из рабочего, поэтому кеш по
+# умолчанию должен быть общим: с LocMemCache проект не запустится.
+TASKS_EAGER = os.environ.get('YATUBE_TASKS_EAGER', '0') == '1'
+# Число потоков или процессов рабочего run_tasks.
+TASKS_WORKERS = 4
+# Как часто рабочий проверяет пустую очередь, в секундах.
+TASKS_POLL_INTERVAL = 1
+# Сколько раз повторять упавшую задачу. Задержка перед повтором равна
+# TASKS_RETRY_BACKOFF секундам и удваивается с каждой попыткой.
+TASKS_MAX_RETRIES = 3
+TASKS_RETRY_BACKOFF = 10
+# Через сколько секунд задача в статусе running считается брошенной
+# умершим рабочим и возвращается в очередь.
+TASKS_VISIBILITY_TIMEOUT = 60 * 10
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки пишутся во временный файл по частям и проверяются по заголовку,
+# без раскодирования картинки.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.ImageUploadHandler']
+POST_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+
+# Версии лент, целые страницы и карточки должны быть общими для всех
+# веб-процессов и рабочего run_tasks: иначе запись сбрасывает кеш только
+# в своём процессе. Файловый кеш общий для процессов одной машины; при
+# нескольких машинах нужен memcached.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_DIR', os.path.join(BASE_DIR, 'cache')
+        ),
+        'OPTIONS': {
+            # Переполненный кеш удаляет треть записей, в том числе версии.
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+
+# Страницы лент сбрасываются сигналами при записи,
+# таймаут нужен только для вытеснения старых версий.
+FEED_CACHE_TIMEOUT = 60 * 15
+# Целые страницы сбрасываются так же, по версиям лент.
+PAGE_CACHE_TIMEOUT = 60 * 15
+# Размер страницы JSON API по умолчанию и наибольший для ?limit=.
+API_PAGE_SIZE = 10
+API_MAX_PAGE_SIZE = 100
+# Сколько строк NDJSON пакетный импорт пишет одной транзакцией.
+BULK_CHUNK_SIZE = 500
+# Сколько последних постов в лентах RSS и Atom и сколько читается за
+# один запрос. Готовый XML сбрасывается по версиям лент.
+SYNDICATION_ITEMS = 50
+SYNDICATION_CHUNK_SIZE = 20
+SYNDICATION_CACHE_TIMEOUT = 60 * 15
+# Карта сайта: записей в шарде (предел протокола — 50 000) и строк,
+# читаемых одним запросом. Шарды сбрасываются по версиям при записи.
+SITEMAP_SHARD_SIZE = 50000
+SITEMAP_CHUNK_SIZE = 2000
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
+# Отрисованные карточки постов сбрасываются версиями поста и автора.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Материализованные ленты подписок. Ленты уже существующих подписок
+# заполняет миграция, команда rebuild_timelines пересобирает их заново.
+FOLLOW_TIMELINE_ENABLED = True
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а подмешиваются при чтении.
+FOLLOW_TIMELINE_FANOUT_LIMIT = 5000
+FOLLOW_TIMELINE_BACKFILL = 1000
+FOLLOW_TIMELINE_BATCH_SIZE = 500
+
+# Картинки постов рендерятся задачей thumbnails.render в очереди core.tasks
+# (рабочим run_tasks, а не в потоке запроса) в нескольких ширинах
+# и форматах, до готовности шаблоны показывают заглушку. Форматы, которые
+# не умеет записывать установленный Pillow, пропускаются; формат
+# исходника добавляется всегда. max_bytes — бюджет размера файла самой
+# широкой ширины: варианты крупнее пережимаются с меньшим качеством, но не
+# ниже min_quality.
+POST_IMAGE_VARIANTS = {
+    'card': {
+        'geometry': '960x339',
+        'widths': (480, 960),
+        'formats': ('AVIF', 'WEBP'),
+        'upscale': True,
+        'quality': 80,
+        'min_quality': 40,
+        'max_bytes': 120 * 1024,
+        'sizes': '(max-width: 960px) 100vw, 960px',
+    },
+}
+# Сколько описаний вариантов картинок держать в памяти процесса.
+POST_IMAGE_LRU_SIZE = 1024
+# Сколько групп держать в памяти процесса для страниц групп.
+GROUP_LRU_SIZE = 256